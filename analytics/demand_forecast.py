@@ -0,0 +1,173 @@
+from collections import namedtuple
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+SEASON = 12
+
+FORECAST_MODELS = ('auto', 'seasonal_naive', 'holt_winters')
+
+# Raster van (alpha, beta, gamma) voor Holt-Winters; per onderdeel wordt de
+# combinatie met de kleinste fout op de historie gekozen
+HOLT_WINTERS_GRID = [(alpha, beta, gamma) for alpha in (0.1, 0.3, 0.6) for beta in (0.0, 0.05)
+                     for gamma in (0.1, 0.3)]
+
+# Gebruik per sleutel per maand: labels de sleutels, months een PeriodIndex
+# van opeenvolgende maanden en usage een matrix len(labels) x len(months)
+MonthlyMatrix = namedtuple('MonthlyMatrix', ['labels', 'months', 'usage'])
+
+class DemandForecast(namedtuple('DemandForecast', ['labels', 'months', 'forecast', 'lower', 'upper', 'model'])):
+    """
+    Prognose per sleutel voor de maanden in months: forecast, lower en upper
+    zijn matrices len(labels) x len(months), model het gebruikte model per
+    sleutel.
+    """
+
+    def for_part(self, part_id):
+        """Prognose van één onderdeel als dict, of None"""
+        try:
+            row = self.labels.get_loc(part_id)
+        except KeyError:
+            return None
+        return {
+            'maanden': [str(month) for month in self.months],
+            'prognose': self.forecast[row].tolist(),
+            'ondergrens': self.lower[row].tolist(),
+            'bovengrens': self.upper[row].tolist(),
+            'model': self.model[row],
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """Eén rij per sleutel en maand"""
+        n, horizon = self.forecast.shape
+        return pd.DataFrame({
+            'onderdeel_id': np.repeat(np.asarray(self.labels, dtype=object), horizon),
+            'maand': np.tile(self.months.astype(str), n),
+            'prognose': self.forecast.ravel(),
+            'ondergrens': self.lower.ravel(),
+            'bovengrens': self.upper.ravel(),
+            'model': np.repeat(self.model, horizon),
+        })
+
+def build_monthly_matrix(keys, dates, quantities, through=None) -> MonthlyMatrix:
+    """
+    Tel quantities op per sleutel en maand, van de eerste maand in de data
+    t/m through (standaard de laatste); maanden zonder gebruik zijn 0. Lege
+    sleutels en datums tellen niet mee, lege aantallen als 0.
+    """
+    codes, labels = pd.factorize(pd.Series(keys), sort=True)
+    dates = pd.Series(pd.to_datetime(dates))
+    month_codes = (dates.dt.year.to_numpy(dtype=float, na_value=np.nan) * 12
+                   + dates.dt.month.to_numpy(dtype=float, na_value=np.nan) - 1)
+    valid = (codes >= 0) & ~np.isnan(month_codes)
+    if not valid.any():
+        return MonthlyMatrix(pd.Index(labels), pd.PeriodIndex([], freq='M'), np.zeros((len(labels), 0)))
+    first = int(month_codes[valid].min())
+    if through is not None:
+        through = pd.Period(through, freq='M')
+        last = through.year * 12 + through.month - 1
+    else:
+        last = int(month_codes[valid].max())
+    valid &= month_codes <= last
+    n_months = max(last - first + 1, 0)
+    cells = codes[valid] * n_months + (month_codes[valid].astype(np.int64) - first)
+    weights = np.nan_to_num(np.asarray(quantities, dtype=float)[valid])
+    usage = np.bincount(cells, weights=weights, minlength=len(labels) * n_months).reshape(len(labels), n_months)
+    months = pd.period_range(pd.Period(year=first // 12, month=first % 12 + 1, freq='M'), periods=n_months, freq='M')
+    return MonthlyMatrix(pd.Index(labels), months, usage)
+
+def _seasonal_naive(usage, horizon):
+    """Elke maand gelijk aan dezelfde maand een jaar eerder; fout uit de verschillen met vorig jaar"""
+    steps = np.arange(horizon)
+    forecast = usage[:, usage.shape[1] - SEASON + steps % SEASON]
+    errors = usage[:, SEASON:] - usage[:, :-SEASON]
+    mse = (errors ** 2).mean(axis=1)
+    # Na een jaar stapelt de onzekerheid van het vorige jaar zich op
+    variance = mse[:, None] * (steps // SEASON + 1)
+    return forecast, variance, mse
+
+def _holt_winters_fit(usage, alpha, beta, gamma):
+    """Additieve Holt-Winters voor alle rijen tegelijk, één stap per maand; return de eindtoestand en de fout"""
+    n, n_months = usage.shape
+    level = usage[:, :SEASON].mean(axis=1)
+    trend = (usage[:, SEASON:2 * SEASON].mean(axis=1) - level) / SEASON
+    season = usage[:, :SEASON] - level[:, None]
+    sse = np.zeros(n)
+    for t in range(SEASON, n_months):
+        observed = usage[:, t]
+        previous_season = season[:, t % SEASON]
+        error = observed - (level + trend + previous_season)
+        sse += error ** 2
+        new_level = alpha * (observed - previous_season) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[:, t % SEASON] = gamma * (observed - new_level) + (1 - gamma) * previous_season
+        level = new_level
+    return level, trend, season, sse / (n_months - SEASON)
+
+def _holt_winters(usage, horizon):
+    """Holt-Winters met per rij de beste parameters uit HOLT_WINTERS_GRID"""
+    n, n_months = usage.shape
+    best = None
+    for alpha, beta, gamma in HOLT_WINTERS_GRID:
+        fit = _holt_winters_fit(usage, alpha, beta, gamma) + (np.full(n, alpha), np.full(n, beta), np.full(n, gamma))
+        if best is None:
+            best = list(fit)
+            continue
+        better = fit[3] < best[3]
+        for position, value in enumerate(fit):
+            best[position] = np.where(better[:, None] if np.ndim(value) == 2 else better, value, best[position])
+    level, trend, season, mse, alpha, beta, gamma = best
+
+    steps = np.arange(1, horizon + 1)
+    forecast = level[:, None] + trend[:, None] * steps + season[:, (n_months + steps - 1) % SEASON]
+    # Variantie van de h-staps fout voor additieve Holt-Winters (Hyndman e.a.)
+    j = np.arange(1, horizon)
+    c = alpha[:, None] * (1 + j * beta[:, None]) + gamma[:, None] * (j % SEASON == 0)
+    cumulative = np.concatenate([np.zeros((n, 1)), np.cumsum(c ** 2, axis=1)], axis=1)
+    variance = mse[:, None] * (1 + cumulative)
+    return forecast, variance, mse
+
+def forecast_demand(matrix: MonthlyMatrix, horizon: int = 3, model: str = 'auto', level: float = 0.9) -> DemandForecast:
+    """
+    Prognose voor de horizon maanden na matrix.months voor alle sleutels
+    tegelijk, met een interval dat met kans level de vraag bevat.
+
+    model 'seasonal_naive' herhaalt vorig jaar (meer dan 12 maanden nodig,
+    de fout komt uit de verschillen met het jaar ervoor), 'holt_winters' is
+    additieve exponentiële afvlakking met trend en seizoen (minstens 24
+    maanden), 'auto' kiest per sleutel het model met de kleinste fout één
+    stap vooruit op de historie. Met te weinig historie wordt teruggevallen
+    op het eenvoudigere model, en tot en met 12 maanden op het gemiddelde,
+    met de spreiding rond dat gemiddelde als fout. Prognoses en grenzen zijn
+    niet negatief.
+    """
+    if model not in FORECAST_MODELS:
+        raise ValueError(f"Onbekend model: {model}, kies uit {', '.join(FORECAST_MODELS)}")
+    if horizon < 1:
+        raise ValueError("horizon moet minstens 1 maand zijn")
+    usage = np.asarray(matrix.usage, dtype=float)
+    n, n_months = usage.shape
+    months = pd.period_range(matrix.months[-1] + 1, periods=horizon, freq='M') if n_months else \
+        pd.period_range(pd.Period(pd.Timestamp.now(), freq='M'), periods=horizon, freq='M')
+
+    if n_months <= SEASON or n == 0:
+        forecast = np.repeat(usage.mean(axis=1, keepdims=True) if n_months else np.zeros((n, 1)), horizon, axis=1)
+        variance = np.repeat(usage.var(axis=1, keepdims=True) if n_months else np.zeros((n, 1)), horizon, axis=1)
+        chosen = np.full(n, 'gemiddelde', dtype=object)
+    elif model == 'seasonal_naive' or n_months < 2 * SEASON:
+        forecast, variance, _ = _seasonal_naive(usage, horizon)
+        chosen = np.full(n, 'seasonal_naive', dtype=object)
+    elif model == 'holt_winters':
+        forecast, variance, _ = _holt_winters(usage, horizon)
+        chosen = np.full(n, 'holt_winters', dtype=object)
+    else:
+        naive = _seasonal_naive(usage, horizon)
+        smoothed = _holt_winters(usage, horizon)
+        use_smoothed = smoothed[2] < naive[2]
+        forecast = np.where(use_smoothed[:, None], smoothed[0], naive[0])
+        variance = np.where(use_smoothed[:, None], smoothed[1], naive[1])
+        chosen = np.where(use_smoothed, 'holt_winters', 'seasonal_naive').astype(object)
+
+    margin = NormalDist().inv_cdf(0.5 + level / 2) * np.sqrt(variance)
+    forecast = np.clip(forecast, 0, None)
+    return DemandForecast(matrix.labels, months, forecast, np.clip(forecast - margin, 0, None), forecast + margin, chosen)
@@ -0,0 +1,146 @@
+from collections import namedtuple
+from typing import Iterable, List
+import numpy as np
+import pandas as pd
+
+# Order categorieën per KPI bucket, andere categorieën tellen alleen mee in de totalen
+KPI_BUCKETS = {
+    'repair': 'extern',
+    'sales': 'extern',
+    'internal order': 'intern',
+    'warranty': 'garantie',
+}
+BUCKETS = ['extern', 'intern', 'garantie']
+
+# Placeholder voor de capaciteit van de werkplaats per maand
+WORKSHOP_CAPACITY_HOURS = 1474
+
+# Eén regel van de KPI matrix. value is een kolomnaam uit de basistabel (zie
+# build_kpi_base), een functie die de basistabel krijgt en een Series per
+# (jaar, maand) teruggeeft, of een constante (None voor nog ontbrekende data).
+KPIMetric = namedtuple('KPIMetric', ['label', 'value'])
+
+KPI_METRICS = [
+    KPIMetric('Aantal beschikbare uren werkplaats', WORKSHOP_CAPACITY_HOURS),
+    KPIMetric('Aantal betaalde uren werkplaats', None),  # Placeholder voor HR data
+    KPIMetric('Aantal externe werkorders', 'orders_extern'),
+    KPIMetric('Aantal interne werkorders', 'orders_intern'),
+    KPIMetric('Aantal garantie werkorders', 'orders_garantie'),
+    KPIMetric('Totaal aantal werkorders', 'orders_total'),
+    KPIMetric('Aantal gewerkte uren op externe werkorders', 'hours_extern'),
+    KPIMetric('Aantal gewerkte uren op interne werkorders', 'hours_intern'),
+    KPIMetric('Aantal gewerkte uren op garantie werkorders', 'hours_garantie'),
+    KPIMetric('Aantal gewerkte uren op niet productieve activiteiten', None),  # Placeholder
+    KPIMetric('Totaal aantal productieve uren', 'hours_total'),
+    # Verkochte uren zijn voorlopig gelijk aan de gewerkte uren
+    KPIMetric('Aantal verkochte uren - extern', 'hours_extern'),
+    KPIMetric('Aantal verkochte uren - intern', 'hours_intern'),
+    KPIMetric('Aantal verkochte uren - garantie', 'hours_garantie'),
+    KPIMetric('Totaal aantal verkochte uren', 'hours_total'),
+    KPIMetric('Totale omzet werkplaats uit arbeid', 'revenue_total'),
+    KPIMetric('Omzet werkplaats extern werk', 'revenue_extern'),
+    KPIMetric('Omzet werkplaats intern werk', 'revenue_intern'),
+    KPIMetric('Omzet werkplaats garantie werk', 'revenue_garantie'),
+    KPIMetric('Totaal bedrag openstaande werkorders (O.H.W.)', 'open_amount'),
+    KPIMetric('Totaal aantal openstaande werkorders', 'open_orders'),
+]
+
+def _month_codes(df: pd.DataFrame) -> np.ndarray:
+    """Maanden sinds januari 1970 per created_at, lege datums vallen buiten elk jaar"""
+    if 'created_year' in df.columns and 'created_month' in df.columns:
+        # Bij het laden afgeleide kolommen, zie utils.derived_columns
+        year = df['created_year'].to_numpy(dtype=np.int64, na_value=-1)
+        month = df['created_month'].to_numpy(dtype=np.int64, na_value=1)
+        return np.where(year < 0, -1, (year - 1970) * 12 + month - 1)
+    dates = pd.to_datetime(df['created_at'])
+    if dates.dt.tz is not None:
+        # Zelfde kalendermaand als dt.month zou geven
+        dates = dates.dt.tz_localize(None)
+    return dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+def build_kpi_base(orders_df: pd.DataFrame, worker_labours_df: pd.DataFrame, years: Iterable[int] = None) -> pd.DataFrame:
+    """
+    Bereken alle basisgetallen per (jaar, maand) in één keer: aantallen,
+    omzet en gewerkte uren per bucket plus de openstaande orders.
+
+    Arbeid telt mee voor een order als de arbeid in dezelfde maand is
+    aangemaakt als de order. Dat gebeurt met één join van arbeid op
+    (order_id, maand) in plaats van een isin scan per maand en bucket.
+
+    Returns:
+    pd.DataFrame met index (year, month), voor elk gevraagd jaar alle 12 maanden
+    """
+    order_months = _month_codes(orders_df)
+    labour_months = _month_codes(worker_labours_df)
+    if years is None:
+        valid = order_months[order_months >= 0]
+        years = np.unique(valid // 12 + 1970)
+    years = [int(year) for year in years]
+
+    # Eerst op jaar filteren, dan pas de rest van het werk op de overgebleven rijen
+    in_years = np.isin(order_months // 12 + 1970, years)
+    orders = pd.DataFrame({
+        'id': orders_df['id'].to_numpy()[in_years],
+        'period': order_months[in_years],
+        'bucket': orders_df['category'].to_numpy()[in_years],
+        'labour_cost': orders_df['total_labour_cost'].to_numpy(dtype=float, na_value=np.nan)[in_years],
+        'open': (orders_df['status'] != 'completed').to_numpy()[in_years],
+    })
+    orders['bucket'] = orders['bucket'].map(KPI_BUCKETS)
+
+    in_years = np.isin(labour_months // 12 + 1970, years)
+    labour = worker_labours_df[in_years].assign(period=labour_months[in_years])
+    labour = labour.drop_duplicates(subset=['id', 'created_at'])
+    labour = pd.DataFrame({
+        'id': labour['order_id'].to_numpy(),
+        'period': labour['period'].to_numpy(),
+        'hours': labour['total_hours'].to_numpy(dtype=float, na_value=np.nan),
+    })
+
+    keys = ['period', 'bucket']
+    by_bucket = orders.groupby(keys).agg(orders=('id', 'size'), revenue=('labour_cost', 'sum'))
+    hours = labour.merge(orders[['id', 'period', 'bucket']], on=['id', 'period'])
+    by_bucket['hours'] = hours.groupby(keys)['hours'].sum()
+    by_bucket = by_bucket.unstack('bucket').reindex(columns=BUCKETS, level='bucket')
+    by_bucket.columns = [f'{metric}_{bucket}' for metric, bucket in by_bucket.columns]
+
+    open_orders = orders[orders['open']]
+    base = by_bucket.join([
+        orders.groupby('period').size().rename('orders_total'),
+        open_orders.groupby('period')['labour_cost'].sum().rename('open_amount'),
+        open_orders.groupby('period').size().rename('open_orders'),
+    ], how='outer')
+
+    periods = [(year - 1970) * 12 + month - 1 for year in years for month in range(1, 13)]
+    base = base.reindex(periods).fillna(0)
+    base.index = pd.MultiIndex.from_product([years, range(1, 13)], names=['year', 'month'])
+    base['hours_total'] = base[[f'hours_{bucket}' for bucket in BUCKETS]].sum(axis=1)
+    base['revenue_total'] = base[[f'revenue_{bucket}' for bucket in BUCKETS]].sum(axis=1)
+    return base
+
+def build_kpi_matrix(orders_df: pd.DataFrame, worker_labours_df: pd.DataFrame,
+                     years: Iterable[int] = None, metrics: List[KPIMetric] = None) -> pd.DataFrame:
+    """
+    Bouw de metric × maand matrix voor een of meer jaren.
+
+    Returns:
+    pd.DataFrame met de metric labels als index en (jaar, maand) als kolommen
+    """
+    base = build_kpi_base(orders_df, worker_labours_df, years)
+    rows = {}
+    for metric in metrics or KPI_METRICS:
+        if callable(metric.value):
+            values = metric.value(base)
+        elif isinstance(metric.value, str):
+            values = base[metric.value]
+        else:
+            values = pd.Series(np.nan if metric.value is None else metric.value, index=base.index)
+        rows[metric.label] = values
+    matrix = pd.DataFrame(rows).T
+    matrix.index.name = 'Metric'
+    return matrix
+
+def kpi_year_table(matrix: pd.DataFrame, year: int) -> pd.DataFrame:
+    """Eén jaar uit de matrix als tabel met kolommen Metric, 01..12, Cum. en Gem."""
+    table = matrix[year].rename(columns=lambda month: f'{month:02d}').rename_axis(columns=None)
+    return table.assign(**{'Cum.': table.sum(axis=1), 'Gem.': table.mean(axis=1)}).reset_index()
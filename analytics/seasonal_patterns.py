@@ -1,17 +1,109 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress
+import multiprocessing
 from datetime import datetime
 import pandas as pd
 import numpy as np
 from typing import Dict, List
+from analytics.demand_forecast import DemandForecast, build_monthly_matrix, forecast_demand
+
+# Een maand is een piek (dal) als de seizoensindex erboven (eronder) ligt
+PEAK_THRESHOLD = 1.2
+TROUGH_THRESHOLD = 0.8
+
+MONTHS = list(range(1, 13))
+
+# Sleutel van het globale niveau
+GLOBAL_KEY = 'GLOBAL'
+
+# Gebruik per sleutel (onderdeel, categorie, ...) en kalendermaand, opgeteld
+# over alle jaren: labels de sleutels, usage en present matrices van
+# len(labels) x 12 met het gebruik en of de maand in de data voorkomt
+SeasonalMatrix = namedtuple('SeasonalMatrix', ['labels', 'usage', 'present'])
+
+def build_seasonal_matrix(keys, dates, quantities, present_months=None) -> SeasonalMatrix:
+    """
+    Tel quantities op per sleutel en kalendermaand van dates, met één
+    bincount in plaats van een filter per sleutel. Lege sleutels en datums
+    tellen niet mee, lege aantallen als 0. Een maand komt voor als er een rij
+    voor is, of volgens present_months (12 booleans) voor elke sleutel.
+    """
+    codes, labels = pd.factorize(pd.Series(keys), sort=True)
+    months = pd.Series(dates).dt.month.to_numpy(dtype=float, na_value=np.nan)
+    valid = (codes >= 0) & ~np.isnan(months)
+    cells = codes[valid] * 12 + months[valid].astype(np.int64) - 1
+    size = len(labels) * 12
+    weights = np.nan_to_num(np.asarray(quantities, dtype=float)[valid])
+    usage = np.bincount(cells, weights=weights, minlength=size).reshape(-1, 12)
+    if present_months is None:
+        present = np.bincount(cells, minlength=size).reshape(-1, 12) > 0
+    else:
+        present = np.tile(np.asarray(present_months, dtype=bool), (len(labels), 1))
+    return SeasonalMatrix(pd.Index(labels), usage, present)
+
+def seasonal_index(matrix: SeasonalMatrix) -> np.ndarray:
+    """Gebruik per maand gedeeld door het gemiddelde over de voorkomende maanden, NaN voor de andere"""
+    usage = np.where(matrix.present, matrix.usage, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        counts = matrix.present.sum(axis=1, keepdims=True)
+        mean = np.nansum(usage, axis=1, keepdims=True) / counts
+        return usage / mean
+
+def seasonal_patterns(matrix: SeasonalMatrix) -> Dict:
+    """Piek- en dalmaanden en seizoensindex (alleen voorkomende maanden) per sleutel"""
+    index = seasonal_index(matrix)
+    with np.errstate(invalid='ignore'):
+        peaks = (index > PEAK_THRESHOLD).tolist()
+        troughs = (index < TROUGH_THRESHOLD).tolist()
+    return {
+        label: {
+            'piek_maanden': list(compress(MONTHS, peak)),
+            'dal_maanden': list(compress(MONTHS, trough)),
+            'seizoens_index': list(compress(row, present))
+        }
+        for label, row, present, peak, trough in zip(
+            matrix.labels, index.tolist(), matrix.present.tolist(), peaks, troughs
+        )
+    }
+
+def _analyze_run(usage_data):
+    return SeasonalPatternAnalyzer().analyze_patterns_all_levels(usage_data)
+
+def analyze_runs(runs: Dict[str, pd.DataFrame], workers: int = None) -> Dict[str, Dict]:
+    """
+    Analyseer meerdere losse datasets (bv. één per jaar of per vestiging) op
+    alle niveaus. Met workers > 1 gebeurt dat in een pool van processen, één
+    run per keer per proces; de processen worden gestart (spawn) en niet
+    geforkt, omdat de app zelf threads draait.
+    """
+    if not workers or workers <= 1 or len(runs) <= 1:
+        return {name: _analyze_run(usage_data) for name, usage_data in runs.items()}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(runs)), mp_context=context) as executor:
+        return dict(zip(runs, executor.map(_analyze_run, runs.values())))
 
 class SeasonalPatternAnalyzer:
     """Module voor het identificeren en analyseren van seizoenspatronen in onderdelengebruik"""
     
-    def __init__(self):
-        self.seasonal_data = {
-            'part_level': {},
-            'category_level': {},
-            'global_level': {}
-        }
+    def __init__(self, store=None):
+        # Resultaten staan in een SeasonalIndexStore, zonder store in één in het geheugen
+        if store is None:
+            from analytics.seasonal_store import SeasonalIndexStore
+            store = SeasonalIndexStore()
+        self.store = store
+        # Laatste prognose van forecast_demand, voor de aanbevelingen per onderdeel
+        self.forecast = None
+
+    @property
+    def seasonal_data(self) -> Dict:
+        """Patronen per niveau en sleutel, zoals analyze_parts_usage ze geeft"""
+        return {level: self.store.patterns(level) for level in ('part_level', 'category_level', 'global_level')}
+
+    @property
+    def matrices(self) -> Dict:
+        """De SeasonalMatrix per niveau"""
+        return self.store.levels
 
     def analyze_parts_usage(self, usage_data: pd.DataFrame) -> Dict:
         """
@@ -23,32 +115,9 @@ class SeasonalPatternAnalyzer:
         Returns:
         Dict met seizoenspatronen per onderdeel
         """
-        patterns = {}
-        
-        # Zorg dat datum in juist formaat staat
-        usage_data['datum'] = pd.to_datetime(usage_data['datum'])
-        
-        # Groepeer per onderdeel en maand
-        monthly_usage = usage_data.groupby([
-            'onderdeel_id',
-            usage_data['datum'].dt.month
-        ])['aantal'].sum().reset_index()
-        
-        for onderdeel in monthly_usage['onderdeel_id'].unique():
-            onderdeel_data = monthly_usage[monthly_usage['onderdeel_id'] == onderdeel]
-            
-            # Bereken seizoensindex
-            gemiddeld_gebruik = onderdeel_data['aantal'].mean()
-            seizoens_index = onderdeel_data['aantal'] / gemiddeld_gebruik
-            
-            # Identificeer pieken en dalen
-            patterns[onderdeel] = {
-                'piek_maanden': onderdeel_data[seizoens_index > 1.2]['datum'].tolist(),
-                'dal_maanden': onderdeel_data[seizoens_index < 0.8]['datum'].tolist(),
-                'seizoens_index': seizoens_index.tolist()
-            }
-            
-        return patterns
+        matrix = build_seasonal_matrix(usage_data['onderdeel_id'], pd.to_datetime(usage_data['datum']),
+                                       usage_data['aantal'])
+        return seasonal_patterns(matrix)
 
     def get_seasonal_recommendations(self, part_id: str) -> Dict:
         """
@@ -60,20 +129,48 @@ class SeasonalPatternAnalyzer:
         Returns:
         Dict met aanbevelingen
         """
-        if part_id not in self.seasonal_data['part_level']:
-            return {"error": "Geen seizoensdata beschikbaar voor dit onderdeel"}
-            
-        pattern = self.seasonal_data['part_level'][part_id]
+        return self._recommendations('part_level', part_id, "Geen seizoensdata beschikbaar voor dit onderdeel")
+
+    def get_category_recommendations(self, category: str) -> Dict:
+        """Aanbevelingen op basis van het seizoenspatroon van een categorie"""
+        return self._recommendations('category_level', category, "Geen seizoensdata beschikbaar voor deze categorie")
+
+    def get_global_recommendations(self) -> Dict:
+        """Aanbevelingen op basis van het seizoenspatroon van alle onderdelen samen"""
+        return self._recommendations('global_level', GLOBAL_KEY, "Geen seizoensdata beschikbaar")
+
+    def get_part_category(self, part_id: str):
+        """De categorie waarin een onderdeel het meest gebruikt wordt, of None"""
+        return self.store.part_category(part_id)
+
+    def _recommendations(self, level: str, key, error: str) -> Dict:
+        # Eén rij uit de store, onafhankelijk van het aantal onderdelen
+        pattern = self.store.pattern(level, key)
+        if pattern is None:
+            return {"error": error}
         
-        return {
+        recommendations = {
             "voorraad_advies": {
                 "piek_periodes": "Verhoog voorraad voor maanden: " + 
                     ", ".join([str(m) for m in pattern['piek_maanden']]),
                 "dal_periodes": "Verlaag voorraad voor maanden: " + 
                     ", ".join([str(m) for m in pattern['dal_maanden']])
             },
-            "seizoens_index": pattern['seizoens_index']
+            "seizoens_index": pattern['seizoens_index'],
+            # Index voor alle 12 maanden, None voor maanden zonder data
+            "maand_index": [None if np.isnan(value) else value for value in self.store.index_row(level, key).tolist()]
         }
+        
+        # Verwachte vraag uit de laatste prognose, als die er voor dit onderdeel is
+        forecast = self.forecast.for_part(key) if level == 'part_level' and self.forecast is not None else None
+        if forecast is not None:
+            recommendations["prognose"] = forecast
+            recommendations["voorraad_advies"]["verwachte_vraag"] = (
+                f"Verwachte vraag {forecast['maanden'][0]} t/m {forecast['maanden'][-1]}: "
+                f"{sum(forecast['prognose']):.0f} "
+                f"({sum(forecast['ondergrens']):.0f} - {sum(forecast['bovengrens']):.0f})"
+            )
+        return recommendations
 
     def analyze_patterns_all_levels(self, usage_data: pd.DataFrame) -> Dict:
         """
@@ -85,31 +182,29 @@ class SeasonalPatternAnalyzer:
         Returns:
         Dict met seizoenspatronen voor alle niveaus
         """
-        # Part level analyse
-        part_patterns = self.analyze_parts_usage(usage_data)
-        self.seasonal_data['part_level'] = part_patterns
+        self.store.rebuild(usage_data)
+        return self.seasonal_data
 
-        # Categorie niveau
-        category_usage = usage_data.groupby([
-            'categorie',
-            pd.Grouper(key='datum', freq='M')
-        ])['aantal'].sum().reset_index()
-        
-        category_patterns = self.analyze_parts_usage(category_usage.rename(
-            columns={'categorie': 'onderdeel_id'}
-        ))
-        self.seasonal_data['category_level'] = category_patterns
-
-        # Globaal niveau
-        global_usage = usage_data.groupby([
-            pd.Grouper(key='datum', freq='M')
-        ])['aantal'].sum().reset_index()
-        global_usage['onderdeel_id'] = 'GLOBAL'
-        
-        global_patterns = self.analyze_parts_usage(global_usage)
-        self.seasonal_data['global_level'] = global_patterns
+    def forecast_demand(self, usage_data: pd.DataFrame, horizon: int = 3, model: str = 'auto',
+                        through=None) -> DemandForecast:
+        """
+        Prognose van de vraag per onderdeel voor de horizon maanden na through
+        (standaard de laatst afgesloten maand), voor alle onderdelen tegelijk,
+        zie analytics.demand_forecast. Daarna staat de prognose ook in
+        get_seasonal_recommendations.
+        """
+        if through is None:
+            through = pd.Period(pd.Timestamp.now(), freq='M') - 1
+        matrix = build_monthly_matrix(usage_data['onderdeel_id'], usage_data['datum'], usage_data['aantal'], through)
+        self.forecast = forecast_demand(matrix, horizon, model)
+        return self.forecast
 
-        return self.seasonal_data
+    def update(self, usage_data: pd.DataFrame, today=None) -> int:
+        """
+        Verwerk alleen het gebruik van de maanden die sinds de vorige keer
+        afgesloten zijn, zie SeasonalIndexStore.update. Return het aantal maanden.
+        """
+        return self.store.update(usage_data, today)
 
     def get_multi_level_recommendations(self, part_id: str) -> Dict:
         """
@@ -121,7 +216,7 @@ class SeasonalPatternAnalyzer:
         Returns:
         Dict met aanbevelingen van alle niveaus
         """
-        part_category = self.get_part_category(part_id)  # Deze functie moet je nog implementeren
+        part_category = self.get_part_category(part_id)
         
         recommendations = {
             'onderdeel_specifiek': self.get_seasonal_recommendations(part_id),
@@ -148,4 +243,23 @@ class SeasonalPatternAnalyzer:
             'detail_niveau': recommendations
         }
         
-        return combined_advice 
\ No newline at end of file
+        return combined_advice
+
+    def calculate_weighted_advice(self, recommendations: Dict, weights: Dict) -> Dict:
+        """
+        Gewogen seizoensindex per maand over de niveaus; een niveau zonder data
+        voor een maand telt voor die maand niet mee
+        """
+        levels = [('onderdeel', 'onderdeel_specifiek'), ('categorie', 'categorie_trend'), ('globaal', 'globale_trend')]
+        indices = np.array([
+            [np.nan if value is None else value for value in recommendations[name].get('maand_index', [None] * 12)]
+            for _, name in levels
+        ], dtype=float)
+        level_weights = np.array([weights[weight] for weight, _ in levels])[:, None]
+        with np.errstate(invalid='ignore'):
+            weighted = np.nansum(indices * level_weights, axis=0) / (~np.isnan(indices) * level_weights).sum(axis=0)
+            return {
+                'piek_maanden': [month for month, value in zip(MONTHS, weighted) if value > PEAK_THRESHOLD],
+                'dal_maanden': [month for month, value in zip(MONTHS, weighted) if value < TROUGH_THRESHOLD],
+                'seizoens_index': [None if np.isnan(value) else float(value) for value in weighted]
+            } 
\ No newline at end of file
@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import threading
+from collections import namedtuple
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from utils.env_loader import load_env_var
+from analytics.seasonal_patterns import (SeasonalMatrix, build_seasonal_matrix, seasonal_index, seasonal_patterns,
+                                         MONTHS, PEAK_THRESHOLD, TROUGH_THRESHOLD, GLOBAL_KEY)
+
+SEASONAL_STORE_DIR = Path(load_env_var('SEASONAL_STORE_DIR', str(Path(__file__).parent.parent / '.seasonal')))
+
+LEVELS = ['part_level', 'category_level', 'global_level']
+
+# Gebruik per onderdeel (rijen, zelfde volgorde als het onderdeelniveau) en categorie (kolommen)
+PartCategories = namedtuple('PartCategories', ['labels', 'categories', 'usage'])
+
+def _month_codes(dates) -> np.ndarray:
+    """Maanden sinds januari van jaar 0 per datum, NaN voor lege datums"""
+    dates = pd.Series(pd.to_datetime(dates))
+    year = dates.dt.year.to_numpy(dtype=float, na_value=np.nan)
+    month = dates.dt.month.to_numpy(dtype=float, na_value=np.nan)
+    return year * 12 + month - 1
+
+def _period(code):
+    return None if code is None else pd.Period(year=int(code) // 12, month=int(code) % 12 + 1, freq='M')
+
+def _span(first, last) -> np.ndarray:
+    """De kalendermaanden (12 booleans) die voorkomen van maandcode first tot en met last"""
+    present = np.zeros(12, dtype=bool)
+    for code in range(int(first), min(int(last), int(first) + 11) + 1):
+        present[code % 12] = True
+    return present
+
+def _add(labels_a, usage_a, labels_b, usage_b, columns_a=None, columns_b=None):
+    """Tel twee matrices met (deels) andere rijlabels, en eventueel kolomlabels, bij elkaar op"""
+    labels = labels_a.union(labels_b)
+    rows_a, rows_b = labels.get_indexer(labels_a), labels.get_indexer(labels_b)
+    if columns_a is None:
+        columns = None
+        result = np.zeros((len(labels),) + usage_a.shape[1:], dtype=usage_a.dtype)
+        result[rows_a] += usage_a
+        result[rows_b] += usage_b
+    else:
+        columns = columns_a.union(columns_b)
+        result = np.zeros((len(labels), len(columns)), dtype=usage_a.dtype)
+        result[np.ix_(rows_a, columns.get_indexer(columns_a))] += usage_a
+        result[np.ix_(rows_b, columns.get_indexer(columns_b))] += usage_b
+    return labels, result, columns
+
+def _merge(a: SeasonalMatrix, b: SeasonalMatrix) -> SeasonalMatrix:
+    if a is None:
+        return b
+    labels, usage, _ = _add(a.labels, a.usage, b.labels, b.usage)
+    _, present, _ = _add(a.labels, a.present, b.labels, b.present)
+    return SeasonalMatrix(labels, usage, present)
+
+def _object_index(values) -> pd.Index:
+    return pd.Index(np.asarray(values, dtype=object))
+
+class SeasonalIndexStore:
+    """
+    Gebruik per onderdeel, categorie en globaal per kalendermaand (zie
+    analytics.seasonal_patterns.SeasonalMatrix), met de seizoensindex die
+    daaruit volgt. De store onthoudt t/m welke maand het gebruik verwerkt is;
+    fold telt alleen de rijen van de maanden daarna erbij op, in plaats van
+    de hele historie opnieuw te groeperen.
+
+    Met een directory wordt de store na elke wijziging weggeschreven (numpy
+    .npz met een json manifest, het manifest pas na het databestand, zoals
+    bij utils.snapshots) en bij het aanmaken teruggelezen. Zonder directory
+    leeft hij alleen in het geheugen. Labels van een teruggelezen store zijn
+    tekst.
+
+    Opvragen per onderdeel (pattern, part_category) is een hash lookup en een
+    rij van 12 waarden, onafhankelijk van het aantal onderdelen.
+    """
+
+    def __init__(self, directory=None, keep=2):
+        self.directory = Path(directory) if directory is not None else None
+        self.keep = keep
+        self._lock = threading.RLock()
+        self._reset()
+        if self.directory is not None:
+            self.load()
+
+    def _reset(self):
+        self.levels = {}
+        self.part_categories = None
+        self._first = None
+        self._through = None
+        self._indices = {}
+        self._patterns = {}
+
+    @property
+    def through(self):
+        """De laatste verwerkte maand (pd.Period), None voor een lege store"""
+        return _period(self._through)
+
+    @property
+    def next_month(self):
+        """Begin van de eerste maand die nog niet verwerkt is, None voor een lege store"""
+        return None if self._through is None else (self.through + 1).start_time
+
+    def fold(self, usage_data: pd.DataFrame, through=None) -> int:
+        """
+        Verwerk het gebruik van de maanden na de laatst verwerkte t/m through
+        (een maand, standaard de laatste maand in de data). usage_data heeft
+        de kolommen 'datum', 'onderdeel_id', 'categorie' en 'aantal'; rijen van
+        al verwerkte maanden worden overgeslagen. Return het aantal verwerkte
+        maanden.
+        """
+        codes = _month_codes(usage_data['datum'])
+        with self._lock:
+            last = -np.inf if self._through is None else self._through
+            if through is not None:
+                through = pd.Period(through, freq='M')
+                end = through.year * 12 + through.month - 1
+            else:
+                end = np.nanmax(codes) if np.isfinite(codes).any() else last
+            if end <= last:
+                return 0
+            mask = (codes > last) & (codes <= end)
+            rows = usage_data[mask]
+            start = last + 1 if self._through is not None else (np.nanmin(codes[mask]) if mask.any() else end)
+
+            dates = pd.to_datetime(rows['datum'])
+            new = {
+                'part_level': build_seasonal_matrix(rows['onderdeel_id'], dates, rows['aantal']),
+                'category_level': build_seasonal_matrix(rows['categorie'], dates, rows['aantal']),
+                # Globaal telt elke afgesloten maand mee, ook zonder gebruik
+                'global_level': build_seasonal_matrix(np.full(len(rows), GLOBAL_KEY, dtype=object), dates,
+                                                      rows['aantal'], _span(start, end)),
+            }
+            if not len(new['global_level'].labels):
+                new['global_level'] = SeasonalMatrix(_object_index([GLOBAL_KEY]), np.zeros((1, 12)),
+                                                     _span(start, end)[None, :])
+            for level, matrix in new.items():
+                matrix = SeasonalMatrix(_object_index(matrix.labels), matrix.usage, matrix.present)
+                self.levels[level] = _merge(self.levels.get(level), matrix)
+
+            # Gebruik per onderdeel en categorie, voor de categorie van een onderdeel
+            part_codes, parts = pd.factorize(pd.Series(rows['onderdeel_id']))
+            category_codes, categories = pd.factorize(pd.Series(rows['categorie']))
+            valid = (part_codes >= 0) & (category_codes >= 0)
+            usage = np.bincount(part_codes[valid] * len(categories) + category_codes[valid],
+                                weights=np.nan_to_num(rows['aantal'].to_numpy(dtype=float, na_value=np.nan))[valid],
+                                minlength=len(parts) * len(categories)).reshape(len(parts), len(categories))
+            parts, categories = _object_index(parts), _object_index(categories)
+            if self.part_categories is not None:
+                parts, usage, categories = _add(self.part_categories.labels, self.part_categories.usage,
+                                                parts, usage, self.part_categories.categories, categories)
+            # Zelfde rijvolgorde als het onderdeelniveau
+            labels = self.levels['part_level'].labels
+            order = parts.get_indexer(labels)
+            aligned = np.zeros((len(labels), len(categories)))
+            aligned[order >= 0] = usage[order[order >= 0]]
+            self.part_categories = PartCategories(labels, categories, aligned)
+
+            self._first = int(start) if self._first is None else self._first
+            self._through = int(end)
+            self._indices = {level: seasonal_index(matrix) for level, matrix in self.levels.items()}
+            self._patterns = {}
+            if self.directory is not None:
+                self.save()
+            return int(end - start + 1)
+
+    def rebuild(self, usage_data: pd.DataFrame, through=None) -> int:
+        """Begin opnieuw en verwerk alle maanden t/m through"""
+        with self._lock:
+            self._reset()
+            return self.fold(usage_data, through)
+
+    def update(self, usage_data: pd.DataFrame, today=None) -> int:
+        """Verwerk de maanden die sinds de vorige keer afgesloten zijn (alles voor de maand van today)"""
+        return self.fold(usage_data, pd.Period(today or pd.Timestamp.now(), freq='M') - 1)
+
+    def index_row(self, level: str, key):
+        """Seizoensindex van één sleutel voor de 12 maanden, NaN voor maanden zonder data, of None"""
+        matrix = self.levels.get(level)
+        if matrix is None:
+            return None
+        try:
+            row = matrix.labels.get_loc(key)
+        except KeyError:
+            return None
+        return self._indices[level][row]
+
+    def index_matrix(self, level: str):
+        """Labels en seizoensindex (len(labels) x 12) van een heel niveau, of None"""
+        with self._lock:
+            matrix = self.levels.get(level)
+            return None if matrix is None else (matrix.labels, self._indices[level])
+
+    def main_categories(self, labels) -> np.ndarray:
+        """Per onderdeel in labels de categorie waarin het het meest gebruikt is, None zonder gebruik"""
+        result = np.full(len(labels), None, dtype=object)
+        if self.part_categories is None or not len(self.part_categories.categories):
+            return result
+        rows = self.part_categories.labels.get_indexer(labels)
+        known = rows >= 0
+        usage = self.part_categories.usage[rows[known]]
+        categories = np.asarray(self.part_categories.categories, dtype=object)[usage.argmax(axis=1)]
+        result[known] = np.where(usage.any(axis=1), categories, None)
+        return result
+
+    def pattern(self, level: str, key):
+        """Piek- en dalmaanden en seizoensindex van één sleutel, zoals analyze_parts_usage, of None"""
+        index = self.index_row(level, key)
+        if index is None:
+            return None
+        with np.errstate(invalid='ignore'):
+            return {
+                'piek_maanden': [month for month, value in zip(MONTHS, index) if value > PEAK_THRESHOLD],
+                'dal_maanden': [month for month, value in zip(MONTHS, index) if value < TROUGH_THRESHOLD],
+                'seizoens_index': index[~np.isnan(index)].tolist()
+            }
+
+    def patterns(self, level: str) -> dict:
+        """Alle patronen van een niveau, één keer per verwerkte maand berekend"""
+        with self._lock:
+            if level not in self._patterns:
+                matrix = self.levels.get(level)
+                self._patterns[level] = seasonal_patterns(matrix) if matrix is not None else {}
+            return self._patterns[level]
+
+    def part_category(self, part_id):
+        """De categorie waarin een onderdeel het meest gebruikt is, of None"""
+        if self.part_categories is None or not len(self.part_categories.categories):
+            return None
+        try:
+            row = self.part_categories.labels.get_loc(part_id)
+        except KeyError:
+            return None
+        usage = self.part_categories.usage[row]
+        return self.part_categories.categories[int(np.argmax(usage))] if usage.any() else None
+
+    def _manifests(self):
+        """Manifests, nieuwste eerst"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob('seasonal-*.json'), reverse=True)
+
+    def save(self):
+        """Schrijf de store weg als nieuwe versie; mislukt schrijven laat de vorige versie staan"""
+        version = f'{time.time_ns():020d}'
+        data_path = self.directory / f'seasonal-{version}.npz'
+        manifest_path = self.directory / f'seasonal-{version}.json'
+        arrays = {}
+        for level, matrix in self.levels.items():
+            arrays[f'{level}_labels'] = matrix.labels.astype(str).to_numpy(dtype=str)
+            arrays[f'{level}_usage'] = matrix.usage
+            arrays[f'{level}_present'] = matrix.present
+        arrays['part_categories_categories'] = self.part_categories.categories.astype(str).to_numpy(dtype=str)
+        arrays['part_categories_usage'] = self.part_categories.usage
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = data_path.with_suffix('.npz.tmp')
+            with open(tmp_path, 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(tmp_path, data_path)
+            manifest = {
+                'version': version,
+                'file': data_path.name,
+                'first': self._first,
+                'through': self._through,
+                'through_month': str(self.through),
+                'parts': len(self.levels['part_level'].labels),
+                'saved_at': time.time(),
+            }
+            tmp_manifest = manifest_path.with_suffix('.json.tmp')
+            tmp_manifest.write_text(json.dumps(manifest))
+            os.replace(tmp_manifest, manifest_path)
+        except OSError:
+            # Net als een snapshot is de store een cache; de volgende fold probeert het opnieuw
+            return None
+        for old_manifest in self._manifests()[self.keep:]:
+            for path in (old_manifest, old_manifest.with_suffix('.npz')):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        return manifest
+
+    def load(self) -> bool:
+        """Lees de nieuwste volledige versie terug, return of dat gelukt is"""
+        for manifest_path in self._manifests():
+            try:
+                manifest = json.loads(manifest_path.read_text())
+                with np.load(self.directory / manifest['file'], allow_pickle=False) as arrays:
+                    levels = {
+                        level: SeasonalMatrix(_object_index(arrays[f'{level}_labels']), arrays[f'{level}_usage'],
+                                              arrays[f'{level}_present'])
+                        for level in LEVELS
+                    }
+                    categories = _object_index(arrays['part_categories_categories'])
+                    category_usage = arrays['part_categories_usage']
+            except (OSError, ValueError, KeyError):
+                continue
+            with self._lock:
+                self._reset()
+                self.levels = levels
+                self.part_categories = PartCategories(levels['part_level'].labels, categories, category_usage)
+                self._first, self._through = manifest['first'], manifest['through']
+                self._indices = {level: seasonal_index(matrix) for level, matrix in levels.items()}
+            return True
+        return False
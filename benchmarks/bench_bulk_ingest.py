@@ -0,0 +1,125 @@
+"""
+Benchmark: COPY + read_csv met gedeclareerde dtypes tegenover het oude
+pd.read_sql_query pad, op een synthetische dataset met de kolommen van
+load_orders_data.
+
+Het synthetische deel meet alleen de pandas kant: DataFrame.from_records op
+Python objecten (wat read_sql_query na fetchall doet) tegenover read_csv op
+COPY output. De tijd die psycopg2 nodig heeft om die Python objecten te maken
+zit er dus niet in; wel het geheugen dat de fetchall rijen naast het frame
+innemen. Met --live worden beide paden end-to-end tegen de geconfigureerde
+database gedraaid met de echte orders query.
+
+Gebruik:
+    python -m benchmarks.bench_bulk_ingest --rows 200000
+    python -m benchmarks.bench_bulk_ingest --live
+"""
+import io
+import csv
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from utils.bulk_ingest import read_copy_csv, COPY_NULL
+from utils.database import ORDERS_DTYPES
+
+def make_synthetic_rows(n_rows, seed=42):
+    """Maak rijen zoals psycopg2 ze teruggeeft voor de orders query"""
+    rng = np.random.default_rng(seed)
+    columns = list(ORDERS_DTYPES)
+    base = datetime(2020, 1, 1)
+    categories = ['repair', 'sales', 'internal order', 'warranty', 'maintenance']
+    statuses = [f'fase{i}' for i in range(1, 13)]
+    rows = []
+    for i in range(n_rows):
+        row = {}
+        for col in columns:
+            dtype = ORDERS_DTYPES[col]
+            if dtype == 'Int64':
+                row[col] = int(rng.integers(1, 50_000))
+            elif dtype == 'float64':
+                row[col] = Decimal(f'{rng.random() * 500:.2f}')
+            elif dtype == 'datetime':
+                row[col] = base + timedelta(minutes=int(rng.integers(0, 5 * 365 * 24 * 60)))
+            elif dtype == 'boolean':
+                row[col] = bool(rng.integers(0, 2))
+            elif col == 'category':
+                row[col] = categories[i % len(categories)]
+            elif col == 'status':
+                row[col] = statuses[i % len(statuses)]
+            else:
+                row[col] = f'{col}-{int(rng.integers(0, 2_000))}'
+        rows.append(tuple(row[col] for col in columns))
+    return columns, rows
+
+def to_copy_csv(columns, rows):
+    """Serialiseer rijen zoals COPY (...) TO STDOUT WITH CSV HEADER dat doet"""
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([
+            COPY_NULL if value is None
+            else ('t' if value else 'f') if isinstance(value, bool)
+            else value
+            for value in row
+        ])
+    return output.getvalue().encode('utf-8')
+
+def estimate_rows_size(rows, sample=1_000):
+    """Schat het geheugen van een fetchall resultaat (lijst van tuples met Python objecten)"""
+    sample_rows = rows[:sample]
+    per_row = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        for row in sample_rows
+    ) / max(len(sample_rows), 1)
+    return sys.getsizeof(rows) + per_row * len(rows)
+
+def timed(func, repeat=3):
+    """Beste tijd van een aantal runs, plus het resultaat van de laatste run"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def run_synthetic(n_rows):
+    columns, rows = make_synthetic_rows(n_rows)
+    payload = to_copy_csv(columns, rows)
+
+    read_sql_time, read_sql_df = timed(lambda: pd.DataFrame.from_records(rows, columns=columns, coerce_float=True))
+    copy_time, copy_df = timed(lambda: read_copy_csv(io.BytesIO(payload), ORDERS_DTYPES))
+
+    print(f"Synthetisch, {n_rows:,} rijen x {len(columns)} kolommen")
+    print(f"  read_sql_query pad: {read_sql_time:.3f}s, frame {read_sql_df.memory_usage(deep=True).sum() / 1e6:.1f} MB"
+          f" + fetchall rijen {estimate_rows_size(rows) / 1e6:.1f} MB")
+    print(f"  COPY pad:           {copy_time:.3f}s, frame {copy_df.memory_usage(deep=True).sum() / 1e6:.1f} MB"
+          f" + COPY buffer {len(payload) / 1e6:.1f} MB")
+
+def run_live():
+    from utils.database import execute_query, ORDERS_QUERY
+
+    query = ORDERS_QUERY.format(filter='')
+    read_sql_time, read_sql_df = timed(lambda: execute_query(query), repeat=1)
+    copy_time, copy_df = timed(lambda: execute_query(query, dtypes=ORDERS_DTYPES), repeat=1)
+
+    print(f"Live orders query, {len(copy_df):,} rijen")
+    print(f"  read_sql_query pad: {read_sql_time:.3f}s, {read_sql_df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+    print(f"  COPY pad:           {copy_time:.3f}s, {copy_df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--live', action='store_true', help='ook tegen de geconfigureerde database draaien')
+    args = parser.parse_args()
+
+    run_synthetic(args.rows)
+    if args.live:
+        run_live()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: vraagprognose voor de hele onderdelencatalogus in één keer
+(analytics.demand_forecast), per model.
+
+Per aantal onderdelen wordt een synthetische maandhistorie gemaakt (trend,
+seizoen en Poisson ruis, met veel onderdelen die weinig gebruikt worden). De
+laatste --horizon maanden worden achtergehouden; elk model krijgt de rest,
+en de fout (MAE) op de achtergehouden maanden en de dekking van het 90%
+interval worden vergeleken. Ook de tijd om de maandmatrix uit losse
+gebruiksregels te bouwen wordt gemeten.
+
+Gebruik:
+    python -m benchmarks.bench_demand_forecast --parts 5000 20000 50000 --months 60 --horizon 6
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from analytics.demand_forecast import FORECAST_MODELS, build_monthly_matrix, forecast_demand
+
+def make_synthetic_history(n_parts, n_months, seed=42):
+    """Verwacht en werkelijk gebruik per onderdeel en maand"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_months)
+    scale = rng.lognormal(0, 1.2, n_parts)[:, None]
+    peak = rng.integers(0, 12, n_parts)[:, None]
+    amplitude = rng.uniform(0, 0.8, n_parts)[:, None]
+    trend = 1 + rng.normal(0, 0.005, n_parts)[:, None] * t
+    expected = scale * np.clip(trend, 0.1, None) * (1 + amplitude * np.cos(2 * np.pi * (t - peak) / 12))
+    return rng.poisson(expected).astype(float)
+
+def history_rows(usage, start='2020-01'):
+    """De maandmatrix terug als losse gebruiksregels (één regel per onderdeel en maand met gebruik)"""
+    parts, months = np.nonzero(usage)
+    periods = pd.period_range(start, periods=usage.shape[1], freq='M')
+    return pd.DataFrame({
+        'onderdeel_id': pd.Categorical.from_codes(parts, [f'P{i:06d}' for i in range(usage.shape[0])]),
+        'datum': periods[months].to_timestamp(),
+        'aantal': usage[parts, months],
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parts', type=int, nargs='+', default=[5_000, 20_000, 50_000])
+    parser.add_argument('--months', type=int, default=60)
+    parser.add_argument('--horizon', type=int, default=6)
+    args = parser.parse_args()
+
+    print(f"{'onderdelen':>10} {'matrix (s)':>11} {'model':>15} {'fit (s)':>8} {'MAE':>7} {'dekking':>8}")
+    for n_parts in args.parts:
+        usage = make_synthetic_history(n_parts, args.months + args.horizon)
+        rows = history_rows(usage[:, :args.months])
+        start = time.perf_counter()
+        matrix = build_monthly_matrix(rows['onderdeel_id'], rows['datum'], rows['aantal'])
+        build = time.perf_counter() - start
+        # Onderdelen zonder gebruik in de historie staan niet in de matrix
+        actual = usage[[int(label[1:]) for label in matrix.labels], args.months:]
+        for model in FORECAST_MODELS:
+            start = time.perf_counter()
+            forecast = forecast_demand(matrix, args.horizon, model)
+            seconds = time.perf_counter() - start
+            mae = np.abs(forecast.forecast - actual).mean()
+            coverage = ((actual >= forecast.lower) & (actual <= forecast.upper)).mean()
+            print(f"{n_parts:>10,} {build:>11.2f} {model:>15} {seconds:>8.2f} {mae:>7.2f} {coverage:>8.1%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: piekgeheugen en snelheid van utils.export_writer tegenover to_excel
+(heel het werkboek in een BytesIO), op een synthetische onderdelenexport.
+
+Per aantal rijen wordt elke variant apart gemeten met tracemalloc (numpy en
+pandas melden hun buffers daar ook); het frame zelf telt niet mee, dat bestaat
+al voor de export begint.
+
+Gebruik:
+    python -m benchmarks.bench_export_writer --rows 50000 200000 800000
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+from utils.excel_utils import to_excel
+from utils.export_writer import write_export, remove_export, bytes_per_second
+
+def make_synthetic_parts(n_rows, seed=42):
+    """Onderdeelregels met de kolommen van de Export Tool"""
+    rng = np.random.default_rng(seed)
+    numbers = np.array([f'P{i:06d}' for i in range(20_000)], dtype=object)
+    return pd.DataFrame({
+        'part_number': numbers[rng.integers(0, len(numbers), n_rows)],
+        'part_description': pd.Categorical.from_codes(rng.integers(0, 500, n_rows),
+                                                      [f'ONDERDEEL {i}' for i in range(500)]),
+        'part_price': rng.random(n_rows) * 250,
+        'part_quantity': rng.integers(1, 20, n_rows).astype(float),
+        'client_name': pd.Categorical.from_codes(rng.integers(0, 800, n_rows), [f'Klant {i}' for i in range(800)]),
+        'defect_date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, n_rows), unit='D'),
+    })
+
+def measure(func, *args):
+    """Piekgeheugen in bytes, duur en resultaat van één aanroep"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, seconds, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[50_000, 200_000, 800_000])
+    parser.add_argument('--formats', nargs='+', default=['xlsx', 'csv', 'parquet'])
+    args = parser.parse_args()
+
+    print(f"{'rijen':>9} {'variant':>16} {'piek (MB)':>10} {'tijd (s)':>9} {'bestand (MB)':>13} {'MB/s':>7}")
+    for n_rows in args.rows:
+        df = make_synthetic_parts(n_rows)
+        peak, seconds, data = measure(to_excel, df)
+        print(f"{n_rows:>9,} {'to_excel':>16} {peak / 1e6:>10.1f} {seconds:>9.2f} {len(data) / 1e6:>13.1f} "
+              f"{len(data) / 1e6 / seconds:>7.1f}")
+        del data
+        for fmt in args.formats:
+            peak, seconds, result = measure(write_export, df, fmt)
+            print(f"{n_rows:>9,} {'write_export ' + fmt:>16} {peak / 1e6:>10.1f} {seconds:>9.2f} "
+                  f"{result.size / 1e6:>13.1f} {bytes_per_second(result) / 1e6:>7.1f}")
+            remove_export(result.path)
+
+if __name__ == '__main__':
+    main()
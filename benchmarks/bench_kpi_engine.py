@@ -0,0 +1,116 @@
+"""
+Benchmark: de KPI matrix via analytics.kpi_engine tegenover de oude lus over
+12 maanden uit render_kpi_dashboard, op synthetische orders en arbeidsregels.
+
+Per aantal orders worden beide varianten gedraaid voor één jaar, en de engine
+daarnaast voor alle jaren tegelijk. De uitkomsten van de oude lus en de engine
+worden vergeleken.
+
+Gebruik:
+    python -m benchmarks.bench_kpi_engine --orders 10000 50000 200000
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from analytics.kpi_engine import build_kpi_matrix, kpi_year_table
+
+def make_synthetic_data(n_orders, labours_per_order=3, years=5, seed=42):
+    """Orders en arbeidsregels met de kolommen die de KPI matrix gebruikt"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2020-01-01')
+    minutes = years * 365 * 24 * 60
+    created_at = start + pd.to_timedelta(rng.integers(0, minutes, n_orders), unit='min')
+    orders_df = pd.DataFrame({
+        'id': np.arange(1, n_orders + 1),
+        'created_at': created_at,
+        'category': rng.choice(['repair', 'sales', 'internal order', 'warranty', 'maintenance'], n_orders),
+        'status': rng.choice(['completed', 'fase1', 'fase5', 'fase9'], n_orders, p=[0.7, 0.1, 0.1, 0.1]),
+        'total_labour_cost': rng.random(n_orders) * 1_000,
+    })
+
+    n_labours = n_orders * labours_per_order
+    order_idx = rng.integers(0, n_orders, n_labours)
+    # Meeste arbeid in de week na het aanmaken van de order, dus soms in de volgende maand
+    labour_created = created_at[order_idx] + pd.to_timedelta(rng.integers(0, 7 * 24 * 60, n_labours), unit='min')
+    worker_labours_df = pd.DataFrame({
+        'id': np.arange(1, n_labours + 1),
+        'order_id': order_idx + 1,
+        'created_at': labour_created,
+        'total_hours': rng.integers(0, 16, n_labours) / 2,
+    })
+    return orders_df, worker_labours_df
+
+def legacy_kpi_table(orders_df, worker_labours_df, selected_year):
+    """De berekening zoals die in render_kpi_dashboard stond, zonder de placeholders"""
+    worker_labours_df = worker_labours_df.drop_duplicates(subset=['id', 'created_at'])
+    orders_year = orders_df[orders_df['created_at'].dt.year == selected_year]
+    worker_labours_year = worker_labours_df[worker_labours_df['created_at'].dt.year == selected_year]
+
+    columns = {}
+    for month in range(1, 13):
+        month_data = orders_year[orders_year['created_at'].dt.month == month]
+        month_labour = worker_labours_year[worker_labours_year['created_at'].dt.month == month]
+        extern_data = month_data[month_data['category'].isin(['repair', 'sales'])]
+        intern_data = month_data[month_data['category'] == 'internal order']
+        garantie_data = month_data[month_data['category'] == 'warranty']
+        extern_hours = month_labour[month_labour['order_id'].isin(extern_data['id'])]['total_hours'].sum()
+        intern_hours = month_labour[month_labour['order_id'].isin(intern_data['id'])]['total_hours'].sum()
+        garantie_hours = month_labour[month_labour['order_id'].isin(garantie_data['id'])]['total_hours'].sum()
+        open_data = month_data[month_data['status'] != 'completed']
+        columns[f'{month:02d}'] = [
+            len(extern_data), len(intern_data), len(garantie_data), len(month_data),
+            extern_hours, intern_hours, garantie_hours, extern_hours + intern_hours + garantie_hours,
+            extern_data['total_labour_cost'].sum() + intern_data['total_labour_cost'].sum() + garantie_data['total_labour_cost'].sum(),
+            extern_data['total_labour_cost'].sum(), intern_data['total_labour_cost'].sum(),
+            garantie_data['total_labour_cost'].sum(), open_data['total_labour_cost'].sum(), len(open_data),
+        ]
+    return pd.DataFrame(columns)
+
+# Regels uit de engine die de oude lus ook berekent, in dezelfde volgorde
+COMPARED_METRICS = [
+    'Aantal externe werkorders', 'Aantal interne werkorders', 'Aantal garantie werkorders',
+    'Totaal aantal werkorders', 'Aantal gewerkte uren op externe werkorders',
+    'Aantal gewerkte uren op interne werkorders', 'Aantal gewerkte uren op garantie werkorders',
+    'Totaal aantal productieve uren', 'Totale omzet werkplaats uit arbeid', 'Omzet werkplaats extern werk',
+    'Omzet werkplaats intern werk', 'Omzet werkplaats garantie werk',
+    'Totaal bedrag openstaande werkorders (O.H.W.)', 'Totaal aantal openstaande werkorders',
+]
+
+def timed(func, *args, repeat=3, **kwargs):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, nargs='+', default=[10_000, 50_000, 200_000])
+    parser.add_argument('--years', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'orders':>9} {'oude lus':>10} {'engine':>10} {'factor':>7} {'alle jaren':>11}  uitkomst")
+    all_ok = True
+    for n_orders in args.orders:
+        orders_df, worker_labours_df = make_synthetic_data(n_orders, years=args.years)
+        year = 2020 + args.years // 2
+
+        legacy, legacy_time = timed(legacy_kpi_table, orders_df, worker_labours_df, year)
+        table, engine_time = timed(
+            lambda: kpi_year_table(build_kpi_matrix(orders_df, worker_labours_df, years=[year]), year)
+        )
+        _, all_years_time = timed(build_kpi_matrix, orders_df, worker_labours_df)
+
+        engine = table.set_index('Metric').loc[COMPARED_METRICS, legacy.columns].to_numpy(dtype=float)
+        ok = np.allclose(engine, legacy.to_numpy(dtype=float))
+        all_ok = all_ok and ok
+        print(f"{n_orders:>9,} {legacy_time:>9.3f}s {engine_time:>9.3f}s {legacy_time / engine_time:>6.1f}x "
+              f"{all_years_time:>10.3f}s  {'OK' if ok else 'FOUT'}")
+
+    if not all_ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
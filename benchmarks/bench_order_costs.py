@@ -0,0 +1,149 @@
+"""
+Regressiecheck en benchmark voor de kostenaggregatie in de order loaders.
+
+Maakt binnen één transactie tijdelijke tabellen aan met dezelfde namen als de
+echte tabellen (temp tabellen gaan voor in het search_path) en vult die met
+een synthetische fixture van orders met veel kosten-, arbeids- en
+onderdeelregels. Daarna draaien de oude GROUP BY query en de nieuwe query met
+vooraf geaggregeerde CTEs, en worden de totalen vergeleken met de verwachte
+waarden. De transactie wordt altijd teruggedraaid, er wordt niets
+weggeschreven. Dezelfde check zonder database staat in
+tests/test_order_costs.py.
+
+Gebruik:
+    python -m benchmarks.bench_order_costs --orders 2000 --lines 8
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from utils.database import get_db_connection, ORDERS_QUERY, PARTS_QUERY
+
+# De query zoals die voor de CTE herschrijving was, ter vergelijking
+LEGACY_ORDERS_QUERY = """
+    SELECT
+    o.*,
+    SUM(oc.unit_price * oc.amount) as total_parts_cost,
+    SUM(st.hours * wl.price_per_hour + st.minutes / 60.0 * wl.price_per_hour) as total_labour_cost
+    FROM orders o
+    LEFT JOIN clients c ON o.client_id = c.id
+    LEFT JOIN machines m ON o.machine_id = m.id
+    LEFT JOIN invoices i ON o.invoice_id = i.id
+    LEFT JOIN order_costs oc ON o.id = oc.order_id
+    LEFT JOIN worker_labours wl ON o.id = wl.order_id
+    LEFT JOIN time_v2s st ON wl.specified_time_id = st.id
+    GROUP BY o.id, c.name, m.model, m.brand, m.vin, i.number
+    """
+
+FIXTURE_TABLES = """
+    CREATE TEMP TABLE clients (id int PRIMARY KEY, name text) ON COMMIT DROP;
+    CREATE TEMP TABLE machines (id int PRIMARY KEY, model text, brand text, vin text) ON COMMIT DROP;
+    CREATE TEMP TABLE invoices (id int PRIMARY KEY, number text) ON COMMIT DROP;
+    CREATE TEMP TABLE parts (id int PRIMARY KEY, number text, description text, price numeric, brand text) ON COMMIT DROP;
+    CREATE TEMP TABLE orders (
+        id int PRIMARY KEY, defect_date timestamp, number text, client_id int, category text,
+        warranty_number text, causal_part_id int, machine_id int, machine_hours numeric,
+        appointment boolean, replacement_vehicle boolean, on_location boolean, description text,
+        diagnosis text, parts_discount numeric, labour_cost_adjusted numeric, comment_worker text,
+        comment_office text, comment_invoice text, status text, printed boolean, created_at timestamp,
+        updated_at timestamp, invoice_id int, washed boolean, client_active boolean,
+        assigned_to_worker_id int, major_maintenance boolean, minor_maintenance boolean,
+        repeated_repair boolean, original_order_id int, registered_at_garage boolean, zero_invoice boolean
+    ) ON COMMIT DROP;
+    CREATE TEMP TABLE order_costs (id serial, order_id int, unit_price numeric, amount numeric, updated_at timestamp) ON COMMIT DROP;
+    CREATE TEMP TABLE time_v2s (id int PRIMARY KEY, hours int, minutes int, updated_at timestamp) ON COMMIT DROP;
+    CREATE TEMP TABLE worker_labours (
+        id int PRIMARY KEY, order_id int, worker_id int, price_per_hour numeric,
+        specified_time_id int, updated_at timestamp
+    ) ON COMMIT DROP;
+    CREATE TEMP TABLE order_parts (id serial, order_id int, part_id int, amount numeric) ON COMMIT DROP;
+    CREATE INDEX ON order_costs (order_id);
+    CREATE INDEX ON worker_labours (order_id);
+    CREATE INDEX ON order_parts (order_id);
+"""
+
+def fill_fixture(cur, n_orders, n_lines, seed=42):
+    """Vul de temp tabellen en return de verwachte totalen per order"""
+    rng = np.random.default_rng(seed)
+    cur.execute("INSERT INTO clients VALUES (1, 'Klant')")
+    cur.execute("INSERT INTO machines VALUES (1, 'Model', 'Merk', 'VIN')")
+    cur.execute("INSERT INTO parts SELECT g, 'P' || g, 'Onderdeel ' || g, 10, 'Merk' FROM generate_series(1, 100) g")
+    cur.execute("""
+        INSERT INTO orders (id, defect_date, number, client_id, machine_id, category, status, created_at, updated_at)
+        SELECT g, now(), 'O' || g, 1, 1, 'repair', 'fase5', now(), now() FROM generate_series(1, %s) g
+    """, (n_orders,))
+
+    expected = {}
+    costs, labours, times, order_parts = [], [], [], []
+    for order_id in range(1, n_orders + 1):
+        parts_total = 0.0
+        labour_total = 0.0
+        for line in range(n_lines):
+            unit_price, amount = float(rng.integers(1, 100)), float(rng.integers(1, 5))
+            costs.append((order_id, unit_price, amount))
+            parts_total += unit_price * amount
+
+            labour_id = order_id * n_lines + line
+            hours, minutes, rate = int(rng.integers(0, 4)), int(rng.integers(0, 60)), 60.0
+            times.append((labour_id, hours, minutes))
+            labours.append((labour_id, order_id, 1, rate, labour_id))
+            labour_total += hours * rate + minutes / 60.0 * rate
+
+            order_parts.append((order_id, int(rng.integers(1, 101)), float(rng.integers(1, 3))))
+        expected[order_id] = (parts_total, labour_total)
+
+    cur.executemany("INSERT INTO order_costs (order_id, unit_price, amount) VALUES (%s, %s, %s)", costs)
+    cur.executemany("INSERT INTO time_v2s (id, hours, minutes) VALUES (%s, %s, %s)", times)
+    cur.executemany(
+        "INSERT INTO worker_labours (id, order_id, worker_id, price_per_hour, specified_time_id) VALUES (%s, %s, %s, %s, %s)",
+        labours
+    )
+    cur.executemany("INSERT INTO order_parts (order_id, part_id, amount) VALUES (%s, %s, %s)", order_parts)
+    cur.execute("ANALYZE")
+    return pd.DataFrame.from_dict(expected, orient='index', columns=['expected_parts', 'expected_labour'])
+
+def run_query(conn, query):
+    start = time.perf_counter()
+    df = pd.read_sql_query(query, conn)
+    return df, time.perf_counter() - start
+
+def check_totals(name, df, expected, duration):
+    totals = df.groupby('id')[['total_parts_cost', 'total_labour_cost']].first().astype(float)
+    joined = expected.join(totals)
+    parts_ok = np.allclose(joined['expected_parts'], joined['total_parts_cost'])
+    labour_ok = np.allclose(joined['expected_labour'], joined['total_labour_cost'])
+    status = "OK" if parts_ok and labour_ok else "FOUT"
+    factor = (joined['total_parts_cost'] / joined['expected_parts']).median()
+    print(f"  {name:<18} {duration:7.3f}s  {len(df):>9,} rijen  totalen {status} (parts factor {factor:.1f}x)")
+    return parts_ok and labour_ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2_000)
+    parser.add_argument('--lines', type=int, default=8, help='kosten-, arbeids- en onderdeelregels per order')
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(FIXTURE_TABLES)
+                expected = fill_fixture(cur, args.orders, args.lines)
+
+            print(f"Fixture: {args.orders:,} orders met elk {args.lines} regels per soort")
+            legacy_df, legacy_time = run_query(conn, LEGACY_ORDERS_QUERY)
+            orders_df, orders_time = run_query(conn, ORDERS_QUERY.format(filter=''))
+            parts_df, parts_time = run_query(conn, PARTS_QUERY)
+
+            check_totals("oude orders query", legacy_df, expected, legacy_time)
+            orders_ok = check_totals("orders query", orders_df, expected, orders_time)
+            parts_ok = len(parts_df) == args.orders * args.lines
+            print(f"  {'parts query':<18} {parts_time:7.3f}s  {len(parts_df):>9,} rijen  "
+                  f"{'OK' if parts_ok else 'FOUT, verwacht één rij per onderdeelregel'}")
+        finally:
+            conn.rollback()
+
+    if not (orders_ok and parts_ok):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: onderdeelnummers zoeken met de zoekindex (utils.part_search)
+tegenover str.contains over alle gefilterde onderdeelregels, zoals het tabblad
+"Onderdeel Zoeken" dat deed.
+
+Het aantal verschillende onderdeelnummers ligt vast, alleen het aantal regels
+groeit. Per aantal regels wordt de index één keer gebouwd (zoals bij het laden
+van een versie); daarna wordt per zoekterm de tijd gemeten om de regels van de
+treffers binnen een jaarfilter te vinden. De gevonden regels worden vergeleken.
+
+Gebruik:
+    python -m benchmarks.bench_part_search --rows 100000 1000000 4000000
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from utils.filter_index import FilterIndex
+from utils.part_search import PartSearchIndex
+
+def make_synthetic_parts(n_rows, n_parts=50_000, years=5, seed=42):
+    """Onderdeelregels met nummers als 'AB-12345-X', gecompacteerd zoals bij het laden"""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list('ABCDEFGHJKLMNPRSTUVWXYZ'))
+    numbers = [f'{letters[i % 23]}{letters[i // 23 % 23]}-{i:05d}-{letters[i % 7]}' for i in range(n_parts)]
+    return pd.DataFrame({
+        'part_number': pd.Categorical.from_codes(rng.zipf(1.3, n_rows) % n_parts, numbers),
+        'defect_year': pd.array(2020 + rng.integers(0, years, n_rows), dtype='Int16'),
+        'part_quantity': rng.integers(1, 10, n_rows).astype(float),
+    })
+
+def raw_search(index, filters, query):
+    """De oude werkwijze: filteren en dan een deelstring zoeken in elke regel"""
+    filtered_df = index.take(filters)
+    return filtered_df[filtered_df['part_number'].str.contains(query, case=False, na=False, regex=False)]
+
+def indexed_search(index, search_index, filters, query):
+    part_numbers = search_index.matches(query)
+    # Een lege lijst filtert niet, dus geen treffers is meteen geen regels
+    if not part_numbers:
+        return index.df.iloc[:0]
+    return index.take({**filters, 'part_number': part_numbers})
+
+def timed(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 4_000_000])
+    args = parser.parse_args()
+
+    filters = {'defect_year': 2023}
+    queries = ['ab-00', '2345', 'pz-40000-g', 'KC-0']
+    print(f"{'regels':>10} {'bouw (s)':>9} {'zoekterm':>10} {'treffers':>9} {'ruw (ms)':>9} {'index (ms)':>11} "
+          f"{'typo (ms)':>10} {'ok':>4}")
+    for n_rows in args.rows:
+        parts_df = make_synthetic_parts(n_rows)
+        index = FilterIndex(parts_df)
+        start = time.perf_counter()
+        search_index = PartSearchIndex(index.values('part_number'))
+        build = time.perf_counter() - start
+        # De part_number dimensie van de filter index bestaat na values() al, zoals in de app
+        for query in queries:
+            raw_time, expected = timed(raw_search, index, filters, query)
+            index_time, result = timed(indexed_search, index, search_index, filters, query)
+            typo_time, _ = timed(search_index.suggest, query[:-1] + 'Q')
+            ok = np.array_equal(np.sort(expected.index.to_numpy()), np.sort(result.index.to_numpy()))
+            print(f"{n_rows:>10,} {build:>9.2f} {query:>10} {len(result):>9,} {raw_time * 1000:>9.1f} "
+                  f"{index_time * 1000:>11.2f} {typo_time * 1000:>10.2f} {'OK' if ok else 'FOUT':>4}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: top 30 grafieken uit de rollup cube (utils.rollup_cube) tegenover
+een groupby over de gefilterde ruwe orders, zoals de views dat deden.
+
+Het aantal klanten en hun machines ligt vast (elke klant heeft een paar
+machines), alleen het aantal orders groeit. De cube en de filter index worden
+één keer gebouwd (zoals bij het laden van een versie); daarna wordt per
+aantal orders de tijd per grafiek gemeten voor een jaar zonder en met
+klantfilter. De uitkomsten worden vergeleken.
+
+Gebruik:
+    python -m benchmarks.bench_rollup_cube --orders 20000 200000 2000000
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from utils.filter_index import FilterIndex
+from utils.rollup_cube import RollupCube, ORDER_CUBE_DIMENSIONS, ORDER_CUBE_MEASURES
+
+def make_synthetic_orders(n_orders, n_clients=500, machines_per_client=3, n_models=300, years=5, seed=42):
+    """Orders met de kolommen van de order cube, gecompacteerd zoals bij het laden"""
+    rng = np.random.default_rng(seed)
+    fleet = rng.integers(0, n_models, (n_clients, machines_per_client))
+    client_idx = rng.integers(0, n_clients, n_orders)
+    model_idx = fleet[client_idx, rng.integers(0, machines_per_client, n_orders)]
+    labour = rng.random(n_orders) * 1_000
+    labour[rng.random(n_orders) < 0.05] = np.nan
+    return pd.DataFrame({
+        'id': np.arange(1, n_orders + 1),
+        'defect_year': pd.array(2020 + rng.integers(0, years, n_orders), dtype='Int16'),
+        'defect_month': pd.array(rng.integers(1, 13, n_orders), dtype='Int8'),
+        'client_name': pd.Categorical.from_codes(client_idx,
+                                                 [f'Klant {i:04d}' for i in range(n_clients)]),
+        'machine_brand': pd.Categorical.from_codes(model_idx % 12, [f'Merk {i}' for i in range(12)]),
+        'machine_model': pd.Categorical.from_codes(model_idx, [f'Model {i:03d}' for i in range(n_models)]),
+        'category': pd.Categorical(rng.choice(['repair', 'sales', 'internal order', 'warranty', 'maintenance'],
+                                              n_orders, p=[0.5, 0.1, 0.1, 0.1, 0.2])),
+        'zero_invoice': pd.array(rng.random(n_orders) < 0.1, dtype='boolean'),
+        'total_labour_cost': labour,
+        'total_parts_cost': rng.random(n_orders) * 2_000,
+    })
+
+def raw_top_clients(index, filters):
+    """De oude werkwijze: rijen filteren en groeperen bij elke rerun"""
+    filtered_df = index.take(filters)
+    return (
+        filtered_df.groupby('client_name', observed=True)
+        .agg({'total_labour_cost': 'sum', 'total_parts_cost': 'sum'})
+        .assign(total_cost=lambda x: x['total_labour_cost'] + x['total_parts_cost'])
+        .reset_index()
+        .sort_values('total_cost', ascending=False)
+        .head(30)
+    )
+
+def cube_top_clients(cube, filters):
+    return (
+        cube.rollup('client_name', filters)[['client_name', 'total_labour_cost', 'total_parts_cost']]
+        .assign(total_cost=lambda x: x['total_labour_cost'] + x['total_parts_cost'])
+        .sort_values('total_cost', ascending=False)
+        .head(30)
+    )
+
+def timed(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, nargs='+', default=[20_000, 200_000, 2_000_000])
+    args = parser.parse_args()
+
+    scenarios = {
+        'jaar': {'defect_year': 2023},
+        'jaar + klanten': {'defect_year': 2023, 'client_name': ['Klant 0001', 'Klant 0002', 'Klant 0003'],
+                           'zero_invoice': False},
+    }
+    print(f"{'orders':>10} {'jaar rijen':>11} {'bouw (s)':>9} {'filter':>15} {'ruw (ms)':>9} {'cube (ms)':>10} {'ok':>4}")
+    for n_orders in args.orders:
+        orders_df = make_synthetic_orders(n_orders)
+        start = time.perf_counter()
+        cube = RollupCube(orders_df, ORDER_CUBE_DIMENSIONS, ORDER_CUBE_MEASURES)
+        build = time.perf_counter() - start
+        index = FilterIndex(orders_df)
+        for label, filters in scenarios.items():
+            raw_time, expected = timed(raw_top_clients, index, filters)
+            cube_time, result = timed(cube_top_clients, cube, filters)
+            ok = np.allclose(expected['total_cost'].to_numpy(), result['total_cost'].to_numpy())
+            print(f"{n_orders:>10,} {len(cube._levels[0][1].df):>11,} {build:>9.2f} {label:>15} "
+                  f"{raw_time * 1000:>9.1f} {cube_time * 1000:>10.1f} {'OK' if ok else 'FOUT':>4}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: SeasonalPatternAnalyzer (analytics.seasonal_patterns) op een
+synthetische onderdelencatalogus, met de oude lus per onderdeel als
+vergelijking.
+
+Per aantal onderdelen wordt de analyse op alle niveaus gemeten. De oude
+werkwijze (per onderdeel de maandtabel filteren) groeit kwadratisch en wordt
+alleen tot --old-max-parts onderdelen gemeten; de uitkomsten worden daar
+vergeleken. Daarna worden losse runs per jaar geanalyseerd, na elkaar en in
+een pool van --workers processen.
+
+Gebruik:
+    python -m benchmarks.bench_seasonal_patterns --parts 5000 20000 50000 --workers 4
+"""
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from analytics.seasonal_patterns import SeasonalPatternAnalyzer, analyze_runs
+
+def make_synthetic_usage(n_parts, rows_per_part=20, years=5, seed=42):
+    """Gebruiksregels met een seizoenspiek per onderdeel, kolommen zoals PartsAnalysisView ze aanlevert"""
+    rng = np.random.default_rng(seed)
+    n_rows = n_parts * rows_per_part
+    part_idx = rng.integers(0, n_parts, n_rows)
+    # Elk onderdeel heeft een piekmaand met drie keer zoveel kans
+    peak = rng.integers(1, 13, n_parts)[part_idx]
+    month = np.where(rng.random(n_rows) < 0.25, peak, rng.integers(1, 13, n_rows))
+    return pd.DataFrame({
+        'onderdeel_id': pd.Categorical.from_codes(part_idx, [f'P{i:06d}' for i in range(n_parts)]),
+        'categorie': pd.Categorical(rng.choice(['repair', 'sales', 'internal order', 'warranty', 'maintenance'],
+                                               n_rows)),
+        'datum': pd.to_datetime({'year': 2020 + rng.integers(0, years, n_rows), 'month': month,
+                                 'day': rng.integers(1, 29, n_rows)}),
+        'aantal': rng.integers(1, 10, n_rows).astype(float),
+    })
+
+def old_parts_usage(usage_data):
+    """De oude lus: per onderdeel de hele maandtabel filteren"""
+    monthly_usage = usage_data.groupby(['onderdeel_id', usage_data['datum'].dt.month],
+                                       observed=True)['aantal'].sum().reset_index()
+    patterns = {}
+    for onderdeel in monthly_usage['onderdeel_id'].unique():
+        onderdeel_data = monthly_usage[monthly_usage['onderdeel_id'] == onderdeel]
+        seizoens_index = onderdeel_data['aantal'] / onderdeel_data['aantal'].mean()
+        patterns[onderdeel] = {
+            'piek_maanden': onderdeel_data[seizoens_index > 1.2]['datum'].tolist(),
+            'dal_maanden': onderdeel_data[seizoens_index < 0.8]['datum'].tolist(),
+            'seizoens_index': seizoens_index.tolist()
+        }
+    return patterns
+
+def same_patterns(expected, result):
+    return expected.keys() == result.keys() and all(
+        expected[key]['piek_maanden'] == result[key]['piek_maanden']
+        and expected[key]['dal_maanden'] == result[key]['dal_maanden']
+        and np.allclose(expected[key]['seizoens_index'], result[key]['seizoens_index'])
+        for key in expected
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parts', type=int, nargs='+', default=[5_000, 20_000, 50_000])
+    parser.add_argument('--old-max-parts', type=int, default=5_000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'onderdelen':>10} {'regels':>10} {'oud (s)':>8} {'nieuw (s)':>10} {'ok':>4}")
+    for n_parts in args.parts:
+        usage_data = make_synthetic_usage(n_parts)
+        start = time.perf_counter()
+        result = SeasonalPatternAnalyzer().analyze_patterns_all_levels(usage_data)['part_level']
+        new_time = time.perf_counter() - start
+        old_time, ok = float('nan'), ''
+        if n_parts <= args.old_max_parts:
+            start = time.perf_counter()
+            expected = old_parts_usage(usage_data)
+            old_time = time.perf_counter() - start
+            ok = 'OK' if same_patterns(expected, result) else 'FOUT'
+        print(f"{n_parts:>10,} {len(usage_data):>10,} {old_time:>8.2f} {new_time:>10.2f} {ok:>4}")
+
+    # Runs per jaar voor de grootste catalogus, na elkaar en in processen
+    runs = {year: frame for year, frame in usage_data.groupby(usage_data['datum'].dt.year)}
+    start = time.perf_counter()
+    analyze_runs(runs)
+    sequential = time.perf_counter() - start
+    start = time.perf_counter()
+    analyze_runs(runs, workers=args.workers)
+    parallel = time.perf_counter() - start
+    print(f"\n{len(runs)} runs per jaar: na elkaar {sequential:.2f}s, {args.workers} processen {parallel:.2f}s "
+          f"(inclusief opstarten en overdragen, {len(os.sched_getaffinity(0))} cpu's beschikbaar)")
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,11 @@ st.set_page_config(
 
 # Daarna pas de andere imports
 import pandas as pd
-from utils.database import load_all_data
+from utils.database import get_pool_metrics, get_load_metrics
+from utils.data_store import get_shared_data, get_data_store
+from utils.parts_schema import get_parts_star
+from utils.aggregate_memo import get_aggregate_memo
+from utils.export_jobs import render_export_jobs
 from views.client_analytics import render_client_analytics
 from views.machine_analytics import render_machine_analytics
 from views.worker_analytics import render_worker_analytics
@@ -59,7 +63,13 @@ if not st.session_state.show_settings:
 # Footer with settings
 st.sidebar.markdown("---")
 st.sidebar.markdown("### Data Laatst Bijgewerkt")
-st.sidebar.text(pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"))
+# Ingevuld zodra de datasets van de pagina opgehaald zijn, zie show_data_loaded_at
+data_loaded_text = st.sidebar.empty()
+
+def show_data_loaded_at(store):
+    """Laadtijd van de oudste gedeelde dataset, de refresher houdt die actueel"""
+    data_loaded_at = store.loaded_at
+    data_loaded_text.text(data_loaded_at.strftime("%Y-%m-%d %H:%M:%S") if data_loaded_at is not None else "Wordt geladen...")
 
 # Settings menu
 st.sidebar.markdown("---")
@@ -72,44 +82,65 @@ if st.sidebar.button(settings_label, use_container_width=True):
 
 # Main content area
 if st.session_state.show_settings:
+    show_data_loaded_at(get_data_store())
     render_admin_panel()
 else:
     # Main content area with loading state
     with st.spinner('Data wordt geladen...'):
-        # Laad alle data
-        if 'data_loaded' not in st.session_state:
-            st.session_state.data_loaded = False
-            
-        if not st.session_state.data_loaded:
-            orders_df, worker_labours_df, parts_df, used_parts_df = load_all_data()
-            st.session_state.orders_df = orders_df
-            st.session_state.worker_labours_df = worker_labours_df
-            st.session_state.parts_df = parts_df
-            st.session_state.used_parts_df = used_parts_df
-            st.session_state.data_loaded = True
-        else:
-            orders_df = st.session_state.orders_df
-            worker_labours_df = st.session_state.worker_labours_df
-            parts_df = st.session_state.parts_df
-            used_parts_df = st.session_state.used_parts_df
+        # Alle sessies delen dezelfde datasets; alleen wat deze pagina nodig heeft wordt geladen
+        store = get_shared_data(st.session_state.current_page if has_view_access(st.session_state.current_page) else None)
+        show_data_loaded_at(store)
+
+        # Laadtijd per query, zodat zichtbaar is welke loader de eerste render ophoudt
+        if is_admin() and store.timings:
+            with st.sidebar.expander("Laadtijden"):
+                for name, duration in sorted(store.timings.items(), key=lambda x: x[1], reverse=True):
+                    st.text(f"{name}: {duration:.2f}s")
+                    # Geheugen voor en na de dtype compactie, zie utils.compaction
+                    memory = store.info(name).frame.attrs.get('memory')
+                    if memory:
+                        st.text(f"  {memory['after'] / 1e6:.1f} MB (was {memory['before'] / 1e6:.1f} MB)")
+                for name, (failed_at, error) in store.errors.items():
+                    st.warning(f"{name}: herladen mislukt om {failed_at.strftime('%H:%M:%S')}: {error}")
+
+        pool_metrics = get_pool_metrics()
+        if is_admin() and pool_metrics:
+            with st.sidebar.expander("Database Pool"):
+                st.text(f"In gebruik: {pool_metrics['in_use']}/{pool_metrics['max_conn']}")
+                st.text(f"Vrij: {pool_metrics['idle']}")
+                st.text(f"Wachtenden: {pool_metrics['waiters']}")
+                st.text(f"Gem. wachttijd: {pool_metrics['avg_wait'] * 1000:.1f}ms")
+                st.text(f"Max. wachttijd: {pool_metrics['max_wait'] * 1000:.1f}ms")
+                st.text(f"Vervangen connecties: {pool_metrics['recycled'] + pool_metrics['failed_pings']}")
+                load_metrics = get_load_metrics()
+                st.text(f"Uitgevoerde loads: {load_metrics['executions']}")
+                st.text(f"Samengevoegde loads: {load_metrics['coalesced']}")
+
+        memo_metrics = get_aggregate_memo().metrics()
+        if is_admin():
+            with st.sidebar.expander("Aggregatie Cache"):
+                st.text(f"Bewaard: {memo_metrics['entries']}/{memo_metrics['maxsize']}")
+                st.text(f"Treffers: {memo_metrics['hits']}")
+                st.text(f"Missers: {memo_metrics['misses']}")
+                st.text(f"Weggegooid: {memo_metrics['evictions']}")
 
         # Render selected dashboard
         if not has_view_access(st.session_state.current_page):
             st.error("Je hebt geen toegang tot deze pagina")
         elif st.session_state.current_page == "Klanten":
-            render_client_analytics(orders_df)
+            render_client_analytics(store.get('orders'))
         elif st.session_state.current_page == "Machines":
-            render_machine_analytics(orders_df)
+            render_machine_analytics(store.get('orders'))
         elif st.session_state.current_page == "Medewerkers":
-            render_worker_analytics(worker_labours_df, orders_df)
+            render_worker_analytics(store.get('worker_labours'), store.get('orders'))
         elif st.session_state.current_page == "Financieel":
-            render_financial_analytics(orders_df, None)
+            render_financial_analytics(store.get('orders'), None)
         elif st.session_state.current_page == "Boekhouding Record Export":
             from views.accounting_export import render_accounting_export
-            render_accounting_export(orders_df)
+            render_accounting_export(store.get('orders'))
         elif st.session_state.current_page == "Parts":
             from views.parts_analysis import render_parts_analysis
-            render_parts_analysis(parts_df, used_parts_df)
+            render_parts_analysis(get_parts_star())
         elif st.session_state.current_page == "KPI Dashboard":
             from views.kpi_dashboard import render_kpi_dashboard
             render_kpi_dashboard()
@@ -117,6 +148,9 @@ else:
             from views.export_tool import render_export_tool
             render_export_tool()
 
+# Lopende en klare exports van deze gebruiker, op elke pagina te downloaden
+render_export_jobs()
+
 def is_port_in_use(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex(('localhost', port)) == 0
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analytics.demand_forecast import FORECAST_MODELS, MonthlyMatrix, forecast_demand
+
+def matrix(usage):
+    usage = np.atleast_2d(np.asarray(usage, dtype=float))
+    months = pd.period_range('2024-01', periods=usage.shape[1], freq='M')
+    return MonthlyMatrix(pd.Index([f'P{i}' for i in range(len(usage))]), months, usage)
+
+@pytest.mark.parametrize('model', FORECAST_MODELS)
+@pytest.mark.parametrize('n_months', [1, 11, 12, 13, 23, 24, 25])
+def test_intervals_finite_at_history_boundaries(model, n_months):
+    usage = np.arange(1, n_months + 1) % 12 + 1
+    result = forecast_demand(matrix([usage, np.zeros(n_months)]), horizon=3, model=model)
+    for values in (result.forecast, result.lower, result.upper):
+        assert values.shape == (2, 3)
+        assert np.isfinite(values).all()
+    assert (result.lower <= result.forecast).all() and (result.forecast <= result.upper).all()
+
+def test_twelve_months_uses_mean_with_spread():
+    usage = np.arange(1, 13)
+    result = forecast_demand(matrix(usage), horizon=3, model='seasonal_naive')
+    assert result.model[0] == 'gemiddelde'
+    np.testing.assert_allclose(result.forecast[0], usage.mean())
+    assert (result.upper[0] > result.forecast[0]).all()
+
+def test_thirteen_months_uses_seasonal_naive():
+    usage = np.arange(1, 14)
+    result = forecast_demand(matrix(usage), horizon=2, model='seasonal_naive')
+    assert result.model[0] == 'seasonal_naive'
+    np.testing.assert_allclose(result.forecast[0], [2, 3])
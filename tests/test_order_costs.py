@@ -0,0 +1,66 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from utils.database import ORDERS_QUERY
+from benchmarks.bench_order_costs import LEGACY_ORDERS_QUERY
+
+# Zonder Postgres: dezelfde query op een SQLite database in het geheugen, met
+# per order meerdere kosten-, arbeids- en onderdeelregels (zie ook
+# benchmarks.bench_order_costs voor de versie tegen een echte database)
+N_ORDERS, N_LINES = 50, 4
+
+@pytest.fixture
+def fixture_db():
+    rng = np.random.default_rng(7)
+    order_ids = np.arange(1, N_ORDERS + 1)
+    lines = np.repeat(order_ids, N_LINES)
+    tables = {
+        'clients': pd.DataFrame({'id': [1], 'name': ['Klant']}),
+        'machines': pd.DataFrame({'id': [1], 'model': ['Model'], 'brand': ['Merk'], 'vin': ['VIN']}),
+        'invoices': pd.DataFrame({'id': [1], 'number': ['F1']}),
+        'orders': pd.DataFrame({'id': order_ids, 'client_id': 1, 'machine_id': 1,
+                                'invoice_id': np.where(order_ids % 2 == 0, 1, None)}),
+        # De laatste order heeft geen kostenregels
+        'order_costs': pd.DataFrame({'order_id': lines, 'unit_price': rng.integers(1, 100, len(lines)).astype(float),
+                                     'amount': rng.integers(1, 5, len(lines)).astype(float),
+                                     'updated_at': '2025-01-01'}).query(f'order_id < {N_ORDERS}'),
+        'worker_labours': pd.DataFrame({'id': np.arange(len(lines)), 'order_id': lines, 'price_per_hour': 60.0,
+                                        'specified_time_id': np.arange(len(lines)), 'updated_at': '2025-01-01'}),
+        'time_v2s': pd.DataFrame({'id': np.arange(len(lines)), 'hours': rng.integers(0, 4, len(lines)),
+                                  'minutes': rng.integers(0, 60, len(lines))}),
+        'order_parts': pd.DataFrame({'order_id': lines, 'part_id': 1, 'amount': 1.0}),
+    }
+    conn = sqlite3.connect(':memory:')
+    for name, frame in tables.items():
+        frame.to_sql(name, conn, index=False)
+    yield conn, tables
+    conn.close()
+
+def expected_totals(tables):
+    """Totalen per order rechtstreeks uit de losse tabellen"""
+    costs = tables['order_costs']
+    parts = (costs['unit_price'] * costs['amount']).groupby(costs['order_id']).sum()
+    labours = tables['worker_labours'].merge(tables['time_v2s'], left_on='specified_time_id', right_on='id')
+    labour = ((labours['hours'] + labours['minutes'] / 60.0) * labours['price_per_hour']).groupby(labours['order_id']).sum()
+    return pd.DataFrame({'total_parts_cost': parts, 'total_labour_cost': labour}).reindex(tables['orders']['id'])
+
+def query_totals(conn, query):
+    df = pd.read_sql_query(query, conn)
+    assert df['id'].is_unique
+    return df.set_index('id')[['total_parts_cost', 'total_labour_cost']].astype(float)
+
+def test_orders_query_totals_match_per_table_sums(fixture_db):
+    conn, tables = fixture_db
+    result = query_totals(conn, ORDERS_QUERY.format(filter=''))
+    expected = expected_totals(tables)
+    assert len(result) == N_ORDERS
+    pd.testing.assert_frame_equal(result.loc[expected.index], expected, check_names=False)
+    assert np.isnan(result.loc[N_ORDERS, 'total_parts_cost'])
+
+def test_fixture_exposes_fan_out_of_legacy_query(fixture_db):
+    conn, tables = fixture_db
+    result = query_totals(conn, LEGACY_ORDERS_QUERY)
+    expected = expected_totals(tables)
+    # Kostenregels x arbeidsregels: elke som komt N_LINES keer mee
+    np.testing.assert_allclose(result.loc[1], expected.loc[1] * N_LINES)
@@ -0,0 +1,135 @@
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+import numpy as np
+import streamlit as st
+from utils.env_loader import load_env_var
+
+# Maximaal aantal bewaarde aggregaties over alle sessies samen
+AGGREGATE_MEMO_SIZE = int(load_env_var('AGGREGATE_MEMO_SIZE', '256'))
+
+class AggregateMemo:
+    """
+    Begrensde LRU opslag voor uitkomsten van pure aggregaties, gedeeld door
+    alle sessies. Is de opslag vol, dan valt de langst niet gebruikte uitkomst
+    weg. Houdt bij hoe vaak een uitkomst gevonden werd, berekend moest worden
+    en weggegooid werd.
+
+    on_evict wordt aangeroepen met elke uitkomst die wegvalt, bv. om een
+    bestand op te ruimen.
+    """
+
+    def __init__(self, maxsize=AGGREGATE_MEMO_SIZE, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            self._misses += 1
+
+        # Buiten de lock rekenen; twee gelijktijdige missers rekenen allebei, dat is onschuldig
+        result = func(*args, **kwargs)
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                # Een gelijktijdige misser was eerder klaar; de oude uitkomst valt weg
+                evicted.append(self._entries[key])
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False)[1])
+                self._evictions += 1
+        self._evict(evicted)
+        return result
+
+    def _evict(self, values):
+        if self.on_evict is not None:
+            for value in values:
+                self.on_evict(value)
+
+    def discard(self, key):
+        """Vergeet één uitkomst, zonder on_evict; return die uitkomst of None"""
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            evicted = list(self._entries.values())
+            self._entries.clear()
+        self._evict(evicted)
+
+    def metrics(self):
+        """Aantal treffers, missers, weggegooide en bewaarde uitkomsten"""
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+@st.cache_resource
+def get_aggregate_memo():
+    """De ene AggregateMemo van dit proces"""
+    return AggregateMemo()
+
+def normalize(value):
+    """
+    Maak een filterwaarde hashbaar en volgorde onafhankelijk: dicts en lijsten
+    worden gesorteerde tuples, numpy scalars gewone Python waarden. Filters
+    zonder waarde (None of een lege lijst) vallen weg, zoals in FilterIndex.
+    """
+    if isinstance(value, dict):
+        items = ((key, normalize(item)) for key, item in value.items())
+        return tuple(sorted((key, item) for key, item in items if item not in (None, ())))
+    if isinstance(value, (list, tuple, set, frozenset, np.ndarray)):
+        return tuple(sorted((normalize(item) for item in value), key=repr))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def cacheable_version(version) -> bool:
+    """
+    Of een dataversie een cachesleutel kan zijn: niet None, en bij een
+    samengestelde versie (een tuple, bv. van version_of per dataset) geen
+    None erin. Een None betekent een frame dat niet meer de huidige versie
+    is, en twee zulke frames zouden dezelfde sleutel krijgen.
+    """
+    if isinstance(version, tuple):
+        return all(cacheable_version(part) for part in version)
+    return version is not None
+
+def memoize_aggregate(func):
+    """
+    Decorator voor een pure aggregatie. De sleutel is de functie plus alle
+    argumenten, genormaliseerd; net als bij st.cache_resource tellen
+    argumenten met een naam die met _ begint niet mee. Die bevatten de data,
+    dus de functie moet ook een versie van die data als argument krijgen.
+    Zonder bruikbare versie (zie cacheable_version) wordt niet bewaard.
+
+    Een bewaarde uitkomst wordt gedeeld: pas die niet aan.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if not cacheable_version(bound.arguments.get('version')):
+            return func(*args, **kwargs)
+        key = (func.__module__, func.__qualname__) + tuple(
+            (name, normalize(value)) for name, value in bound.arguments.items() if not name.startswith('_')
+        )
+        return get_aggregate_memo().get_or_compute(key, func, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,65 @@
+import time
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Wat get teruggeeft: value is het resultaat voor key (current) of het laatst
+# klaargekomen resultaat van een eerdere sleutel, None als er nog niets is;
+# running zegt of er voor key nog gerekend wordt, error is de fout van key
+BackgroundResult = namedtuple('BackgroundResult', ['value', 'key', 'current', 'running', 'error'])
+
+class BackgroundCache:
+    """
+    Berekent een resultaat per sleutel (bv. een dataversie) één keer op een
+    achtergrondthread, voor alle sessies samen. get wacht nooit: zolang de
+    berekening voor een nieuwe sleutel loopt, krijgt de aanroeper het laatst
+    klaargekomen resultaat (of niets). Een mislukte berekening wordt na
+    retry_after seconden opnieuw geprobeerd.
+
+    De laatste maxsize resultaten blijven bewaard.
+    """
+
+    def __init__(self, maxsize=2, retry_after=60, name='background'):
+        self.maxsize = maxsize
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._running = set()
+        self._errors = {}
+        self._latest = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def get(self, key, func, *args) -> BackgroundResult:
+        """Het resultaat van func(*args) voor key als het klaar is; start anders de berekening"""
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return BackgroundResult(self._results[key], key, True, False, None)
+            error = self._errors.get(key)
+            if key not in self._running and (error is None or time.time() - error[0] > self.retry_after):
+                self._running.add(key)
+                self._executor.submit(self._run, key, func, args)
+                error = None
+            latest = self._results.get(self._latest)
+            return BackgroundResult(latest, self._latest, False, key in self._running,
+                                    error[1] if error is not None else None)
+
+    def _run(self, key, func, args):
+        try:
+            value = func(*args)
+        except Exception as e:
+            logger.exception("Achtergrondberekening voor %r mislukt", key)
+            with self._lock:
+                self._errors[key] = (time.time(), e)
+                self._running.discard(key)
+            return
+        with self._lock:
+            self._results[key] = value
+            self._latest = key
+            self._errors.pop(key, None)
+            self._running.discard(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
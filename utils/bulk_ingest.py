@@ -0,0 +1,90 @@
+import tempfile
+import pandas as pd
+
+# NULL marker in de COPY output, zodat lege strings en NULL van elkaar te onderscheiden zijn
+COPY_NULL = r'\N'
+
+# Resultaten groter dan dit spoolen naar een tijdelijk bestand in plaats van geheugen
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+def copy_query_to_frame(conn, query, params=None, dtypes=None):
+    """
+    Stream het resultaat van een query met COPY (query) TO STDOUT als CSV en
+    parse het in één keer met de gedeclareerde dtypes.
+
+    Parameters:
+    conn: psycopg2 connectie
+    query (str): SELECT query, mag %(naam)s parameters bevatten
+    params (dict): parameters voor de query
+    dtypes (dict): kolom -> dtype, zie read_copy_csv
+
+    Returns:
+    pd.DataFrame
+    """
+    with conn.cursor() as cur:
+        # COPY ondersteunt geen bind parameters, dus vullen we ze client-side in
+        sql = cur.mogrify(query, params).decode('utf-8') if params else query
+        sql = sql.strip().rstrip(';')
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+b') as buffer:
+            cur.copy_expert(
+                f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '{COPY_NULL}')",
+                buffer
+            )
+            buffer.seek(0)
+            return read_copy_csv(buffer, dtypes)
+
+def read_copy_csv(buffer, dtypes=None):
+    """
+    Parse CSV output van COPY naar een DataFrame met expliciete dtypes.
+
+    dtypes is een dict kolom -> dtype. Naast de gewone pandas dtypes
+    ('Int64', 'float64', 'category', 'string', 'boolean', ...) betekent
+    'datetime' een timestamp of datum kolom. Niet gedeclareerde kolommen
+    worden zoals bij read_sql_query afgeleid, waarbij Postgres booleans
+    ('t'/'f') als bool worden gelezen.
+    """
+    dtypes = dtypes or {}
+    date_columns = [col for col, dtype in dtypes.items() if dtype == 'datetime']
+    category_columns = [col for col, dtype in dtypes.items() if dtype == 'category']
+    csv_dtypes = {col: dtype for col, dtype in dtypes.items() if dtype not in ('datetime', 'category')}
+    # Datums en categoricals eerst als tekst, de conversie volgt in apply_dtypes
+    for col in date_columns + category_columns:
+        csv_dtypes[col] = object
+    # De C parser leest floats veel sneller dan nullable ints, omzetten gaat daarna in één stap
+    for col, dtype in dtypes.items():
+        if dtype == 'Int64':
+            csv_dtypes[col] = 'float64'
+
+    df = pd.read_csv(
+        buffer,
+        dtype=csv_dtypes,
+        keep_default_na=False,
+        na_values=[COPY_NULL],
+        true_values=['t'],
+        false_values=['f'],
+        encoding='utf-8',
+        low_memory=False
+    )
+    return apply_dtypes(df, dtypes)
+
+def apply_dtypes(df, dtypes):
+    """
+    Zet kolommen om naar de gedeclareerde dtypes. Ontbrekende kolommen worden
+    overgeslagen. Ook bruikbaar na een concat, waarbij categoricals met
+    verschillende categorieën terugvallen naar object.
+    """
+    for col, dtype in (dtypes or {}).items():
+        if col not in df.columns:
+            continue
+        if dtype == 'datetime':
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                # timestamptz kolommen hebben een UTC offset, die zetten we om naar UTC
+                first = df[col].dropna().head(1)
+                with_offset = bool(first.astype(str).str.contains(r'[ T]\d\d:\d\d.*[+-]\d\d(?::?\d\d)?$', regex=True).any())
+                df[col] = pd.to_datetime(df[col], format='ISO8601', utc=with_offset)
+        elif dtype == 'category':
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        elif str(df[col].dtype) != dtype:
+            df[col] = df[col].astype(dtype)
+    return df
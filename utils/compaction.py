@@ -0,0 +1,101 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Tekstkolommen met minder unieke waarden dan dit deel van het aantal rijen worden categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+# Kleinste nullable integer dtype die een bereik kan bevatten
+_INT_DTYPES = [
+    ('Int8', np.iinfo(np.int8)),
+    ('Int16', np.iinfo(np.int16)),
+    ('Int32', np.iinfo(np.int32)),
+]
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """Geheugengebruik van een DataFrame in bytes, inclusief de Python strings"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def _compact_integers(series):
+    values = series.dropna()
+    if values.empty:
+        return series
+    low, high = values.min(), values.max()
+    for dtype, info in _INT_DTYPES:
+        if info.min <= low and high <= info.max:
+            return series.astype(dtype)
+    return series.astype('Int64')
+
+def _compact_column(series, category_max_ratio):
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+        return series
+    if pd.api.types.is_bool_dtype(dtype):
+        return series.astype('boolean')
+    if pd.api.types.is_integer_dtype(dtype):
+        return _compact_integers(series)
+    if dtype == object:
+        kind = pd.api.types.infer_dtype(series, skipna=True)
+        if kind == 'boolean':
+            # Vlaggen als washed en printed met NULLs
+            return series.astype('boolean')
+        if kind == 'string' and series.nunique() <= category_max_ratio * len(series):
+            return series.astype('category')
+    return series
+
+def compact_frame(df: pd.DataFrame, category_max_ratio: float = CATEGORY_MAX_RATIO, name: str = None) -> pd.DataFrame:
+    """
+    Maak een geladen frame compacter: tekst met weinig unieke waarden wordt
+    categorical, integers krijgen de kleinste nullable dtype die past en
+    booleans worden nullable. Floats blijven float64: het zijn vooral bedragen,
+    en sommen in float32 verliezen centen.
+
+    Het aantal bytes voor en na komt in df.attrs['memory'] en in de log.
+
+    Let op: groupby op categoricals moet met observed=True, anders komen ook
+    categorieën zonder rijen in het resultaat.
+    """
+    before = frame_memory(df)
+    columns = {col: _compact_column(df[col], category_max_ratio) for col in df.columns}
+    compact = pd.DataFrame(columns, index=df.index)
+    compact.attrs = dict(df.attrs)
+    after = frame_memory(compact)
+    compact.attrs['memory'] = {'before': before, 'after': after}
+    logger.info("Dataset %s gecompacteerd van %.1f MB naar %.1f MB", name or '', before / 1e6, after / 1e6)
+    return compact
+
+def align_dtypes(df: pd.DataFrame, reference: pd.DataFrame):
+    """
+    Zet de kolommen van df (bv. de rijen van een delta load) om naar de dtypes
+    van het gecompacteerde frame reference, zodat een concat die dtypes houdt
+    en het geheel niet opnieuw gecompacteerd hoeft te worden. Categoricals
+    krijgen aan beide kanten de unie van de categorieën; dat raakt alleen de
+    categorieën, niet de codes. Een kolom die niet past (bv. een getal buiten
+    het bereik van Int16) blijft zoals hij is, de concat verbreedt hem dan.
+
+    Return (df, reference) met de omgezette kolommen.
+    """
+    aligned, widened = {}, {}
+    for col in df.columns.intersection(reference.columns):
+        target, series = reference[col].dtype, df[col]
+        if series.dtype == target:
+            continue
+        if isinstance(target, pd.CategoricalDtype):
+            values = series.dropna().unique()
+            new = pd.Index(values).difference(target.categories) if len(values) else pd.Index([])
+            if len(new):
+                widened[col] = reference[col].cat.add_categories(new)
+                target = widened[col].dtype
+            aligned[col] = pd.Categorical(series, dtype=target)
+            continue
+        try:
+            aligned[col] = series.astype(target)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    if aligned:
+        df = df.assign(**aligned)
+    if widened:
+        reference = reference.assign(**widened)
+    return df, reference
@@ -18,7 +18,7 @@ def calculate_order_metrics(orders_df):
 
 def process_worker_productivity(worker_labours_df):
     """Calculate worker productivity metrics"""
-    productivity = worker_labours_df.groupby('worker_name').agg({
+    productivity = worker_labours_df.groupby('worker_name', observed=True).agg({
         'order_id': 'count',
         'price_per_hour': 'mean'
     }).reset_index()
@@ -27,7 +27,7 @@ def process_worker_productivity(worker_labours_df):
 
 def get_machine_maintenance_stats(orders_df, machines_df):
     """Calculate machine maintenance statistics"""
-    maintenance_stats = orders_df[orders_df['category'] == 'maintenance'].groupby('machine_id').agg({
+    maintenance_stats = orders_df[orders_df['category'] == 'maintenance'].groupby('machine_id', observed=True).agg({
         'id': 'count',
         'labour_cost_adjusted': 'sum'
     }).reset_index()
@@ -49,7 +49,7 @@ def calculate_sold_parts_data(df):
     df['final_price'] = df['base_price'] * (1 - df['discount_manual_percentage'] / 100) * (1 - df['discount_extra_percentage'] / 100) * (1 - df['client_part_discount_percentage'] / 100)
     
     # Group by delivery note and client
-    grouped = df.groupby(['delivery_note_id', 'order_date', 'client_name', 'part_number', 'part_description']).agg(
+    grouped = df.groupby(['delivery_note_id', 'order_date', 'client_name', 'part_number', 'part_description'], observed=True).agg(
         total_amount=('amount', 'sum'),
         total_unit_price=('unit_price', 'sum'),
         total_base_price=('base_price', 'sum'),
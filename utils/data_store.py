@@ -0,0 +1,219 @@
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import streamlit as st
+from utils.env_loader import load_env_var
+from utils.database import timed_load, DATA_LOADERS
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Met copy-on-write delen afgeleide frames (filters, assign, kolomselecties) het
+# geheugen met de gedeelde frames tot er in geschreven wordt. Een view die een
+# kolom toevoegt aan een afgeleid frame raakt de gedeelde data dus nooit.
+pd.set_option('mode.copy_on_write', True)
+
+# Elke dataset wordt na dit aantal seconden op de achtergrond herladen
+REFRESH_INTERVAL = int(load_env_var('DATA_REFRESH_INTERVAL', '3600'))
+
+# Eén geladen versie van een dataset
+Dataset = namedtuple('Dataset', ['frame', 'version', 'loaded_at', 'duration'])
+
+# Datasets die elke pagina nodig heeft. Ze worden pas geladen als een pagina die
+# ze gebruikt voor het eerst geopend wordt; de Export Tool laadt zelf afhankelijk
+# van het gekozen export type.
+VIEW_DATASETS = {
+    'Klanten': ['orders'],
+    'Parts': ['parts', 'orders'],
+    'Machines': ['orders'],
+    'Medewerkers': ['worker_labours', 'orders'],
+    'Financieel': ['orders'],
+    'Boekhouding Record Export': ['orders'],
+    'KPI Dashboard': ['orders', 'worker_labours'],
+    'Export Tool': [],
+}
+
+class DataStore:
+    """
+    Procesbrede, read-only opslag van de geladen datasets. Elke sessie krijgt
+    dezelfde DataFrame objecten in plaats van een eigen kopie, zodat het
+    geheugen niet meegroeit met het aantal gebruikers.
+
+    Views mogen de frames niet in-place aanpassen; ze werken op afgeleide
+    frames (bv. via assign), die dankzij copy-on-write goedkoop zijn.
+
+    Een nieuwe versie van een dataset wordt in één keer ingeruild, lezers
+    krijgen dus altijd de laatste volledige versie zonder te wachten.
+
+    Datasets worden pas bij de eerste toegang geladen, zodat een gebruiker
+    alleen betaalt voor de data die de geopende pagina echt toont.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datasets = {}
+        self._errors = {}
+        self._version = 0
+        self._flights = SingleFlight()
+
+    def publish(self, name, frame, duration=None):
+        """
+        Ruil een dataset in voor een nieuwe versie. De laadtijd komt uit
+        frame.attrs['loaded_at'] als de loader die zet (bv. bij een snapshot).
+        """
+        loaded_at = frame.attrs.get('loaded_at')
+        loaded_at = pd.Timestamp.fromtimestamp(loaded_at) if loaded_at else pd.Timestamp.now()
+        with self._lock:
+            self._version += 1
+            datasets = dict(self._datasets)
+            datasets[name] = Dataset(frame, self._version, loaded_at, duration)
+            # Eén toewijzing, zodat lezers zonder lock altijd een consistente dict zien
+            self._datasets = datasets
+            self._errors.pop(name, None)
+
+    def record_error(self, name, error):
+        with self._lock:
+            self._errors[name] = (pd.Timestamp.now(), str(error))
+
+    def _load(self, name):
+        if name not in self._datasets:
+            frame, duration = timed_load(DATA_LOADERS[name])
+            self.publish(name, frame, duration)
+
+    def get(self, name):
+        """Haal de laatste versie van een gedeelde dataset op, bij de eerste toegang wordt die geladen"""
+        dataset = self._datasets.get(name)
+        if dataset is None:
+            # Sessies die tegelijk dezelfde dataset openen wachten op één load
+            self._flights.do(name, self._load, name)
+            dataset = self._datasets[name]
+        return dataset.frame
+
+    def get_many(self, names):
+        """Haal meerdere datasets op, ontbrekende worden parallel geladen"""
+        missing = [name for name in names if name not in self._datasets]
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=len(missing), thread_name_prefix='data_store') as executor:
+                list(executor.map(self.get, missing))
+        return [self.get(name) for name in names]
+
+    def info(self, name):
+        """Return de Dataset met versie en laadtijd, of None"""
+        return self._datasets.get(name)
+
+    def version_of(self, frame):
+        """Versie van de dataset waarvan frame de huidige versie is, anders None"""
+        for dataset in self._datasets.values():
+            if dataset.frame is frame:
+                return dataset.version
+        return None
+
+    def due(self, max_age=REFRESH_INTERVAL):
+        """Namen van geladen datasets die ouder zijn dan max_age seconden"""
+        now = pd.Timestamp.now()
+        return [
+            name for name, dataset in self._datasets.items()
+            if (now - dataset.loaded_at).total_seconds() > max_age
+        ]
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def loaded_at(self):
+        """Laadtijd van de oudste dataset, dus hoe actueel de data minstens is"""
+        datasets = self._datasets
+        if not datasets:
+            return None
+        return min(dataset.loaded_at for dataset in datasets.values())
+
+    @property
+    def timings(self):
+        return {name: dataset.duration for name, dataset in self._datasets.items() if dataset.duration is not None}
+
+    @property
+    def errors(self):
+        return dict(self._errors)
+
+class DataRefresher(threading.Thread):
+    """
+    Achtergrondthread die elke geladen dataset herlaadt zodra die ouder is dan
+    REFRESH_INTERVAL en het resultaat in de DataStore publiceert. Mislukt een
+    reload, dan blijft de vorige versie staan en wordt het later opnieuw
+    geprobeerd: eerst na poll_interval seconden, daarna telkens twee keer zo
+    laat, tot hoogstens max_backoff seconden (standaard interval). Zo wordt
+    een database die plat ligt niet elke poll met een volledige load belast.
+    """
+
+    def __init__(self, store, interval=REFRESH_INTERVAL, poll_interval=30, max_backoff=None):
+        super().__init__(name='data_refresher', daemon=True)
+        self.store = store
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff if max_backoff is not None else interval
+        self._failures = {}
+        self._stop_event = threading.Event()
+
+    def backoff(self, name):
+        """Seconden die na de laatste mislukte reload van name gewacht wordt"""
+        failures = self._failures.get(name, 0)
+        return min(self.poll_interval * 2 ** (failures - 1), self.max_backoff) if failures else 0
+
+    def waiting(self, name):
+        """Of name na een mislukte reload nog moet wachten"""
+        error = self.store.errors.get(name)
+        if error is None:
+            return False
+        return (pd.Timestamp.now() - error[0]).total_seconds() < self.backoff(name)
+
+    def refresh(self, name):
+        try:
+            frame, duration = timed_load(DATA_LOADERS[name])
+        except Exception as e:
+            self._failures[name] = self._failures.get(name, 0) + 1
+            logger.exception("Herladen van dataset %s mislukt, volgende poging over %d s", name, self.backoff(name))
+            self.store.record_error(name, e)
+            return
+        self._failures.pop(name, None)
+        self.store.publish(name, frame, duration)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            for name in self.store.due(self.interval):
+                if self._stop_event.is_set():
+                    break
+                if not self.waiting(name):
+                    self.refresh(name)
+            self._stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+@st.cache_resource
+def get_data_store():
+    """De ene DataStore van dit proces, gedeeld door alle sessies"""
+    return DataStore()
+
+@st.cache_resource
+def get_data_refresher():
+    """Start de achtergrondrefresher één keer per proces"""
+    refresher = DataRefresher(get_data_store())
+    refresher.start()
+    return refresher
+
+def get_shared_data(view_name=None):
+    """
+    Return de gedeelde DataStore en zorg dat de DataRefresher draait. Met
+    view_name worden de datasets van die pagina (zie VIEW_DATASETS) vooraf
+    parallel geladen; andere datasets laden pas als ze opgevraagd worden.
+    Alleen de eerste toegang tot een dataset wacht op het laden, daarna
+    houdt de refresher die actueel.
+    """
+    store = get_data_store()
+    if view_name is not None:
+        store.get_many(VIEW_DATASETS.get(view_name, []))
+    get_data_refresher()
+    return store
@@ -1,54 +1,521 @@
 import os
+import time
+import threading
+from collections import deque
 import pandas as pd
 import streamlit as st
 from pathlib import Path
 import psycopg2
-from psycopg2.pool import SimpleConnectionPool
+import psycopg2.extensions
 from contextlib import contextmanager
 from utils.env_loader import load_env_var
+from utils.snapshots import snapshot_store
+from utils.bulk_ingest import copy_query_to_frame
+from utils.compaction import compact_frame, align_dtypes
+from utils.derived_columns import add_date_parts, DATE_COLUMNS
+from utils.single_flight import SingleFlight, single_flight
+
+class PoolTimeoutError(Exception):
+    """Er kwam binnen de wachttijd geen connectie vrij in de pool"""
+
+class ConnectionPool:
+    """
+    Thread-safe connection pool met health checks.
+
+    Een connectie wordt voor uitgifte gecontroleerd met een ping (pre_ping) en
+    vervangen als ze ouder is dan max_age seconden. Bij het aanmaken wordt de
+    pool opgewarmd tot min_conn connecties. Houdt metrics bij over gebruik en
+    wachttijd zodat de app die kan tonen.
+    """
+
+    def __init__(self, min_conn, max_conn, max_age=1800, pre_ping=True, acquire_timeout=30, **conn_kwargs):
+        self.min_conn = min_conn
+        self.max_conn = max_conn
+        self.max_age = max_age
+        self.pre_ping = pre_ping
+        self.acquire_timeout = acquire_timeout
+        self._conn_kwargs = conn_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = deque()         # vrije connecties, laatst teruggegeven achteraan
+        self._created_at = {}        # id(connectie) -> aanmaaktijd
+        self._total = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._recycled = 0
+        self._failed_pings = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._conn_kwargs)
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _is_healthy(self, conn):
+        """Controleer of een connectie nog bruikbaar is"""
+        if conn.closed:
+            return False
+        if time.monotonic() - self._created_at.get(id(conn), 0) > self.max_age:
+            with self._cond:
+                self._recycled += 1
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._cond:
+                self._failed_pings += 1
+            return False
+
+    def warm_up(self):
+        """Open connecties tot de pool min_conn connecties bevat"""
+        with self._cond:
+            missing = max(self.min_conn - self._total, 0)
+            self._total += missing
+        for _ in range(missing):
+            try:
+                conn = self._connect()
+            except psycopg2.Error:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def getconn(self):
+        """Haal een gezonde connectie op, wacht tot acquire_timeout als de pool vol zit"""
+        start = time.monotonic()
+        with self._cond:
+            self._waiters += 1
+            try:
+                while True:
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._total < self.max_conn:
+                        self._total += 1
+                        conn = None
+                        break
+                    remaining = self.acquire_timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Geen database connectie beschikbaar na {self.acquire_timeout} seconden"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters -= 1
+            waited = time.monotonic() - start
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        # Verbinden en pingen gebeurt buiten de lock
+        try:
+            if conn is not None and not self._is_healthy(conn):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except psycopg2.Error:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Geef een connectie terug aan de pool"""
+        if not conn.closed and not close:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        with self._cond:
+            self._in_use -= 1
+            if conn.closed or close:
+                self._total -= 1
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        """Sluit alle vrije connecties"""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+                self._total -= 1
+
+    def metrics(self):
+        """Return een snapshot van de pool metrics"""
+        with self._cond:
+            return {
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'total': self._total,
+                'max_conn': self.max_conn,
+                'waiters': self._waiters,
+                'checkouts': self._checkouts,
+                'avg_wait': self._total_wait / self._checkouts if self._checkouts else 0.0,
+                'max_wait': self._max_wait,
+                'recycled': self._recycled,
+                'failed_pings': self._failed_pings,
+            }
 
 # Globale connection pool
 _pool = None
+_pool_lock = threading.Lock()
 
-def get_connection_pool(min_conn=1, max_conn=10):
-    """Maak een connection pool aan voor de database"""
+def get_connection_pool(min_conn=2, max_conn=10):
+    """Maak de connection pool aan voor de database en warm deze op"""
     global _pool
-    if _pool is None:
-        _pool = SimpleConnectionPool(
-            min_conn,
-            max_conn,
-            host=load_env_var('DB_HOST'),
-            port=load_env_var('DB_PORT'),
-            database=load_env_var('DB_NAME'),
-            user=load_env_var('DB_USER'),
-            password=load_env_var('DB_PASSWORD')
-        )
+    with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(
+                int(load_env_var('DB_POOL_MIN', str(min_conn))),
+                int(load_env_var('DB_POOL_MAX', str(max_conn))),
+                max_age=int(load_env_var('DB_POOL_MAX_AGE', '1800')),
+                host=load_env_var('DB_HOST'),
+                port=load_env_var('DB_PORT'),
+                database=load_env_var('DB_NAME'),
+                user=load_env_var('DB_USER'),
+                password=load_env_var('DB_PASSWORD')
+            )
+            pool.warm_up()
+            _pool = pool
     return _pool
 
+def get_pool_metrics():
+    """Haal de metrics van de connection pool op, None als er nog geen pool is"""
+    return _pool.metrics() if _pool is not None else None
+
+def get_statement_timeout(loader_name=None):
+    """
+    Bepaal de statement_timeout in milliseconden voor een loader.
+    DB_STATEMENT_TIMEOUT_<LOADER> gaat voor op de algemene DB_STATEMENT_TIMEOUT.
+    """
+    default = load_env_var('DB_STATEMENT_TIMEOUT', '120000')
+    if loader_name is None:
+        return int(default)
+    return int(load_env_var(f'DB_STATEMENT_TIMEOUT_{loader_name.upper()}', default))
+
 @contextmanager
-def get_db_connection():
-    """Context manager voor database connecties"""
+def get_db_connection(statement_timeout=None):
+    """Context manager voor database connecties, optioneel met statement_timeout in ms"""
     pool = get_connection_pool()
     conn = pool.getconn()
     try:
+        if statement_timeout:
+            # SET LOCAL geldt alleen voor deze transactie, putconn sluit die af
+            with conn.cursor() as cur:
+                cur.execute('SET LOCAL statement_timeout = %s', (int(statement_timeout),))
         yield conn
     finally:
         pool.putconn(conn)
 
-def execute_query(query, params=None):
-    """Voer een query uit en return de resultaten als DataFrame"""
-    with get_db_connection() as conn:
+# Loaders met gedeclareerde dtypes lezen via COPY, tenzij dat hier uitgezet wordt
+BULK_INGEST = load_env_var('DB_BULK_INGEST', '1') == '1'
+
+def execute_query(query, params=None, statement_timeout=None, dtypes=None):
+    """
+    Voer een query uit en return de resultaten als DataFrame. Met dtypes wordt
+    het resultaat via COPY gestreamd en direct met die dtypes geparsed.
+    """
+    with get_db_connection(statement_timeout) as conn:
+        if dtypes is not None and BULK_INGEST:
+            return copy_query_to_frame(conn, query, params, dtypes)
         return pd.read_sql_query(query, conn, params=params)
 
+# Voegt gelijktijdige identieke loads samen, zodat een koude cache na een deploy
+# of refresh niet tot N keer dezelfde zware query op de productiedatabase leidt
+_load_flights = SingleFlight()
+
+def get_load_metrics():
+    """Metrics van de single-flight laag: uitvoeringen en samengevoegde aanroepen"""
+    return _load_flights.metrics()
+
 @st.cache_data(ttl=3600)
-def load_data(query, params=None):
+@single_flight(_load_flights)
+def load_data(query, params=None, statement_timeout=None):
     """Laad data met caching"""
-    return execute_query(query, params)
+    return execute_query(query, params, statement_timeout)
 
-@st.cache_data(ttl=3600)
-def load_orders_data():
-    """Laad orders data"""
-    query = """
+class IncrementalLoader:
+    """
+    Houdt het laatst geladen DataFrame en een watermark bij, zodat een reload
+    alleen nieuwe of gewijzigde rijen ophaalt en die op de sleutelkolom in het
+    bestaande frame samenvoegt. Na reconcile_interval seconden volgt een
+    volledige reload, zodat ook verwijderde rijen verdwijnen.
+
+    De query bevat een {filter} placeholder: leeg bij een volledige load, een
+    WHERE clausule op %(since)s bij een delta load. watermark_column is één
+    kolom of een lijst; bij een lijst is de watermark de laatste tijd over
+    alle kolommen, bv. ook die van gejoinde kosten- of arbeidsregels, zodat
+    een wijziging daarin niet bij elke poll opnieuw opgehaald wordt.
+
+    Na een volledige load worden de datumkolommen afgeleid (zie
+    add_date_parts), wordt het frame gecompacteerd (zie compact_frame) en als
+    snapshot weggeschreven. Bij een delta load gebeurt dat alleen voor de
+    nieuwe rijen, die de dtypes van het bestaande frame krijgen (zie
+    align_dtypes); een snapshot volgt dan hoogstens om de SNAPSHOT_INTERVAL
+    seconden. Een nieuw proces start vanaf de nieuwste snapshot en gaat daarna
+    verder met delta loads.
+    """
+
+    def __init__(self, name, query, delta_filter, key, watermark_column,
+                 reconcile_interval=6 * 3600, overlap=300, dtypes=None):
+        self.name = name
+        self.query = query
+        self.dtypes = dtypes
+        self.delta_filter = delta_filter
+        self.key = key
+        self.watermark_column = watermark_column
+        self.reconcile_interval = reconcile_interval
+        # Overlap vangt transacties op die nog liepen toen de vorige load startte
+        self.overlap = pd.Timedelta(seconds=overlap)
+        self._lock = threading.Lock()
+        self._frame = None
+        self._watermark = None
+        self._last_full_load = 0.0
+        self._loaded_at = None
+        self._last_snapshot = 0.0
+        self._restored = False
+
+    def _restore_snapshot(self):
+        df, manifest = snapshot_store.read_latest(self.name, self.query, max_age=SNAPSHOT_MAX_AGE)
+        if df is None:
+            return
+        # Ook snapshots van voor de afgeleide kolommen krijgen ze zo
+        self._frame = add_date_parts(df, DATE_COLUMNS.get(self.name, []))
+        self._loaded_at = manifest['loaded_at']
+        self._last_full_load = manifest.get('last_full_load', manifest['loaded_at'])
+        self._restored = True
+        self._frame.attrs['loaded_at'] = self._loaded_at
+        if manifest.get('memory'):
+            self._frame.attrs['memory'] = manifest['memory']
+        self._update_watermark()
+
+    def _write_snapshot(self):
+        self._last_snapshot = time.time()
+        snapshot_store.write(
+            self.name, self._frame, self.query, loaded_at=self._loaded_at,
+            metadata={'last_full_load': self._last_full_load, 'memory': self._frame.attrs.get('memory')}
+        )
+
+    def _update_watermark(self):
+        columns = [self.watermark_column] if isinstance(self.watermark_column, str) else self.watermark_column
+        # Watermark als naieve UTC tijd, net als de timestamp kolommen in de database
+        stamps = [pd.to_datetime(self._frame[column], utc=True).max() for column in columns if column in self._frame]
+        stamps = [stamp for stamp in stamps if pd.notna(stamp)]
+        if stamps:
+            self._watermark = max(stamps).tz_convert(None)
+
+    def _load_full(self):
+        self._frame = execute_query(
+            self.query.format(filter=''),
+            statement_timeout=get_statement_timeout(self.name),
+            dtypes=self.dtypes
+        )
+        self._last_full_load = self._loaded_at = time.time()
+        self._frame = compact_frame(add_date_parts(self._frame, DATE_COLUMNS.get(self.name, [])), name=self.name)
+        self._update_watermark()
+
+    def _load_delta(self):
+        delta = execute_query(
+            self.query.format(filter=self.delta_filter),
+            params={'since': (self._watermark - self.overlap).to_pydatetime()},
+            statement_timeout=get_statement_timeout(self.name),
+            dtypes=self.dtypes
+        )
+        self._loaded_at = time.time()
+        if delta.empty:
+            return
+        # Alleen de nieuwe rijen afleiden en omzetten, het bestaande frame is al compact
+        delta = add_date_parts(delta, DATE_COLUMNS.get(self.name, []))
+        delta, frame = align_dtypes(delta, self._frame)
+        unchanged = frame[~frame[self.key].isin(delta[self.key])]
+        attrs = dict(self._frame.attrs)
+        self._frame = pd.concat([unchanged, delta], ignore_index=True)
+        self._frame.attrs = attrs
+        self._update_watermark()
+
+    def load(self):
+        """Return het actuele frame, via een delta load of een volledige reconcile"""
+        with self._lock:
+            if self._frame is None:
+                self._restore_snapshot()
+            reconcile_due = time.time() - self._last_full_load > self.reconcile_interval
+            if self._frame is None or self._watermark is None or reconcile_due:
+                self._load_full()
+                snapshot_due = True
+            elif self._restored:
+                # Verse snapshot van een vorig proces, direct bruikbaar
+                self._restored = False
+                return self._frame
+            else:
+                self._load_delta()
+                snapshot_due = time.time() - self._last_snapshot > SNAPSHOT_INTERVAL
+            self._frame.attrs['loaded_at'] = self._loaded_at
+            if snapshot_due:
+                self._write_snapshot()
+            return self._frame
+
+    def reset(self):
+        """Vergeet het frame zodat de volgende load volledig is"""
+        with self._lock:
+            self._frame = None
+            self._watermark = None
+            self._restored = False
+
+SNAPSHOT_MAX_AGE = int(load_env_var('SNAPSHOT_MAX_AGE', '3600'))
+
+# Na een delta load wordt hoogstens om de zoveel seconden een snapshot geschreven
+SNAPSHOT_INTERVAL = int(load_env_var('SNAPSHOT_INTERVAL', '600'))
+
+def load_with_snapshot(name, query, dtypes=None):
+    """
+    Laad een dataset uit de nieuwste snapshot als die jonger is dan
+    SNAPSHOT_MAX_AGE, anders uit de database en schrijf een nieuwe snapshot weg
+    """
+    df, manifest = snapshot_store.read_latest(name, query, max_age=SNAPSHOT_MAX_AGE)
+    if df is None:
+        df = execute_query(query, statement_timeout=get_statement_timeout(name), dtypes=dtypes)
+        df = compact_frame(add_date_parts(df, DATE_COLUMNS.get(name, [])), name=name)
+        manifest = snapshot_store.write(name, df, query, metadata={'memory': df.attrs['memory']})
+    else:
+        df = add_date_parts(df, DATE_COLUMNS.get(name, []))
+        if manifest.get('memory'):
+            df.attrs['memory'] = manifest['memory']
+    # Echte laadtijd van de data, ook als die uit een snapshot komt
+    df.attrs['loaded_at'] = manifest['loaded_at'] if manifest else time.time()
+    return df
+
+# Gedeclareerde dtypes per loader voor de COPY ingestie. Tekstkolommen staan er
+# expliciet in zodat bv. numerieke ordernummers niet als getal ingelezen worden.
+ORDER_TEXT_DTYPES = {
+    'number': 'object',
+    'warranty_number': 'object',
+    'description': 'object',
+    'diagnosis': 'object',
+    'comment_worker': 'object',
+    'comment_office': 'object',
+    'comment_invoice': 'object',
+    'category': 'object',
+    'status': 'object',
+    'client_name': 'object',
+    'machine_model': 'object',
+    'machine_brand': 'object',
+    'machine_vin': 'object',
+}
+
+# Vlaggen van een order, als nullable boolean zodat NULLs niet naar object of float leiden
+ORDER_FLAG_DTYPES = {
+    'appointment': 'boolean',
+    'replacement_vehicle': 'boolean',
+    'on_location': 'boolean',
+    'printed': 'boolean',
+    'washed': 'boolean',
+    'client_active': 'boolean',
+    'major_maintenance': 'boolean',
+    'minor_maintenance': 'boolean',
+    'repeated_repair': 'boolean',
+    'registered_at_garage': 'boolean',
+}
+
+ORDERS_DTYPES = {
+    **ORDER_TEXT_DTYPES,
+    **ORDER_FLAG_DTYPES,
+    'zero_invoice': 'boolean',
+    'id': 'Int64',
+    'client_id': 'Int64',
+    'machine_id': 'Int64',
+    'invoice_id': 'Int64',
+    'defect_date': 'datetime',
+    'created_at': 'datetime',
+    'updated_at': 'datetime',
+    'invoice_number_from_invoice': 'object',
+    'total_parts_cost': 'float64',
+    'total_labour_cost': 'float64',
+    'costs_updated_at': 'datetime',
+    'labours_updated_at': 'datetime',
+}
+
+WORKER_LABOURS_DTYPES = {
+    'id': 'Int64',
+    'order_id': 'Int64',
+    'worker_id': 'Int64',
+    'specified_time_id': 'Int64',
+    'price_per_hour': 'float64',
+    'worker_name': 'object',
+    'order_number': 'object',
+    'category': 'object',
+    'created_at': 'datetime',
+    'hours': 'float64',
+    'minutes': 'float64',
+    'total_hours': 'float64',
+    'updated_at': 'datetime',
+    'order_updated_at': 'datetime',
+    'time_updated_at': 'datetime',
+}
+
+# Fact tabel van het parts sterschema, ordervelden komen uit de orders dataset
+PARTS_DTYPES = {
+    'id': 'Int64',
+    'order_id': 'Int64',
+    'part_number': 'object',
+    'part_description': 'object',
+    'part_price': 'float64',
+    'part_brand': 'object',
+    'part_quantity': 'float64',
+}
+
+_reconcile_interval = int(load_env_var('DB_FULL_RECONCILE_INTERVAL', str(6 * 3600)))
+
+# Kosten worden per order vooraf geaggregeerd en daarna één keer gejoind. Zo
+# ontstaat er geen kruisproduct van kostenregels x arbeidsregels x onderdelen
+# per order, wat de totalen vermenigvuldigde. De query definieert zelf een
+# order_scope CTE met de orders waarvoor kosten nodig zijn.
+ORDER_COSTS_CTES = """
+    parts_costs AS (
+        SELECT oc.order_id, SUM(oc.unit_price * oc.amount) as total_parts_cost,
+            MAX(oc.updated_at) as costs_updated_at
+        FROM order_costs oc
+        JOIN order_scope os ON os.id = oc.order_id
+        GROUP BY oc.order_id
+    ),
+    labour_costs AS (
+        SELECT wl.order_id, SUM(st.hours * wl.price_per_hour + st.minutes / 60.0 * wl.price_per_hour) as total_labour_cost,
+            MAX(wl.updated_at) as labours_updated_at
+        FROM worker_labours wl
+        JOIN order_scope os ON os.id = wl.order_id
+        LEFT JOIN time_v2s st ON wl.specified_time_id = st.id
+        GROUP BY wl.order_id
+    )
+"""
+
+ORDERS_QUERY = """
+    WITH order_scope AS (
+        SELECT o.id FROM orders o
+        {filter}
+    ),""" + ORDER_COSTS_CTES + """
     SELECT 
     o.*,
     c.name as client_name,
@@ -56,23 +523,42 @@ def load_orders_data():
     m.brand as machine_brand,
     m.vin as machine_vin,
     COALESCE(i.number, '') as invoice_number_from_invoice,
-    SUM(oc.unit_price * oc.amount) as total_parts_cost,
-    SUM(st.hours * wl.price_per_hour + st.minutes / 60.0 * wl.price_per_hour) as total_labour_cost
-    FROM orders o
+    pc.total_parts_cost,
+    lc.total_labour_cost,
+    pc.costs_updated_at,
+    lc.labours_updated_at
+    FROM order_scope os
+    JOIN orders o ON o.id = os.id
     LEFT JOIN clients c ON o.client_id = c.id
     LEFT JOIN machines m ON o.machine_id = m.id
     LEFT JOIN invoices i ON o.invoice_id = i.id
-    LEFT JOIN order_costs oc ON o.id = oc.order_id
-    LEFT JOIN worker_labours wl ON o.id = wl.order_id
-    LEFT JOIN time_v2s st ON wl.specified_time_id = st.id
-    GROUP BY o.id, c.name, m.model, m.brand, m.vin, i.number
+    LEFT JOIN parts_costs pc ON o.id = pc.order_id
+    LEFT JOIN labour_costs lc ON o.id = lc.order_id
     """
-    return load_data(query)
 
-@st.cache_data(ttl=3600)
-def load_worker_labours_data():
-    """Laad worker labour data"""
-    query = """
+# Een order is gewijzigd als de order zelf of een van zijn kosten- of arbeidsregels is aangepast
+ORDERS_DELTA_FILTER = """
+    WHERE o.id IN (
+        SELECT id FROM orders WHERE updated_at > %(since)s
+        UNION SELECT order_id FROM order_costs WHERE updated_at > %(since)s
+        UNION SELECT order_id FROM worker_labours WHERE updated_at > %(since)s
+    )
+    """
+
+_orders_loader = IncrementalLoader(
+    'orders',
+    query=ORDERS_QUERY,
+    delta_filter=ORDERS_DELTA_FILTER,
+    key='id',
+    # Ook kosten- en arbeidsregels tellen mee, zie ORDERS_DELTA_FILTER
+    watermark_column=['updated_at', 'costs_updated_at', 'labours_updated_at'],
+    reconcile_interval=_reconcile_interval,
+    dtypes=ORDERS_DTYPES
+)
+
+_worker_labours_loader = IncrementalLoader(
+    'worker_labours',
+    query="""
     SELECT DISTINCT
         wl.id,
         wl.order_id,
@@ -85,115 +571,70 @@ def load_worker_labours_data():
         o.created_at,
         st.hours,
         st.minutes,
-        (COALESCE(st.hours, 0) + COALESCE(st.minutes, 0) / 60.0) as total_hours
+        (COALESCE(st.hours, 0) + COALESCE(st.minutes, 0) / 60.0) as total_hours,
+        wl.updated_at,
+        o.updated_at as order_updated_at,
+        st.updated_at as time_updated_at
     FROM worker_labours wl
     JOIN workers w ON wl.worker_id = w.id
     JOIN orders o ON wl.order_id = o.id
     LEFT JOIN time_v2s st ON wl.specified_time_id = st.id
-    """
-    return load_data(query)
+    {filter}
+    """,
+    delta_filter="""
+    WHERE wl.updated_at > %(since)s
+        OR o.updated_at > %(since)s
+        OR st.updated_at > %(since)s
+    """,
+    key='id',
+    # Dezelfde drie tabellen als in de delta filter
+    watermark_column=['updated_at', 'order_updated_at', 'time_updated_at'],
+    reconcile_interval=_reconcile_interval,
+    dtypes=WORKER_LABOURS_DTYPES
+)
 
-@st.cache_data(ttl=3600)
-def load_parts_data():
-    """Laad parts data"""
-    query = """
-    SELECT 
-        o.id,
-        o.defect_date,
-        o.number,
-        o.client_id,
-        o.category,
-        o.warranty_number,
-        o.causal_part_id,
-        o.machine_id,
-        o.machine_hours,
-        o.appointment,
-        o.replacement_vehicle,
-        o.on_location,
-        REPLACE(o.description, E'\n', '; ') AS description,
-        o.diagnosis,
-        o.parts_discount,
-        o.labour_cost_adjusted,
-        o.comment_worker,
-        o.comment_office,
-        o.comment_invoice,
-        o.status,
-        o.printed,
-        COALESCE(i.number, '') as invoice_number,
-        o.created_at,
-        o.invoice_id,
-        o.washed,
-        o.client_active,
-        o.assigned_to_worker_id,
-        o.major_maintenance,
-        o.minor_maintenance,
-        o.repeated_repair,
-        o.original_order_id,
-        o.registered_at_garage,
-        c.name as client_name,
-        m.model as machine_model,
-        m.brand as machine_brand,
-        m.vin as machine_vin,
-        SUM(oc.unit_price * oc.amount) as total_parts_cost,
-        SUM(st.hours * wl.price_per_hour + st.minutes / 60.0 * wl.price_per_hour) as total_labour_cost,
+@single_flight(_load_flights)
+def load_orders_data():
+    """Laad orders data, na de eerste load incrementeel. Caching gebeurt in de DataStore."""
+    return _orders_loader.load()
+
+@single_flight(_load_flights)
+def load_worker_labours_data():
+    """Laad worker labour data, na de eerste load incrementeel. Caching gebeurt in de DataStore."""
+    return _worker_labours_loader.load()
+
+# Eén rij per onderdeelregel. Ordervelden worden niet herhaald, die komen via
+# utils.parts_schema uit de orders dataset.
+PARTS_QUERY = """
+    SELECT
+        op.id,
+        op.order_id,
         p.number as part_number,
         p.description as part_description,
         p.price as part_price,
         p.brand as part_brand,
         op.amount as part_quantity
-    FROM orders o
-    LEFT JOIN clients c ON o.client_id = c.id
-    LEFT JOIN machines m ON o.machine_id = m.id
-    LEFT JOIN invoices i ON o.invoice_id = i.id
-    LEFT JOIN order_costs oc ON o.id = oc.order_id
-    LEFT JOIN worker_labours wl ON o.id = wl.order_id
-    LEFT JOIN time_v2s st ON wl.specified_time_id = st.id
-    LEFT JOIN order_parts op ON o.id = op.order_id
-    LEFT JOIN parts p ON op.part_id = p.id
-    GROUP BY 
-        o.id, o.defect_date, o.number, o.client_id, o.category, o.warranty_number, 
-        o.causal_part_id, o.machine_id, o.machine_hours, o.appointment, 
-        o.replacement_vehicle, o.on_location, o.description, o.diagnosis, 
-        o.parts_discount, o.labour_cost_adjusted, o.comment_worker, 
-        o.comment_office, o.comment_invoice, o.status, o.printed, 
-        i.number, o.created_at, o.invoice_id, o.washed, 
-        o.client_active, o.assigned_to_worker_id, o.major_maintenance, 
-        o.minor_maintenance, o.repeated_repair, o.original_order_id, 
-        o.registered_at_garage, c.name, m.model, m.brand, m.vin, 
-        p.number, p.description, p.price, p.brand, op.amount
-    """
-    return load_data(query)
-
-@st.cache_data(ttl=3600)
-def load_used_parts_data():
-    """Laad used parts data"""
-    query = """
-    SELECT 
-        p.number AS part_number,
-        p.description AS part_description,
-        SUM(op.amount) AS used_quantity,
-        o.defect_date,
-        c.name AS client_name
     FROM order_parts op
-    JOIN parts p ON op.part_id = p.id
-    JOIN orders o ON op.order_id = o.id
-    JOIN clients c ON o.client_id = c.id
-    GROUP BY p.number, p.description, o.defect_date, c.name
-    ORDER BY o.defect_date DESC
+    LEFT JOIN parts p ON op.part_id = p.id
     """
-    return load_data(query)
 
-@st.cache_data(ttl=3600)
-def load_all_data():
-    """Laad alle data sequentieel"""
-    orders_df = load_orders_data()
-    worker_labours_df = load_worker_labours_data()
-    parts_df = load_parts_data()
-    used_parts_df = load_used_parts_data()
-    
-    return orders_df, worker_labours_df, parts_df, used_parts_df
+@single_flight(_load_flights)
+def load_parts_data():
+    """Laad de onderdeelregels van het parts sterschema. Caching gebeurt in de DataStore."""
+    return load_with_snapshot('parts', PARTS_QUERY, dtypes=PARTS_DTYPES)
 
+# Loader per dataset; de DataStore laadt ze pas als een pagina ze nodig heeft (zie utils.data_store)
+DATA_LOADERS = {
+    'orders': load_orders_data,
+    'worker_labours': load_worker_labours_data,
+    'parts': load_parts_data,
+}
 
+def timed_load(loader):
+    """Voer een loader uit en return het resultaat met de duur in seconden"""
+    start = time.perf_counter()
+    df = loader()
+    return df, time.perf_counter() - start
 
 # @st.cache_data(ttl=3600)
 # def load_sold_parts_data():
@@ -0,0 +1,43 @@
+import datetime
+import pandas as pd
+
+# Datumkolommen per dataset waarvoor jaar, maand en datum vooraf berekend worden
+DATE_COLUMNS = {
+    'orders': ['defect_date', 'created_at'],
+    'worker_labours': ['created_at'],
+}
+
+def date_prefix(column: str) -> str:
+    """Prefix van de afgeleide kolommen: defect_date -> defect, created_at -> created"""
+    for suffix in ('_date', '_at'):
+        if column.endswith(suffix):
+            return column[:-len(suffix)]
+    return column
+
+def ymd(value) -> int:
+    """Een datum als integer jjjjmmdd, te vergelijken met de <prefix>_ymd kolommen"""
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.year * 10000 + value.month * 100 + value.day
+
+def add_date_parts(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """
+    Voeg per datumkolom integer kolommen <prefix>_year, <prefix>_month en
+    <prefix>_ymd (jjjjmmdd) toe, zodat views met goedkope integer vergelijkingen
+    filteren in plaats van bij elke rerun .dt.year of .dt.date uit te rekenen.
+    De datumkolom zelf wordt ook vervangen door de geparste datums, zodat die
+    altijd datetime64 is, ongeacht wat de loader gaf (bv. object uit
+    read_sql_query). Lege datums geven lege waarden.
+    """
+    parts = {}
+    for column in columns:
+        if column not in df.columns:
+            continue
+        dates = pd.to_datetime(df[column])
+        parts[column] = dates
+        prefix = date_prefix(column)
+        year, month, day = dates.dt.year, dates.dt.month, dates.dt.day
+        parts[f'{prefix}_year'] = year.astype('Int16')
+        parts[f'{prefix}_month'] = month.astype('Int8')
+        parts[f'{prefix}_ymd'] = (year * 10000 + month * 100 + day).astype('Int32')
+    return df.assign(**parts) if parts else df
@@ -1,8 +1,101 @@
+import time
+import uuid
 from io import BytesIO
 import pandas as pd
+import streamlit as st
+from utils.env_loader import load_env_var
+from utils.aggregate_memo import AggregateMemo, normalize, cacheable_version
+from utils.export_writer import EXPORT_FORMATS, write_export, remove_export, sweep_exports, bytes_per_second
+
+# Aantal gemaakte exportbestanden dat over alle sessies samen bewaard blijft
+EXPORT_CACHE_SIZE = int(load_env_var('EXPORT_CACHE_SIZE', '32'))
+
+# Hoogstens om de zoveel seconden wordt de spool map opgeruimd, zie sweep_exports
+EXPORT_SWEEP_INTERVAL = 3600
+
+_last_sweep = 0.0
 
 def to_excel(df):
     output = BytesIO()
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         df.to_excel(writer, sheet_name='Sheet1', index=False)
-    return output.getvalue()
\ No newline at end of file
+    return output.getvalue()
+
+@st.cache_resource
+def get_export_cache():
+    """Gedeelde LRU met gemaakte exportbestanden; weggevallen bestanden worden verwijderd"""
+    return AggregateMemo(EXPORT_CACHE_SIZE, on_evict=lambda result: remove_export(result.path))
+
+def _sweep_spool():
+    """Ruim oude exportbestanden op (van gestopte sessies of een vorige run), hoogstens één keer per interval"""
+    global _last_sweep
+    if time.time() - _last_sweep > EXPORT_SWEEP_INTERVAL:
+        _last_sweep = time.time()
+        sweep_exports()
+
+def _session_id():
+    if 'export_session' not in st.session_state:
+        st.session_state.export_session = uuid.uuid4().hex
+    return st.session_state.export_session
+
+def export_download(label, data, file_name, key, version=None, filters=None, container=st, fmt='xlsx'):
+    """
+    Export knop die het bestand pas maakt als erom gevraagd wordt. Eerst staat
+    er alleen een knop met label; na een klik wordt het bestand in blokken naar
+    een tijdelijk bestand geschreven (zie utils.export_writer) en staat er een
+    download knop tot die gebruikt is of version of filters veranderen. Een
+    download knop houdt het hele bestand in het geheugen van Streamlit, bij
+    elke rerun, dus hij staat er alleen na zo'n klik. data is een
+    DataFrame of een functie zonder argumenten die het geeft; file_name is
+    zonder extensie, die volgt uit fmt ('xlsx', 'csv' of 'parquet').
+
+    Met een bruikbare version (zie cacheable_version) worden de bestanden per
+    (key, formaat, version, filters) gedeeld door alle sessies, anders alleen
+    door deze sessie gebruikt. Beide
+    staan in dezelfde begrensde cache, die weggevallen bestanden verwijdert;
+    wat een gestopte sessie of vorige run achterliet ruimt sweep_exports op.
+    """
+    export_format = EXPORT_FORMATS[fmt]
+    state_key = f'export_{key}'
+    prepared_key = f'{state_key}_prepared'
+    token = (fmt, version, normalize(filters))
+    # Zonder bruikbare version hoort het bestand alleen bij deze sessie
+    cache_key = (key,) + token if cacheable_version(version) else (key, _session_id()) + token
+    cache = get_export_cache()
+    if st.session_state.get(state_key) != token or not st.session_state.get(prepared_key):
+        if not container.button(label, key=f'{state_key}_prepare'):
+            return
+        previous = st.session_state.get(state_key)
+        if previous != token:
+            st.session_state[state_key] = token
+            if previous is not None and not cacheable_version(previous[1]):
+                # Het vorige bestand van deze sessie wordt niet meer gebruikt
+                stale = cache.discard((key, _session_id()) + previous)
+                if stale is not None:
+                    remove_export(stale.path)
+        st.session_state[prepared_key] = True
+
+    def build():
+        _sweep_spool()
+        return write_export(data() if callable(data) else data, fmt)
+
+    export = cache.get_or_compute(cache_key, build)
+    try:
+        file = open(export.path, 'rb')
+    except FileNotFoundError:
+        # Net uit de cache gevallen en opgeruimd door een andere sessie of de sweep: opnieuw maken
+        cache.discard(cache_key)
+        export = cache.get_or_compute(cache_key, build)
+        file = open(export.path, 'rb')
+    with file:
+        container.download_button(
+            label=f"Download {export_format.label} bestand",
+            data=file,
+            file_name=f'{file_name}.{export_format.extension}',
+            mime=export_format.mime,
+            key=f'{state_key}_download',
+            on_click=st.session_state.pop,
+            args=(prepared_key, None)
+        )
+    container.caption(f"{export.rows:,} rijen, {export.size / 1e6:.1f} MB in {export.seconds:.1f}s "
+                      f"({bytes_per_second(export) / 1e6:.1f} MB/s)")
@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from utils.env_loader import load_env_var
+from utils.aggregate_memo import normalize, cacheable_version
+from utils.export_writer import (EXPORT_FORMATS, EXPORT_SPOOL_DIR, ExportResult, write_export, remove_export,
+                                 bytes_per_second)
+
+logger = logging.getLogger(__name__)
+
+# Aantal exports dat tegelijk gemaakt wordt, de rest wacht in de rij
+EXPORT_WORKERS = int(load_env_var('EXPORT_WORKERS', '2'))
+
+# Klare exports blijven zo lang (seconden) te downloaden, ook na een herstart
+EXPORT_JOB_TTL = int(load_env_var('EXPORT_JOB_TTL', str(24 * 3600)))
+
+# Map met de bestanden en manifests van de exports
+EXPORT_JOB_DIR = Path(load_env_var('EXPORT_JOB_DIR', os.path.join(EXPORT_SPOOL_DIR, 'export_jobs')))
+
+# Aantal exports per gebruiker in het overzicht
+EXPORT_JOBS_SHOWN = 5
+
+QUEUED, RUNNING, DONE, FAILED = 'wachtrij', 'bezig', 'klaar', 'mislukt'
+
+class ExportJob:
+    """
+    Eén export: de sleutel van de specificatie, wie hem aanvroeg, de status
+    en voortgang (0..1) en na afloop het bestand met rijen, grootte en duur.
+    preview bevat de eerste rijen van het geëxporteerde frame (alleen in dit
+    proces, niet in het manifest).
+    """
+
+    def __init__(self, key, label, file_name, fmt, owners=(), job_id=None, created_at=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.key = key
+        self.label = label
+        self.file_name = file_name
+        self.fmt = fmt
+        self.owners = set(owners)
+        self.created_at = created_at or time.time()
+        self.status = QUEUED
+        self.progress = 0.0
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.preview = None
+
+    @property
+    def download_name(self):
+        return f'{self.file_name}.{EXPORT_FORMATS[self.fmt].extension}'
+
+    def manifest(self):
+        return {
+            'id': self.id,
+            'key': self.key,
+            'label': self.label,
+            'file_name': self.file_name,
+            'fmt': self.fmt,
+            'owners': sorted(self.owners),
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'file': Path(self.result.path).name,
+            'rows': self.result.rows,
+            'size': self.result.size,
+            'seconds': self.result.seconds,
+        }
+
+class ExportJobQueue:
+    """
+    Maakt exports op een pool van achtergrondthreads, zodat de pagina niet
+    bevriest en een rerun het werk niet weggooit. Een job bouwt eerst het
+    frame (filteren, groeperen, sorteren) en schrijft het dan in blokken weg
+    (zie utils.export_writer).
+
+    Jobs met dezelfde sleutel worden samengevoegd: wie een export aanvraagt
+    die al in de rij staat, loopt of klaar is, krijgt die job. Klare exports
+    komen met een manifest in EXPORT_JOB_DIR, en blijven EXPORT_JOB_TTL
+    seconden te downloaden, ook na een herstart van de app. Dataversies
+    tellen per proces opnieuw vanaf 0 (zie utils.data_store), dus een
+    teruggelezen export blijft alleen te downloaden voor wie hem aanvroeg en
+    wordt nooit voor een nieuwe aanvraag hergebruikt.
+    """
+
+    def __init__(self, directory=EXPORT_JOB_DIR, workers=EXPORT_WORKERS, ttl=EXPORT_JOB_TTL):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._by_key = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        self._load()
+
+    def _load(self):
+        """Lees de klare exports van een vorige run terug"""
+        if not self.directory.exists():
+            return
+        for manifest_path in self.directory.glob('*.json'):
+            try:
+                manifest = json.loads(manifest_path.read_text())
+            except (OSError, ValueError):
+                continue
+            path = self.directory / manifest['file']
+            if not path.exists():
+                continue
+            job = ExportJob(manifest['key'], manifest['label'], manifest['file_name'], manifest['fmt'],
+                            manifest['owners'], manifest['id'], manifest['created_at'])
+            job.status, job.progress, job.finished_at = DONE, 1.0, manifest['finished_at']
+            job.result = ExportResult(str(path), job.fmt, manifest['rows'], manifest['size'], manifest['seconds'])
+            # Niet in _by_key: de sleutel kan nu andere data betekenen
+            self._jobs[job.id] = job
+        self.purge()
+
+    def submit(self, key, build, label, file_name, fmt='xlsx', owner=None, dedupe=True) -> ExportJob:
+        """
+        Zet een export in de rij, of geef de bestaande job met dezelfde sleutel.
+        build is een functie zonder argumenten die het te exporteren DataFrame
+        geeft; die draait op een achtergrondthread. Zonder dedupe wordt altijd
+        een nieuwe job gestart, bv. als de sleutel geen dataversie bevat.
+        """
+        self.purge()
+        # De sleutel gaat als tekst in het manifest, dus ook hier als tekst vergelijken
+        key = repr(normalize(key))
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key)) if dedupe else None
+            if job is not None and job.status != FAILED:
+                if owner is not None and owner not in job.owners:
+                    job.owners.add(owner)
+                    if job.status == DONE:
+                        self._persist(job)
+                return job
+            job = ExportJob(key, label, file_name, fmt, [owner] if owner is not None else [])
+            self._jobs[job.id] = job
+            if dedupe:
+                self._by_key[key] = job.id
+        self._executor.submit(self._run, job, build)
+        return job
+
+    def _run(self, job, build):
+        job.status = RUNNING
+        try:
+            df = build()
+            job.preview = df.head(5)
+            job.progress = 0.1
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f'{job.id}.{EXPORT_FORMATS[job.fmt].extension}'
+
+            def progress(done):
+                # Het frame bouwen telt voor het eerste tiende
+                job.progress = 0.1 + 0.9 * done
+            job.result = write_export(df, job.fmt, str(path), progress=progress)
+            job.finished_at = time.time()
+            self._persist(job)
+            job.progress, job.status = 1.0, DONE
+            logger.info("Export %s klaar: %d rijen, %.1f MB/s", job.download_name, job.result.rows,
+                        bytes_per_second(job.result) / 1e6)
+        except Exception as e:
+            logger.exception("Export %s mislukt", job.download_name)
+            job.error, job.status = str(e), FAILED
+
+    def _persist(self, job):
+        """Schrijf het manifest van een klare job, pas na het bestand zelf"""
+        manifest_path = self.directory / f'{job.id}.json'
+        tmp_manifest = manifest_path.with_suffix('.json.tmp')
+        tmp_manifest.write_text(json.dumps(job.manifest()))
+        os.replace(tmp_manifest, manifest_path)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        """Jobs van een aanvrager (of alle), nieuwste eerst"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if owner is None or owner in job.owners]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def purge(self):
+        """Verwijder klare en mislukte exports ouder dan de ttl, met hun bestanden"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.status in (DONE, FAILED) and (job.finished_at or job.created_at) < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+                if self._by_key.get(job.key) == job.id:
+                    del self._by_key[job.key]
+        for job in expired:
+            if job.result is not None:
+                remove_export(job.result.path)
+            remove_export(self.directory / f'{job.id}.json')
+
+@st.cache_resource
+def get_export_jobs():
+    """De ene ExportJobQueue van dit proces"""
+    return ExportJobQueue()
+
+def current_owner():
+    """De ingelogde gebruiker, of anders deze sessie"""
+    user = st.session_state.get('user')
+    if user and user.get('id') is not None:
+        return f"user:{user['id']}"
+    if 'export_owner' not in st.session_state:
+        st.session_state.export_owner = f'session:{uuid.uuid4().hex}'
+    return st.session_state.export_owner
+
+def _downloaded():
+    st.session_state.pop('export_job_prepared', None)
+
+def render_job(job, container=st, place='page'):
+    """
+    Status, voortgang en (als de export klaar is) de download knop van één job.
+    place houdt de knoppen uit elkaar als dezelfde job op twee plekken staat.
+
+    Een download knop houdt het hele bestand in het geheugen van Streamlit, bij
+    elke rerun opnieuw. Daarom staat er eerst een knop om de download voor te
+    bereiden, en hangt alleen het bestand van de gekozen job (één per sessie)
+    aan een download knop, tot die gebruikt is.
+    """
+    if job.status in (QUEUED, RUNNING):
+        container.progress(job.progress, text=f"{job.label}: {job.status}")
+    elif job.status == FAILED:
+        container.error(f"{job.label}: mislukt ({job.error})")
+    elif not os.path.exists(job.result.path):
+        container.warning(f"{job.label}: bestand verlopen")
+    else:
+        if st.session_state.get('export_job_prepared') != job.id:
+            if not container.button(f"Download voorbereiden: {job.label} ({job.result.rows:,} rijen)",
+                                    key=f'export_job_prepare_{place}_{job.id}'):
+                return
+            st.session_state['export_job_prepared'] = job.id
+        try:
+            file = open(job.result.path, 'rb')
+        except FileNotFoundError:
+            container.warning(f"{job.label}: bestand verlopen")
+            return
+        with file:
+            container.download_button(
+                label=f"{job.label} ({job.result.rows:,} rijen)",
+                data=file,
+                file_name=job.download_name,
+                mime=EXPORT_FORMATS[job.fmt].mime,
+                key=f'export_job_{place}_{job.id}',
+                on_click=_downloaded
+            )
+
+def render_export_jobs():
+    """
+    Overzicht van de exports van de huidige gebruiker, op elke pagina in de
+    sidebar. Zolang er een export loopt wordt het elke 2 seconden ververst.
+    """
+    jobs = get_export_jobs().jobs(current_owner())[:EXPORT_JOBS_SHOWN]
+    if not jobs:
+        return
+    active = any(job.status in (QUEUED, RUNNING) for job in jobs)
+
+    @st.fragment(run_every=2 if active else None)
+    def panel():
+        st.markdown("### Exports")
+        jobs = get_export_jobs().jobs(current_owner())[:EXPORT_JOBS_SHOWN]
+        for job in jobs:
+            render_job(job, place='sidebar')
+        # Alles klaar: één keer de hele pagina opnieuw, dan stopt het verversen
+        if active and not any(job.status in (QUEUED, RUNNING) for job in jobs):
+            st.rerun()
+
+    with st.sidebar:
+        panel()
+
+def export_job_button(label, build, file_name, key, version=None, filters=None, fmt='xlsx', preview=False):
+    """
+    Export knop voor grote exports: een klik zet een job in de rij (zie
+    ExportJobQueue) en daarna staat hier de voortgang en de download knop,
+    die ook in de sidebar van elke pagina blijft staan. build is een functie
+    zonder argumenten die het DataFrame geeft en draait op de achtergrond.
+    Dezelfde key, version, filters en fmt geven dezelfde job, ook voor andere
+    sessies; zonder bruikbare version (zie cacheable_version) krijgt elke
+    sessie een eigen job. Met preview komen de eerste rijen van het resultaat eronder.
+    """
+    state_key = f'export_job_{key}'
+    spec = (key, fmt, version, normalize(filters))
+    queue = get_export_jobs()
+    job = None
+    if state_key in st.session_state:
+        stored_spec, job_id = st.session_state[state_key]
+        job = queue.get(job_id) if stored_spec == spec else None
+        # Mislukt of verlopen: opnieuw kunnen starten
+        if job is not None and job.status == FAILED:
+            render_job(job)
+            job = None
+    if job is None:
+        if not st.button(label, key=f'{state_key}_start'):
+            return None
+        job = queue.submit(spec, build, label, file_name, fmt, current_owner(), dedupe=cacheable_version(version))
+        st.session_state[state_key] = (spec, job.id)
+
+    active = job.status in (QUEUED, RUNNING)
+
+    @st.fragment(run_every=2 if active else None)
+    def status():
+        render_job(job)
+        if job.status == DONE and preview and job.preview is not None:
+            st.dataframe(job.preview, use_container_width=True)
+        if active and job.status not in (QUEUED, RUNNING):
+            st.rerun()
+
+    status()
+    return job
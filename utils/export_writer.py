@@ -0,0 +1,129 @@
+import os
+import time
+import tempfile
+from pathlib import Path
+from collections import namedtuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+from utils.env_loader import load_env_var
+
+# Rijen per blok; per blok wordt maar één stuk van het frame naar Python waarden omgezet
+EXPORT_CHUNK_ROWS = int(load_env_var('EXPORT_CHUNK_ROWS', '10000'))
+
+# Map voor de exportbestanden, standaard de tijdelijke map van het systeem
+EXPORT_SPOOL_DIR = load_env_var('EXPORT_SPOOL_DIR', tempfile.gettempdir())
+
+# Tijdelijke exportbestanden ouder dan dit (seconden) worden opgeruimd, zie sweep_exports
+EXPORT_FILE_TTL = int(load_env_var('EXPORT_FILE_TTL', str(24 * 3600)))
+
+# Ondersteunde formaten: label, extensie en mime type
+ExportFormat = namedtuple('ExportFormat', ['label', 'extension', 'mime'])
+EXPORT_FORMATS = {
+    'xlsx': ExportFormat('Excel', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ExportFormat('CSV', 'csv', 'text/csv'),
+    'parquet': ExportFormat('Parquet', 'parquet', 'application/vnd.apache.parquet'),
+}
+
+# Resultaat van een geschreven export
+ExportResult = namedtuple('ExportResult', ['path', 'fmt', 'rows', 'size', 'seconds'])
+
+def bytes_per_second(result: ExportResult) -> float:
+    return result.size / result.seconds if result.seconds > 0 else float('inf')
+
+def _chunks(df, chunk_rows, progress=None):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+        if progress is not None:
+            progress(min(start + chunk_rows, len(df)) / len(df))
+
+def _write_xlsx(df, path, chunk_rows, progress):
+    # constant_memory schrijft elke rij meteen weg in plaats van het hele werkblad
+    # in het geheugen op te bouwen; rijen moeten dan wel in volgorde komen
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd',
+        'remove_timezone': True,
+        'nan_inf_to_errors': True,
+    })
+    worksheet = workbook.add_worksheet('Sheet1')
+    header = workbook.add_format({'bold': True})
+    worksheet.write_row(0, 0, [str(column) for column in df.columns], header)
+    row = 1
+    for chunk in _chunks(df, chunk_rows, progress):
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for record in values.itertuples(index=False, name=None):
+            worksheet.write_row(row, 0, record)
+            row += 1
+        # Vrijgeven voor het volgende blok omgezet wordt, anders staan er twee in het geheugen
+        del values
+    workbook.close()
+
+def _write_csv(df, path, chunk_rows, progress):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        for number, chunk in enumerate(_chunks(df, chunk_rows, progress)):
+            chunk.to_csv(file, header=number == 0, index=False)
+        if len(df) == 0:
+            df.to_csv(file, index=False)
+
+def _write_parquet(df, path, chunk_rows, progress):
+    # Schema van het hele frame, zodat een blok met alleen lege waarden hetzelfde type krijgt
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in _chunks(df, chunk_rows, progress):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        if len(df) == 0:
+            writer.write_table(schema.empty_table())
+
+_WRITERS = {
+    'xlsx': _write_xlsx,
+    'csv': _write_csv,
+    'parquet': _write_parquet,
+}
+
+def write_export(df: pd.DataFrame, fmt: str = 'xlsx', path: str = None, chunk_rows: int = EXPORT_CHUNK_ROWS,
+                 progress=None) -> ExportResult:
+    """
+    Schrijf df in blokken van chunk_rows rijen naar een bestand, zonder het
+    bestand of (bij Excel) het werkboek in het geheugen op te bouwen. Zonder
+    path komt het in een tijdelijk bestand in EXPORT_SPOOL_DIR; de aanroeper
+    ruimt dat op, zie remove_export. progress wordt na elk blok aangeroepen
+    met het geschreven deel van de rijen (0..1).
+    """
+    export_format = EXPORT_FORMATS[fmt]
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix='export_', suffix=f'.{export_format.extension}', dir=EXPORT_SPOOL_DIR)
+        os.close(handle)
+    start = time.perf_counter()
+    try:
+        _WRITERS[fmt](df, path, chunk_rows, progress)
+    except Exception:
+        remove_export(path)
+        raise
+    seconds = time.perf_counter() - start
+    return ExportResult(path, fmt, len(df), os.path.getsize(path), seconds)
+
+def remove_export(path):
+    """Verwijder een exportbestand, als het nog bestaat"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def sweep_exports(max_age=EXPORT_FILE_TTL, directory=None) -> int:
+    """
+    Verwijder tijdelijke exportbestanden (export_*, zie write_export) in
+    EXPORT_SPOOL_DIR die ouder zijn dan max_age seconden, bv. van gestopte
+    sessies of een vorige run. Return het aantal verwijderde bestanden.
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in Path(directory or EXPORT_SPOOL_DIR).glob('export_*'):
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
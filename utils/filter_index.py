@@ -0,0 +1,110 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Per kolom: de code van elke rij (-1 voor leeg), de unieke waarden, de rijposities
+# gesorteerd op code en per code (leeg eerst) de start van zijn posities in order
+_Dimension = namedtuple('_Dimension', ['codes', 'uniques', 'order', 'offsets'])
+
+class FilterIndex:
+    """
+    Index voor de filters die de views op een gedeeld frame toepassen (jaar,
+    klant, machine, categorie, nulfactuur, ...). Per kolom worden één keer de
+    rijposities per waarde berekend; een combinatie van filters begint bij de
+    posities van de meest selectieve kolom en houdt daarvan alleen de rijen
+    over waarvan de waarde in de andere kolommen ook gekozen is. Er wordt dus
+    niet meer per widget een masker over het hele frame berekend.
+
+    Een kolom wordt pas geïndexeerd als er voor het eerst op gefilterd wordt.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._dimensions = {}
+
+    def _dimension(self, column):
+        dimension = self._dimensions.get(column)
+        if dimension is None:
+            codes, uniques = pd.factorize(self.df[column])
+            codes = codes.astype(np.int32)
+            order = np.argsort(codes, kind='stable')
+            counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            dimension = self._dimensions[column] = _Dimension(codes, pd.Index(uniques), order, offsets)
+        return dimension
+
+    def _selected_codes(self, dimension, values):
+        codes = dimension.uniques.get_indexer(pd.Index(list(values)))
+        return np.unique(codes[codes >= 0])
+
+    def positions(self, filters: dict) -> np.ndarray:
+        """
+        Rijposities (oplopend) die aan alle filters voldoen. filters is een dict
+        kolom -> gekozen waarden; None of een lege lijst betekent geen filter.
+        Lege waarden in het frame voldoen nooit aan een filter.
+        """
+        active = []
+        for column, values in filters.items():
+            if values is None:
+                continue
+            if np.isscalar(values):
+                values = [values]
+            if len(values) == 0:
+                continue
+            dimension = self._dimension(column)
+            codes = self._selected_codes(dimension, values)
+            size = int((dimension.offsets[codes + 2] - dimension.offsets[codes + 1]).sum())
+            active.append((size, column, dimension, codes))
+
+        if not active:
+            return np.arange(len(self.df))
+
+        # Begin bij de kleinste set rijen, de andere filters hoeven dan alleen die te controleren
+        active.sort(key=lambda item: item[0])
+        _, _, dimension, codes = active[0]
+        positions = np.concatenate(
+            [dimension.order[dimension.offsets[code + 1]:dimension.offsets[code + 2]] for code in codes]
+        ) if len(codes) else np.empty(0, dtype=np.intp)
+        if len(codes) > 1:
+            positions.sort()
+
+        for _, _, dimension, codes in active[1:]:
+            if not len(positions):
+                break
+            allowed = np.zeros(len(dimension.uniques) + 1, dtype=bool)
+            allowed[codes + 1] = True
+            positions = positions[allowed[dimension.codes[positions] + 1]]
+        return positions
+
+    def take(self, filters: dict, df: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        De rijen die aan de filters voldoen. Met df worden de rijen uit een
+        afgeleid frame met dezelfde rijvolgorde gehaald, bv. na een assign.
+        """
+        df = self.df if df is None else df
+        positions = self.positions(filters)
+        # Posities zijn uniek, dus evenveel posities als rijen betekent alles
+        return df if len(positions) == len(df) else df.iloc[positions]
+
+    def values(self, column: str, filters: dict = None) -> list:
+        """Unieke, niet lege waarden van een kolom binnen de rijen die aan de filters voldoen"""
+        dimension = self._dimension(column)
+        if filters:
+            codes = np.unique(dimension.codes[self.positions(filters)])
+            codes = codes[codes >= 0]
+        else:
+            codes = np.arange(len(dimension.uniques))
+        return list(dimension.uniques[codes])
+
+@st.cache_resource(max_entries=8)
+def _cached_filter_index(frame_id, _df):
+    return FilterIndex(_df)
+
+def get_filter_index(df: pd.DataFrame) -> FilterIndex:
+    """
+    De gedeelde FilterIndex van een frame uit de DataStore. De cache houdt het
+    frame zelf vast, dus zolang een index bestaat kan id(df) niet hergebruikt
+    worden door een ander frame.
+    """
+    return _cached_filter_index(id(df), df)
@@ -0,0 +1,140 @@
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.filter_index import get_filter_index
+
+# Lengte van de n-grammen voor zoeken binnen een nummer en op tikfouten
+NGRAM = 3
+
+# Zo veel kandidaten met de meeste gedeelde n-grammen worden op gelijkenis gescoord
+FUZZY_CANDIDATES = 50
+
+# Minimale gelijkenis (0..1) voor een treffer met tikfouten
+FUZZY_CUTOFF = 0.75
+
+_separators = re.compile(r'[^0-9A-Z]')
+
+def normalize_part_number(value) -> str:
+    """Hoofdletters zonder spaties, streepjes, punten en andere scheidingstekens"""
+    return _separators.sub('', str(value).upper())
+
+def _ngrams(key):
+    return {key[i:i + NGRAM] for i in range(len(key) - NGRAM + 1)}
+
+class PartSearchIndex:
+    """
+    Zoekindex op de onderdeelnummers van een frame. Elk uniek nummer wordt
+    één keer genormaliseerd (zie normalize_part_number) en gesorteerd voor
+    opzoeken op begin; daarnaast gaat elk n-gram naar de nummers waarin het
+    voorkomt, voor zoeken binnen een nummer en op tikfouten. Een zoekopdracht
+    kost daardoor werk in het aantal treffers, niet in het aantal regels.
+
+    Zoeken geeft onderdeelnummers; de regels en totalen daarvan komen uit de
+    FilterIndex en de onderdelen cube, zie views.parts_analysis.
+    """
+
+    def __init__(self, part_numbers):
+        self.part_numbers = pd.Index(part_numbers)
+        keys = np.array([normalize_part_number(value) for value in self.part_numbers], dtype=str)
+        self._order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[self._order]
+        self._keys = keys
+        postings = defaultdict(list)
+        for number, key in enumerate(keys):
+            for gram in _ngrams(key):
+                postings[gram].append(number)
+        self._postings = {gram: np.array(numbers, dtype=np.int32) for gram, numbers in postings.items()}
+        self._gram_counts = np.array([len(_ngrams(key)) for key in keys], dtype=np.int32)
+        # Voor zoekopdrachten met alleen scheidingstekens, zie _contains_raw
+        self._raw = np.array([str(value).upper() for value in self.part_numbers], dtype=str)
+
+    def _prefix(self, key):
+        start = np.searchsorted(self._sorted_keys, key, side='left')
+        end = np.searchsorted(self._sorted_keys, key + '\uffff', side='left')
+        return self._order[start:end]
+
+    def _contains(self, key):
+        if len(key) < NGRAM:
+            # Te kort voor een n-gram: direct over de (unieke) sleutels
+            return np.flatnonzero(np.char.find(self._keys, key) >= 0)
+        grams = sorted(_ngrams(key), key=lambda gram: len(self._postings.get(gram, ())))
+        candidates = self._postings.get(grams[0])
+        if candidates is None:
+            return np.empty(0, dtype=np.int32)
+        for gram in grams[1:]:
+            candidates = np.intersect1d(candidates, self._postings.get(gram, ()), assume_unique=True)
+            if not len(candidates):
+                return candidates
+        # Alle n-grammen gedeeld is nog geen deelstring, dus nakijken
+        return np.array([number for number in candidates if key in self._keys[number]], dtype=np.int32)
+
+    def _contains_raw(self, query):
+        """Nummers die query letterlijk bevatten (zonder hoofdletters te tellen), nummers die ermee beginnen eerst"""
+        query = query.upper()
+        found = np.char.find(self._raw, query)
+        numbers = np.flatnonzero(found >= 0)
+        numbers = numbers[np.lexsort((self._raw[numbers], found[numbers] > 0))]
+        return list(self.part_numbers[numbers])
+
+    def matches(self, query: str) -> list:
+        """
+        Onderdeelnummers die query bevatten (zonder hoofdletters en
+        scheidingstekens te tellen): eerst een exacte treffer, dan nummers die
+        ermee beginnen, dan de rest, elk alfabetisch. Bestaat query alleen uit
+        scheidingstekens (bv. "-" of "/"), dan wordt er letterlijk gezocht.
+        """
+        key = normalize_part_number(query)
+        if not key:
+            return self._contains_raw(query) if query else []
+        prefix = self._prefix(key)
+        contains = self._contains(key)
+        rest = np.setdiff1d(contains, prefix, assume_unique=True)
+        rest = rest[np.argsort(self._keys[rest], kind='stable')]
+        ranked = np.concatenate([prefix, rest]).astype(np.intp)
+        return list(self.part_numbers[ranked])
+
+    def similar(self, query: str, limit: int = 10) -> list:
+        """
+        Onderdeelnummers die op query lijken (tikfouten, een teken te veel of
+        te weinig), meest gelijkend eerst
+        """
+        key = normalize_part_number(query)
+        grams = _ngrams(key)
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not postings:
+            return []
+        # Gedeelde n-grammen per nummer, daarvan de beste kandidaten op Jaccard
+        shared = np.bincount(np.concatenate(postings), minlength=len(self._keys))
+        candidates = np.flatnonzero(shared)
+        jaccard = shared[candidates] / (len(grams) + self._gram_counts[candidates] - shared[candidates])
+        candidates = candidates[np.argsort(-jaccard, kind='stable')[:FUZZY_CANDIDATES]]
+        scored = []
+        for number in candidates:
+            ratio = SequenceMatcher(None, key, self._keys[number]).ratio()
+            if ratio >= FUZZY_CUTOFF:
+                scored.append((-ratio, self._keys[number], number))
+        scored.sort()
+        return [self.part_numbers[number] for _, _, number in scored[:limit]]
+
+    def suggest(self, query: str, limit: int = 10) -> list:
+        """Suggesties terwijl er getypt wordt: eerst treffers, aangevuld met gelijkende nummers"""
+        suggestions = self.matches(query)[:limit]
+        if len(suggestions) < limit:
+            seen = set(suggestions)
+            suggestions += [number for number in self.similar(query, limit) if number not in seen]
+        return suggestions[:limit]
+
+# De index houdt zijn bronframe vast, zodat id(frame) zolang niet hergebruikt
+# kan worden door een ander frame (zie ook utils.filter_index)
+@st.cache_resource(max_entries=4)
+def _cached_part_search_index(frame_id, _parts_df):
+    index = PartSearchIndex(get_filter_index(_parts_df).values('part_number'))
+    index.source = _parts_df
+    return index
+
+def get_part_search_index(parts_df: pd.DataFrame) -> PartSearchIndex:
+    """De zoekindex op de onderdeelnummers van een frame uit de DataStore, één keer per geladen versie"""
+    return _cached_part_search_index(id(parts_df), parts_df)
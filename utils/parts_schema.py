@@ -0,0 +1,73 @@
+import threading
+import pandas as pd
+import streamlit as st
+from utils.data_store import get_data_store
+
+class PartsStar:
+    """
+    Sterschema voor onderdelendata: een slanke fact tabel met één rij per
+    onderdeelregel (order_id, part_number, part_description, part_brand,
+    part_price, part_quantity) en de orders dataset als order dimensie,
+    gesleuteld op id.
+
+    Ordervelden als klant, categorie of datum staan niet op elke regel, maar
+    worden pas bij opvragen en alleen voor de gevraagde kolommen bij de regels
+    gezocht. De positie van elke regel in de dimensie wordt één keer berekend.
+
+    version zijn de DataStore versies van (parts, orders), None als onbekend.
+    """
+
+    def __init__(self, facts: pd.DataFrame, orders: pd.DataFrame, version=None):
+        self.facts = facts
+        self.orders = orders
+        self.version = version
+        self._lock = threading.Lock()
+        self._positions = None
+        self._columns = {}
+        self._frames = {}
+
+    def _order_positions(self):
+        if self._positions is None:
+            # -1 voor regels waarvan de order (nog) niet in de dimensie staat
+            self._positions = pd.Index(self.orders['id']).get_indexer(self.facts['order_id'])
+        return self._positions
+
+    def order_column(self, column: str) -> pd.Series:
+        """Een orderkolom uitgelijnd op de fact tabel, leeg voor onbekende orders"""
+        series = self._columns.get(column)
+        if series is None:
+            with self._lock:
+                values = self.orders[column].array.take(self._order_positions(), allow_fill=True)
+                series = self._columns[column] = pd.Series(values, index=self.facts.index, name=column)
+        return series
+
+    def frame(self, order_columns=()) -> pd.DataFrame:
+        """
+        De fact tabel met alleen de gevraagde orderkolommen erbij. Dezelfde
+        kolommen geven hetzelfde frame, zodat ook een filter index daarop
+        gedeeld wordt.
+        """
+        key = tuple(order_columns)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self.facts.assign(**{column: self.order_column(column) for column in key})
+            self._frames[key] = frame
+        return frame
+
+@st.cache_resource(max_entries=2)
+def _build_parts_star(parts_version, orders_version):
+    store = get_data_store()
+    facts, orders = store.get('parts'), store.get('orders')
+    # Versies van de frames zelf, er kan intussen een nieuwe versie gepubliceerd zijn
+    return PartsStar(facts, orders, (store.version_of(facts), store.version_of(orders)))
+
+def get_parts_star():
+    """
+    Het gedeelde sterschema voor de huidige versies van de parts en orders
+    datasets. Opgezochte orderkolommen blijven bewaard tot een van beide
+    datasets ververst wordt.
+    """
+    store = get_data_store()
+    store.get_many(['parts', 'orders'])
+    parts_version, orders_version = (store.info(name).version for name in ('parts', 'orders'))
+    return _build_parts_star(parts_version, orders_version)
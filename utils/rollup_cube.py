@@ -0,0 +1,129 @@
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.filter_index import FilterIndex
+
+# Korrel en maten van de order cube: aantallen en kostensommen per combinatie.
+# Daarnaast wordt elke cube ook zonder maand opgeteld, voor vragen per jaar.
+ORDER_CUBE_DIMENSIONS = ['defect_year', 'defect_month', 'client_name', 'machine_brand',
+                         'machine_model', 'category', 'zero_invoice']
+ORDER_CUBE_MEASURES = {
+    'count': ('id', 'size'),
+    'total_labour_cost': ('total_labour_cost', 'sum'),
+    'total_parts_cost': ('total_parts_cost', 'sum'),
+    # Aantal orders met een bedrag, voor gemiddelden
+    'labour_cost_orders': ('total_labour_cost', 'count'),
+    'parts_cost_orders': ('total_parts_cost', 'count'),
+}
+
+# zero_invoice zit erbij omdat de onderdelenpagina daar ook op filtert
+PARTS_CUBE_DIMENSIONS = ['defect_year', 'defect_month', 'client_name', 'category',
+                         'zero_invoice', 'part_number']
+PARTS_CUBE_MEASURES = {
+    'count': ('part_quantity', 'sum'),
+    'total_income': ('total_income', 'sum'),
+}
+
+# Dimensies die voor een grovere rollup weggelaten worden
+COARSE_DROP = ['defect_month']
+
+class RollupCube:
+    """
+    Vooraf geaggregeerde tabel op een vaste korrel. Top N grafieken tellen de
+    maten van de cube rijen binnen de filters op in plaats van elke rerun de
+    ruwe rijen te groeperen; de kosten hangen dus af van het aantal
+    combinaties, niet van het aantal orders of onderdeelregels.
+
+    Naast de volledige korrel wordt een grovere rollup zonder de dimensies uit
+    drop bijgehouden (standaard de maand). Een vraag gebruikt de kleinste
+    tabel die alle gevraagde dimensies bevat.
+
+    Gefilterd wordt via een FilterIndex op de cube tabel, dus alleen op
+    dimensies van de cube. attributes zijn kolommen die bij één dimensie horen
+    (bv. de omschrijving van een onderdeelnummer); die komen mee als op die
+    dimensie gegroepeerd wordt.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensions: List[str], measures: Dict[str, tuple],
+                 attributes: Dict[str, str] = None, drop: List[str] = COARSE_DROP):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        # dropna=False: rijen zonder klant of model tellen wel mee in de andere grafieken
+        self.table = (
+            df.groupby(self.dimensions, observed=True, dropna=False, sort=False)
+            .agg(**measures)
+            .reset_index()
+        )
+        # (dimensies, FilterIndex) van klein naar groot; de grove tabel uit de fijne
+        self._levels = [(set(self.dimensions), FilterIndex(self.table))]
+        coarse = [column for column in self.dimensions if column not in drop]
+        if len(coarse) < len(self.dimensions):
+            table = (
+                self.table.groupby(coarse, observed=True, dropna=False, sort=False)[self.measures]
+                .sum()
+                .reset_index()
+            )
+            self._levels.insert(0, (set(coarse), FilterIndex(table)))
+        self.attributes = {}
+        for column, dimension in (attributes or {}).items():
+            first = df[[dimension, column]].dropna(subset=[dimension]).drop_duplicates(dimension)
+            self.attributes[column] = (dimension, first.set_index(dimension)[column])
+
+    def _rows(self, by, filters):
+        filters = filters or {}
+        # Alleen actieve filters tellen, None of een lege lijst filtert niet
+        active = [column for column, values in filters.items()
+                  if values is not None and (np.isscalar(values) or len(values))]
+        needed = set(by) | set(active)
+        for dimensions, index in self._levels:
+            if needed <= dimensions:
+                return index.take(filters)
+        raise KeyError(f"Geen dimensie van de cube: {sorted(needed - self._levels[-1][0])}")
+
+    def rollup(self, by, filters: dict = None, dropna: bool = True) -> pd.DataFrame:
+        """
+        Maten opgeteld per waarde (combinatie) van by, binnen de filters. Net
+        als bij groupby vallen lege waarden van by weg, tenzij dropna=False.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        rows = self._rows(by, filters)
+        result = rows.groupby(by, observed=True, dropna=dropna)[self.measures].sum().reset_index()
+        for column, (dimension, values) in self.attributes.items():
+            if dimension in by:
+                result[column] = result[dimension].map(values)
+        return result
+
+    def totals(self, filters: dict = None) -> pd.Series:
+        """Maten opgeteld over alle rijen binnen de filters"""
+        return self._rows([], filters)[self.measures].sum()
+
+    def top(self, by, measure: str, n: int = 30, filters: dict = None) -> pd.DataFrame:
+        """De n grootste groepen op measure"""
+        return self.rollup(by, filters).sort_values(measure, ascending=False).head(n)
+
+# De cubes houden hun bronframe vast, zodat id(frame) zolang niet hergebruikt
+# kan worden door een ander frame (zie ook utils.filter_index)
+@st.cache_resource(max_entries=4)
+def _cached_order_cube(frame_id, _orders_df):
+    cube = RollupCube(_orders_df, ORDER_CUBE_DIMENSIONS, ORDER_CUBE_MEASURES)
+    cube.source = _orders_df
+    return cube
+
+def get_order_cube(orders_df: pd.DataFrame) -> RollupCube:
+    """De order cube van een orders frame uit de DataStore, één keer per geladen versie"""
+    return _cached_order_cube(id(orders_df), orders_df)
+
+@st.cache_resource(max_entries=4)
+def _cached_parts_cube(frame_id, _parts_df):
+    parts_df = _parts_df.rename(columns={'part_description': 'description'})
+    parts_df['total_income'] = parts_df['part_quantity'] * parts_df['part_price']
+    cube = RollupCube(parts_df, PARTS_CUBE_DIMENSIONS, PARTS_CUBE_MEASURES,
+                      attributes={'description': 'part_number'})
+    cube.source = _parts_df
+    return cube
+
+def get_parts_cube(parts_star) -> RollupCube:
+    """De onderdelen cube van het gedeelde sterschema, zie utils.parts_schema"""
+    parts_df = parts_star.frame(['defect_year', 'defect_month', 'client_name', 'category', 'zero_invoice'])
+    return _cached_parts_cube(id(parts_df), parts_df)
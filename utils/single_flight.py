@@ -0,0 +1,80 @@
+import threading
+import functools
+
+class _Call:
+    """Eén lopende uitvoering waar andere aanroepers op kunnen wachten"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Voegt gelijktijdige identieke aanroepen samen tot één uitvoering. De eerste
+    aanroeper voert de functie uit, wie tijdens die uitvoering met dezelfde
+    sleutel binnenkomt wacht en krijgt hetzelfde resultaat (of dezelfde fout).
+    Zo raakt een koude cache de database niet met N keer dezelfde zware query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._executions = 0
+        self._coalesced = 0
+        self._max_coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                self._max_coalesced = max(self._max_coalesced, call.waiters)
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def metrics(self):
+        """Aantal uitvoeringen, samengevoegde aanroepen en lopende uitvoeringen"""
+        with self._lock:
+            return {
+                'executions': self._executions,
+                'coalesced': self._coalesced,
+                'max_coalesced': self._max_coalesced,
+                'in_flight': len(self._calls),
+            }
+
+def single_flight(group):
+    """
+    Decorator die gelijktijdige aanroepen met dezelfde argumenten via `group`
+    samenvoegt. De argumenten vormen samen met de functienaam de sleutel.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # repr, zodat ook dicts als query parameters een sleutel opleveren
+            key = (func.__module__, func.__qualname__, repr(args), repr(sorted(kwargs.items())))
+            return group.do(key, func, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+import pandas as pd
+from utils.env_loader import load_env_var
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    # Zonder pyarrow werkt de app gewoon, alleen zonder snapshots
+    pa = None
+
+SNAPSHOT_DIR = Path(load_env_var('SNAPSHOT_DIR', str(Path(__file__).parent.parent / '.snapshots')))
+
+def query_hash(query: str) -> str:
+    """Hash van een query, ongevoelig voor witruimte"""
+    normalized = ' '.join(query.split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+class SnapshotStore:
+    """
+    Schrijft geladen DataFrames als geversioneerde Arrow IPC bestanden naar
+    schijf, elk met een manifest (query hash, aantal rijen, laadtijd). Zo
+    kunnen andere processen en een herstarte app de data lezen zonder naar
+    Postgres te gaan.
+
+    Het manifest wordt pas na het databestand weggeschreven, dus een snapshot
+    zonder manifest is onvolledig en wordt genegeerd.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR, keep=3):
+        self.directory = Path(directory)
+        self.keep = keep
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None
+
+    def _manifests(self, name):
+        """Manifests van een dataset, nieuwste eerst"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob(f'{name}-*.json'), reverse=True)
+
+    def write(self, name: str, df: pd.DataFrame, query: str, loaded_at: float = None, metadata: dict = None):
+        """
+        Schrijf een nieuwe versie van een dataset weg, return het manifest of None.
+        Extra velden in metadata komen mee in het manifest.
+        """
+        if not self.enabled:
+            return None
+
+        loaded_at = loaded_at or time.time()
+        version = f'{time.time_ns():020d}'
+        data_path = self.directory / f'{name}-{version}.arrow'
+        manifest_path = self.directory / f'{name}-{version}.json'
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            tmp_path = data_path.with_suffix('.arrow.tmp')
+            with pa.OSFile(str(tmp_path), 'wb') as sink:
+                with ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, data_path)
+
+            manifest = {
+                'name': name,
+                'version': version,
+                'file': data_path.name,
+                'query_hash': query_hash(query),
+                'row_count': len(df),
+                'loaded_at': loaded_at,
+                **(metadata or {}),
+            }
+            tmp_manifest = manifest_path.with_suffix('.json.tmp')
+            tmp_manifest.write_text(json.dumps(manifest))
+            os.replace(tmp_manifest, manifest_path)
+        except (OSError, pa.ArrowException, TypeError, ValueError):
+            # Een snapshot is een cache; als schrijven mislukt laden we gewoon uit de database
+            return None
+
+        self._prune(name)
+        return manifest
+
+    def read_latest(self, name: str, query: str, max_age: float = None):
+        """
+        Lees de nieuwste geldige snapshot van een dataset via memory mapping.
+        Return (DataFrame, manifest) of (None, None) als er geen bruikbare snapshot is.
+        """
+        if not self.enabled:
+            return None, None
+
+        expected_hash = query_hash(query)
+        for manifest_path in self._manifests(name):
+            try:
+                manifest = json.loads(manifest_path.read_text())
+            except (OSError, ValueError):
+                continue
+            if manifest.get('query_hash') != expected_hash:
+                continue
+            if max_age is not None and time.time() - manifest['loaded_at'] > max_age:
+                # Oudere versies zijn nog ouder, verder zoeken heeft geen zin
+                return None, None
+            try:
+                with pa.memory_map(str(self.directory / manifest['file']), 'r') as source:
+                    df = ipc.open_file(source).read_all().to_pandas()
+            except (OSError, pa.ArrowException):
+                continue
+            if len(df) != manifest['row_count']:
+                continue
+            return df, manifest
+        return None, None
+
+    def _prune(self, name):
+        """Verwijder alles behalve de nieuwste `keep` versies"""
+        for manifest_path in self._manifests(name)[self.keep:]:
+            data_path = manifest_path.with_suffix('.arrow')
+            for path in (manifest_path, data_path):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+snapshot_store = SnapshotStore()
@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta, date
 from io import BytesIO
-from utils.excel_utils import to_excel
+from utils.export_jobs import export_job_button
+from utils.data_store import get_data_store
+from utils.derived_columns import ymd
 import calendar
 
 def get_previous_month_range():
@@ -42,7 +44,7 @@ def render_accounting_export(orders_df):
         )
     
     # Filter data op geselecteerd datumbereik
-    mask = (orders_df['defect_date'].dt.date >= start_date) & (orders_df['defect_date'].dt.date <= end_date)
+    mask = (orders_df['defect_ymd'] >= ymd(start_date)) & (orders_df['defect_ymd'] <= ymd(end_date))
     filtered_df = orders_df[mask]
     
     # Selecteer alleen de gewenste kolommen en sorteer op datum (aflopend)
@@ -95,14 +97,8 @@ def render_accounting_export(orders_df):
         height=400
     )
     
-    # Export knop
-    if st.button("Export naar Excel"):
-        # Reset index voor export
-        export_data = export_df.copy()
-        excel_data = to_excel(export_data)
-        st.download_button(
-            label="Download Excel bestand",
-            data=excel_data,
-            file_name=f'export_boekhouding_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.xlsx',
-            mime='application/vnd.ms-excel'
-        )
\ No newline at end of file
+    # Export knop; het werkboek wordt op de achtergrond geschreven en blijft in de sidebar staan
+    export_job_button("Export naar Excel", lambda: export_df,
+                      f'export_boekhouding_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}',
+                      key='accounting', version=get_data_store().version_of(orders_df),
+                      filters={'start_date': start_date, 'end_date': end_date})
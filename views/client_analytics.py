@@ -4,56 +4,120 @@ import plotly.graph_objects as go
 import pandas as pd
 from io import BytesIO
 from utils.excel_utils import to_excel
+from utils.filter_index import get_filter_index
+from utils.rollup_cube import get_order_cube
+from utils.aggregate_memo import memoize_aggregate
+from utils.data_store import get_data_store
+
+@memoize_aggregate
+def client_chart_data(version, filters, _cube):
+    """Top 30 klanten op aantal orders en op kosten, en de kosten per servicecategorie"""
+    # Orders by client chart - Top 30
+    orders_by_client = _cube.top('client_name', 'count', 30, filters)[['client_name', 'count']]
+    
+    # Revenue by client chart - Top 30
+    revenue_df = (
+        _cube.rollup('client_name', filters)[['client_name', 'total_labour_cost', 'total_parts_cost']]
+        .assign(total_cost=lambda x: x['total_labour_cost'] + x['total_parts_cost'])
+        .sort_values('total_cost', ascending=False)
+        .head(30)
+    )
+    
+    # Verdelen op servicecategorie
+    service_category_df = (
+        _cube.rollup('category', filters)[['category', 'total_labour_cost', 'total_parts_cost']]
+        .assign(total_cost=lambda x: x['total_labour_cost'] + x['total_parts_cost'])
+        .sort_values('total_cost', ascending=False)
+    )
+    return orders_by_client, revenue_df, service_category_df
+
+@memoize_aggregate
+def client_history(version, filters, client, _index):
+    """Kerncijfers en de laatste 10 orders van één klant binnen de filters"""
+    client_df = _index.take({**filters, 'client_name': client})
+    total_labour_cost = client_df['total_labour_cost'].sum()
+    total_parts_cost = client_df['total_parts_cost'].sum()
+    metrics = {
+        'orders': len(client_df),
+        'avg_labour_cost': client_df['total_labour_cost'].mean(),
+        'warranty_claims': int(client_df['warranty_number'].notna().sum()),
+        'total_labour_cost': total_labour_cost,
+        'total_parts_cost': total_parts_cost,
+        # Voeg totale kosten toe
+        'total_cost': total_labour_cost + total_parts_cost,
+    }
+    
+    latest_orders = client_df.sort_values('defect_date', ascending=False)[
+        ['defect_date', 'number', 'machine_model', 'machine_vin', 'category', 'id']
+    ].head(10)  # Toon laatste 10 orders
+    
+    # Format de datum kolom
+    latest_orders['defect_date'] = latest_orders['defect_date'].dt.strftime('%Y-%m-%d')
+    
+    # Voeg link kolom toe
+    latest_orders['Link'] = latest_orders['id'].apply(lambda x: f"https://wpm.westtrac-portal.be/orders/{x}")
+    
+    # Hernoem kolommen voor weergave
+    latest_orders = latest_orders.rename(columns={
+        'defect_date': 'Datum',
+        'number': 'Order Nr',
+        'machine_model': 'Machine',
+        'machine_vin': 'VIN',
+        'category': 'Categorie'
+    })
+    
+    # Verwijder de id kolom
+    latest_orders = latest_orders.drop(columns=['id'])
+    return metrics, latest_orders
 
 def render_client_analytics(orders_df, client_turnover_df=None):
     st.header("Klant Analyse")
     
-    # Convert defect_date to datetime if it's not already
-    orders_df['defect_date'] = pd.to_datetime(orders_df['defect_date'])
+    # Gedeelde index voor de filters, zie utils.filter_index
+    index = get_filter_index(orders_df)
     
     # Filters row
     col1, col2, col3, col4, col5 = st.columns(5)  # Voeg een vijfde kolom toe voor de nulfactuur filter
     
     with col1:
         # Year filter
-        years = orders_df['defect_date'].dt.year.unique()
+        years = index.values('defect_year')
         years = sorted(years, reverse=True)  # Meest recente jaren eerst
         selected_year = st.selectbox("Selecteer Jaar", years)
     
     with col2:
         # Client filter
-        clients = orders_df[orders_df['defect_date'].dt.year == selected_year]['client_name'].unique()
+        clients = index.values('client_name', {'defect_year': selected_year})
         selected_client = st.multiselect("Selecteer Klanten", clients)
     
     with col3:
         # Machine filter
-        machines = orders_df[orders_df['defect_date'].dt.year == selected_year]['machine_model'].unique()
+        machines = index.values('machine_model', {'defect_year': selected_year})
         selected_machines = st.multiselect("Selecteer Machines", machines)
     
     with col4:
         # Service category filter
-        service_categories = orders_df['category'].unique()
+        service_categories = index.values('category')
         selected_categories = st.multiselect("Selecteer Service Categorieën", service_categories)
     
     with col5:
         # Nulfacturen includeren filter
         zero_invoice_filter = st.selectbox("Nulfacturen Includeren", options=["Ja", "Nee"], index=0)
     
-    # Apply filters
-    filtered_df = orders_df[orders_df['defect_date'].dt.year == selected_year]
-    
-    if selected_client:
-        filtered_df = filtered_df[filtered_df['client_name'].isin(selected_client)]
+    # Filters, lege selecties filteren niet
+    filters = {
+        'defect_year': selected_year,
+        'client_name': selected_client,
+        'machine_model': selected_machines,
+        'category': selected_categories,
+        # Nulfacturen uitsluiten
+        'zero_invoice': False if zero_invoice_filter == "Nee" else None,
+    }
     
-    if selected_machines:
-        filtered_df = filtered_df[filtered_df['machine_model'].isin(selected_machines)]
-    
-    if selected_categories:
-        filtered_df = filtered_df[filtered_df['category'].isin(selected_categories)]
-    
-    # Pas de nulfactuurfilter toe
-    if zero_invoice_filter == "Nee":
-        filtered_df = filtered_df[filtered_df['zero_invoice'] == False]
+    # Grafieken komen uit de vooraf geaggregeerde cube, zie utils.rollup_cube. De
+    # uitkomsten worden per dataversie en filters gedeeld, zie utils.aggregate_memo
+    version = get_data_store().version_of(orders_df)
+    orders_by_client, revenue_df, service_category_df = client_chart_data(version, filters, get_order_cube(orders_df))
     
     # If we have turnover data, add it to the analysis
     if client_turnover_df is not None:
@@ -61,7 +125,7 @@ def render_client_analytics(orders_df, client_turnover_df=None):
         
         # Group turnover data by client
         client_turnover = (
-            client_turnover_df.groupby('client_name')
+            client_turnover_df.groupby('client_name', observed=True)
             .agg({
                 'total_price_with_discount': 'sum',
                 'total_base_price': 'sum',
@@ -111,15 +175,6 @@ def render_client_analytics(orders_df, client_turnover_df=None):
         
         st.plotly_chart(fig_turnover, use_container_width=True)
     
-    # Orders by client chart - Top 30
-    orders_by_client = (
-        filtered_df.groupby('client_name')
-        .size()
-        .reset_index(name='count')
-        .sort_values('count', ascending=False)
-        .head(30)
-    )
-    
     # Export knop voor orders data
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -133,19 +188,6 @@ def render_client_analytics(orders_df, client_turnover_df=None):
     )
     st.plotly_chart(fig_orders, use_container_width=True)
     
-    # Revenue by client chart - Top 30
-    revenue_df = (
-        filtered_df.groupby('client_name')
-        .agg({
-            'total_labour_cost': 'sum',
-            'total_parts_cost': 'sum'
-        })
-        .assign(total_cost=lambda x: x['total_labour_cost'] + x['total_parts_cost'])
-        .reset_index()
-        .sort_values('total_cost', ascending=False)
-        .head(30)
-    )
-    
     # Export knop voor revenue data
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -192,55 +234,29 @@ def render_client_analytics(orders_df, client_turnover_df=None):
     # Client service history
     st.subheader("Klant Service Historie")
     for client in selected_client:
-        client_df = filtered_df[filtered_df['client_name'] == client]
+        metrics, latest_orders = client_history(version, filters, client, index)
         st.write(f"### {client}")
         
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Totaal Orders", len(client_df))
+            st.metric("Totaal Orders", metrics['orders'])
         with col2:
             st.metric("Gemiddelde Arbeidskosten", 
-                     f"€{client_df['total_labour_cost'].mean():.2f}")
+                     f"€{metrics['avg_labour_cost']:.2f}")
         with col3:
             st.metric("Garantie Claims", 
-                     len(client_df[client_df['warranty_number'].notna()]))
-        
-        # Voeg totale kosten toe
-        total_labour_cost = client_df['total_labour_cost'].sum()
-        total_parts_cost = client_df['total_parts_cost'].sum()
-        total_cost = total_labour_cost + total_parts_cost
+                     metrics['warranty_claims'])
         
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Totale Kosten", f"€{total_cost:.2f}")
+            st.metric("Totale Kosten", f"€{metrics['total_cost']:.2f}")
         with col2:
-            st.metric("Totale Arbeidskosten", f"€{total_labour_cost:.2f}")
+            st.metric("Totale Arbeidskosten", f"€{metrics['total_labour_cost']:.2f}")
         with col3:
-            st.metric("Totale Onderdelen Kosten", f"€{total_parts_cost:.2f}")
+            st.metric("Totale Onderdelen Kosten", f"€{metrics['total_parts_cost']:.2f}")
             
         # Laatste orders overzicht
         st.write("#### Laatste Orders")
-        latest_orders = client_df.sort_values('defect_date', ascending=False)[
-            ['defect_date', 'number', 'machine_model', 'machine_vin', 'category', 'id']
-        ].head(10)  # Toon laatste 10 orders
-        
-        # Format de datum kolom
-        latest_orders['defect_date'] = latest_orders['defect_date'].dt.strftime('%Y-%m-%d')
-        
-        # Voeg link kolom toe
-        latest_orders['Link'] = latest_orders['id'].apply(lambda x: f"https://wpm.westtrac-portal.be/orders/{x}")
-        
-        # Hernoem kolommen voor weergave
-        latest_orders = latest_orders.rename(columns={
-            'defect_date': 'Datum',
-            'number': 'Order Nr',
-            'machine_model': 'Machine',
-            'machine_vin': 'VIN',
-            'category': 'Categorie'
-        })
-        
-        # Verwijder de id kolom
-        latest_orders = latest_orders.drop(columns=['id'])
         
         st.dataframe(
             latest_orders,
@@ -258,16 +274,6 @@ def render_client_analytics(orders_df, client_turnover_df=None):
     
     # Verdelen op servicecategorie
     st.subheader("Verdeling op Service Categorie")
-    service_category_df = (
-        filtered_df.groupby('category')
-        .agg({
-            'total_labour_cost': 'sum',
-            'total_parts_cost': 'sum'
-        })
-        .assign(total_cost=lambda x: x['total_labour_cost'] + x['total_parts_cost'])
-        .reset_index()
-        .sort_values('total_cost', ascending=False)
-    )
     
     # Maak een staafdiagram voor de verdeling
     fig_service_category = px.bar(
@@ -1,7 +1,71 @@
 import streamlit as st
 import pandas as pd
-from utils.database import load_orders_data, load_parts_data
-from utils.excel_utils import to_excel
+from utils.data_store import get_shared_data
+from utils.parts_schema import get_parts_star
+from utils.filter_index import get_filter_index
+from utils.export_jobs import export_job_button
+from utils.export_writer import EXPORT_FORMATS
+
+def build_export_frame(filtered_df, export_type, selected_columns, status_mapping):
+    """
+    Zet de gefilterde regels om naar het exportbestand: status beschrijvingen,
+    aggregatie, duplicaten en sortering. Draait als achtergrond job, zie
+    utils.export_jobs.
+    """
+    # Voor weergave, vervang status codes door beschrijvingen
+    if 'status' in filtered_df.columns:
+        filtered_df = filtered_df.assign(status=filtered_df['status'].map(status_mapping))
+    
+    # Filter alleen de geselecteerde kolommen en pas aggregatie toe indien nodig
+    if export_type == "Onderdelen" and any(col in selected_columns for col in ['part_quantity', 'turnover']):
+        # Bepaal de groepeer kolommen (alle kolommen behalve de aggregatie kolommen)
+        group_columns = [col for col in selected_columns if col not in ['part_quantity', 'turnover']]
+        
+        if group_columns:
+            # Maak een dict met aggregatie functies
+            agg_dict = {}
+            if 'part_quantity' in selected_columns:
+                agg_dict['part_quantity'] = 'sum'
+            if 'turnover' in selected_columns:
+                agg_dict['turnover'] = 'sum'
+                
+            # Groepeer en aggregeer
+            export_df = filtered_df.groupby(group_columns, as_index=False, observed=True).agg(agg_dict)
+        else:
+            # Als alleen aggregatie kolommen zijn geselecteerd
+            export_df = pd.DataFrame({
+                col: [filtered_df[col].sum()] for col in selected_columns
+            })
+    elif 'total_order_cost' in selected_columns:
+        # Bestaande logica voor total_order_cost
+        group_columns = [col for col in selected_columns if col != 'total_order_cost']
+        
+        if group_columns:
+            export_df = filtered_df.groupby(group_columns, as_index=False, observed=True)['total_order_cost'].sum()
+        else:
+            export_df = filtered_df[['total_order_cost']].copy()
+    else:
+        # Geen aggregatie nodig
+        export_df = filtered_df[selected_columns].copy()
+    
+    # Verwijder duplicaten
+    export_df = export_df.drop_duplicates()
+    
+    # Sorteer de data
+    if export_type == "Onderdelen":
+        export_df = export_df.sort_values(by=['part_number'] if 'part_number' in selected_columns else selected_columns[0])
+    else:
+        # Sorteer op klantnaam en dan ordernummer als ze beschikbaar zijn
+        sort_cols = []
+        if 'client_name' in selected_columns:
+            sort_cols.append('client_name')
+        if 'number' in selected_columns:
+            sort_cols.append('number')
+        if not sort_cols:
+            sort_cols = selected_columns[:1]
+        export_df = export_df.sort_values(by=sort_cols)
+    
+    return export_df
 
 def render_export_tool():
     st.header("Export Tool")
@@ -12,20 +76,27 @@ def render_export_tool():
         ["Onderdelen", "Klant & Machine"]
     )
     
-    # Laad data op basis van type
+    # Laad data op basis van type, afgeleide kolommen komen op een afgeleid frame
+    store = get_shared_data()
     if export_type == "Onderdelen":
-        df = load_parts_data()
-        # Converteer part_description naar hoofdletters
-        df['part_description'] = df['part_description'].str.upper()
-        # Bereken turnover per onderdeel
-        df['turnover'] = df['part_price'] * df['part_quantity']
+        # Onderdeelregels met alleen de ordervelden waarop gefilterd wordt
+        parts_star = get_parts_star()
+        version = parts_star.version
+        base_df = parts_star.frame(['created_year', 'created_month', 'client_name', 'machine_model', 'category', 'status'])
+        df = base_df.assign(
+            # Converteer part_description naar hoofdletters
+            part_description=base_df['part_description'].str.upper(),
+            # Bereken turnover per onderdeel
+            turnover=base_df['part_price'] * base_df['part_quantity']
+        )
     else:
-        df = load_orders_data()
+        base_df = store.get('orders')
+        version = store.version_of(base_df)
         # Bereken totale orderprijs
-        df['total_order_cost'] = df['total_labour_cost'].fillna(0) + df['total_parts_cost'].fillna(0)
+        df = base_df.assign(total_order_cost=base_df['total_labour_cost'].fillna(0) + base_df['total_parts_cost'].fillna(0))
     
-    # Converteer created_at naar datetime
-    df['created_at'] = pd.to_datetime(df['created_at'])
+    # Filters via de gedeelde index van het frame uit de store, zie utils.filter_index
+    index = get_filter_index(base_df)
     
     # Filter sectie
     st.subheader("Filters")
@@ -33,14 +104,14 @@ def render_export_tool():
     
     with col1:
         # Jaar filter
-        years = sorted([year for year in df['created_at'].dt.year.unique() if pd.notna(year)], reverse=True)
+        years = sorted(index.values('created_year'), reverse=True)
         selected_year = st.selectbox(
             "Jaar",
             ["Alle"] + list(years)
         )
         
         # Klant filter
-        clients = sorted([client for client in df['client_name'].unique() if pd.notna(client)])
+        clients = sorted(index.values('client_name'))
         selected_client = st.selectbox(
             "Klant",
             ["Alle"] + list(clients)
@@ -58,7 +129,7 @@ def render_export_tool():
         )
         
         # Machine model filter
-        models = sorted([model for model in df['machine_model'].unique() if pd.notna(model)])
+        models = sorted(index.values('machine_model'))
         selected_model = st.selectbox(
             "Machine Model",
             ["Alle"] + list(models)
@@ -66,7 +137,7 @@ def render_export_tool():
     
     with col3:
         # Category filter
-        categories = sorted([cat for cat in df['category'].unique() if pd.notna(cat)])
+        categories = sorted(index.values('category'))
         selected_category = st.selectbox(
             "Categorie",
             ["Alle"] + list(categories)
@@ -91,7 +162,7 @@ def render_export_tool():
         
         # Status filter met beschrijvingen
         status_descriptions = sorted([status_mapping.get(status, status) 
-                                   for status in df['status'].unique() if pd.notna(status)])
+                                   for status in index.values('status')])
         selected_status_description = st.selectbox(
             "Status",
             ["Alle"] + list(status_descriptions)
@@ -100,31 +171,20 @@ def render_export_tool():
         selected_status = next((fase for fase, desc in status_mapping.items() 
                               if desc == selected_status_description), "Alle")
     
-    # Pas filters toe
-    filtered_df = df.copy()
-    
-    if selected_year != "Alle":
-        filtered_df = filtered_df[filtered_df['created_at'].dt.year == selected_year]
-    
-    if selected_month != "Alle":
-        selected_month_num = months[month_names.index(selected_month)]
-        filtered_df = filtered_df[filtered_df['created_at'].dt.month == selected_month_num]
-    
-    if selected_client != "Alle":
-        filtered_df = filtered_df[filtered_df['client_name'] == selected_client]
-    
-    if selected_model != "Alle":
-        filtered_df = filtered_df[filtered_df['machine_model'] == selected_model]
-    
-    if selected_category != "Alle":
-        filtered_df = filtered_df[filtered_df['category'] == selected_category]
-        
-    if selected_status != "Alle":
-        filtered_df = filtered_df[filtered_df['status'] == selected_status]
-    
-    # Voor weergave, vervang status codes door beschrijvingen
-    if 'status' in filtered_df.columns:
-        filtered_df['status'] = filtered_df['status'].map(status_mapping)
+    # Pas filters toe via de index; "Alle" betekent geen filter
+    def choice(value):
+        return None if value == "Alle" else value
+    
+    selected_month_num = None if selected_month == "Alle" else months[month_names.index(selected_month)]
+    filters = {
+        'created_year': choice(selected_year),
+        'created_month': selected_month_num,
+        'client_name': choice(selected_client),
+        'machine_model': choice(selected_model),
+        'category': choice(selected_category),
+        'status': choice(selected_status),
+    }
+    filtered_df = index.take(filters, df=df)
     
     # Definieer toegestane attributen per type
     parts_attributes = {
@@ -170,67 +230,22 @@ def render_export_tool():
         st.warning("Selecteer ten minste één kolom om te exporteren")
         return
     
-    # Filter alleen de geselecteerde kolommen en pas aggregatie toe indien nodig
-    if export_type == "Onderdelen" and any(col in selected_columns for col in ['part_quantity', 'turnover']):
-        # Bepaal de groepeer kolommen (alle kolommen behalve de aggregatie kolommen)
-        group_columns = [col for col in selected_columns if col not in ['part_quantity', 'turnover']]
-        
-        if group_columns:
-            # Maak een dict met aggregatie functies
-            agg_dict = {}
-            if 'part_quantity' in selected_columns:
-                agg_dict['part_quantity'] = 'sum'
-            if 'turnover' in selected_columns:
-                agg_dict['turnover'] = 'sum'
-                
-            # Groepeer en aggregeer
-            export_df = filtered_df.groupby(group_columns, as_index=False).agg(agg_dict)
-        else:
-            # Als alleen aggregatie kolommen zijn geselecteerd
-            export_df = pd.DataFrame({
-                col: [filtered_df[col].sum()] for col in selected_columns
-            })
-    elif 'total_order_cost' in selected_columns:
-        # Bestaande logica voor total_order_cost
-        group_columns = [col for col in selected_columns if col != 'total_order_cost']
-        
-        if group_columns:
-            export_df = filtered_df.groupby(group_columns, as_index=False)['total_order_cost'].sum()
-        else:
-            export_df = filtered_df[['total_order_cost']].copy()
-    else:
-        # Geen aggregatie nodig
-        export_df = filtered_df[selected_columns].copy()
-    
-    # Verwijder duplicaten
-    export_df = export_df.drop_duplicates()
-    
-    # Sorteer de data
-    if export_type == "Onderdelen":
-        export_df = export_df.sort_values(by=['part_number'] if 'part_number' in selected_columns else selected_columns[0])
-    else:
-        # Sorteer op klantnaam en dan ordernummer als ze beschikbaar zijn
-        sort_cols = []
-        if 'client_name' in selected_columns:
-            sort_cols.append('client_name')
-        if 'number' in selected_columns:
-            sort_cols.append('number')
-        if not sort_cols:
-            sort_cols = selected_columns[:1]
-        export_df = export_df.sort_values(by=sort_cols)
-    
-    # Preview van de data
-    st.subheader("Preview")
-    st.dataframe(export_df.head(5), use_container_width=True)
-    
-    # Toon aantal records
-    st.text(f"Aantal records: {len(export_df)}")
+    # Toon aantal gefilterde regels; het exportbestand zelf wordt op de achtergrond gemaakt
+    st.text(f"Aantal gefilterde regels: {len(filtered_df):,}")
     
     # Export knop
-    excel_data = to_excel(export_df)
-    st.download_button(
-        label="Export naar Excel",
-        data=excel_data,
-        file_name=f'export_{export_type.lower().replace(" & ", "_")}_{pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
-        mime='application/vnd.ms-excel'
-    ) 
\ No newline at end of file
+    # Formaat van het bestand; grote exports worden in blokken naar schijf geschreven
+    fmt = st.radio(
+        "Formaat",
+        list(EXPORT_FORMATS),
+        format_func=lambda fmt: EXPORT_FORMATS[fmt].label,
+        horizontal=True
+    )
+    
+    # De volgorde van de kolommen telt mee, dus als één tekst in de sleutel
+    export_job_button(f"Export naar {EXPORT_FORMATS[fmt].label}",
+                      lambda: build_export_frame(filtered_df, export_type, selected_columns, status_mapping),
+                      f'export_{export_type.lower().replace(" & ", "_")}_{pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")}',
+                      key='export_tool', version=version,
+                      filters={**filters, 'export_type': export_type, 'columns': '|'.join(selected_columns)},
+                      fmt=fmt, preview=True)
@@ -4,7 +4,9 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from io import BytesIO
 import pandas as pd
-from utils.excel_utils import to_excel
+from utils.excel_utils import export_download
+from utils.data_store import get_data_store
+from utils.derived_columns import ymd
 
 
 def render_financial_analytics(orders_df, invoices_df):
@@ -23,12 +25,16 @@ def render_financial_analytics(orders_df, invoices_df):
             datetime.now()
         )
     
-    # Filter data by date range
+    # Filter data by date range, op de bij het laden afgeleide jjjjmmdd datum
     filtered_orders = orders_df[
-        (orders_df['created_at'].dt.date >= start_date) &
-        (orders_df['created_at'].dt.date <= end_date)
+        (orders_df['created_ymd'] >= ymd(start_date)) &
+        (orders_df['created_ymd'] <= ymd(end_date))
     ]
     
+    # Exports worden pas bij een klik gemaakt en per dataversie en periode gedeeld
+    version = get_data_store().version_of(orders_df)
+    period = {'start_date': start_date, 'end_date': end_date}
+    
     # Fill NaN/None values with 0 before calculations
     filtered_orders['total_labour_cost'] = filtered_orders['total_labour_cost'].fillna(0)
     filtered_orders['total_parts_cost'] = filtered_orders['total_parts_cost'].fillna(0)
@@ -68,13 +74,9 @@ def render_financial_analytics(orders_df, invoices_df):
     with col1:
         st.subheader("Dagelijkse Omzet Trend")
     with col2:
-        excel_data = to_excel(daily_revenue)
-        st.download_button(
-            label="Export",
-            data=excel_data,
-            file_name=f'daily_revenue_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.xlsx',
-            mime='application/vnd.ms-excel'
-        )
+        export_download("Export", daily_revenue,
+                       f'daily_revenue_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}',
+                       key='financial_daily_revenue', version=version, filters=period)
     
     fig_revenue = go.Figure()
     
@@ -110,7 +112,7 @@ def render_financial_analytics(orders_df, invoices_df):
     st.plotly_chart(fig_revenue, use_container_width=True)
     
     # Revenue by category with split
-    revenue_by_category = filtered_orders.groupby('category').agg({
+    revenue_by_category = filtered_orders.groupby('category', observed=True).agg({
         'total_labour_cost': 'sum',
         'total_parts_cost': 'sum'
     }).reset_index()
@@ -125,13 +127,9 @@ def render_financial_analytics(orders_df, invoices_df):
     with col1:
         st.subheader("Omzetverdeling per Service Categorie")
     with col2:
-        excel_data = to_excel(revenue_by_category)
-        st.download_button(
-            label="Export",
-            data=excel_data,
-            file_name=f'revenue_by_category_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.xlsx',
-            mime='application/vnd.ms-excel'
-        )
+        export_download("Export", revenue_by_category,
+                       f'revenue_by_category_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}',
+                       key='financial_revenue_by_category', version=version, filters=period)
     
     fig_category = px.bar(
         revenue_by_category,
@@ -155,10 +153,6 @@ def render_financial_analytics(orders_df, invoices_df):
     
     # Export knop voor alle financiële data
     st.sidebar.markdown("---")
-    excel_data = to_excel(filtered_orders)
-    st.sidebar.download_button(
-        label="Export",
-        data=excel_data,
-        file_name=f'financial_data_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.xlsx',
-        mime='application/vnd.ms-excel'
-    )
+    export_download("Export", filtered_orders,
+                   f'financial_data_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}',
+                   key='financial_orders', version=version, filters=period, container=st.sidebar)
@@ -1,91 +1,104 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
 from io import BytesIO
-from utils.excel_utils import to_excel
+from utils.excel_utils import export_download
+from utils.filter_index import get_filter_index
+from utils.rollup_cube import get_order_cube
+from utils.aggregate_memo import memoize_aggregate
+from utils.data_store import get_data_store
+
+@memoize_aggregate
+def machine_chart_data(version, filters, _cube):
+    """Top 30 modellen op aantal orders en op kosten, plus de overzichtscijfers"""
+    by_model = _cube.rollup(['machine_brand', 'machine_model'], filters)
+    
+    # Orders by machine model - Top 30
+    orders_by_model = (
+        by_model[['machine_brand', 'machine_model', 'count']]
+        .sort_values('count', ascending=False)
+        .head(30)
+    )
+    
+    # Costs by machine model - Top 30
+    costs_by_model = by_model[['machine_brand', 'machine_model', 'total_labour_cost', 'total_parts_cost']]
+    
+    # Add total cost for sorting
+    costs_by_model = costs_by_model.assign(total_cost=costs_by_model['total_labour_cost'] + costs_by_model['total_parts_cost'])
+    costs_by_model = costs_by_model.sort_values('total_cost', ascending=False).head(30)
+    
+    totals = _cube.totals(filters)
+    overview = {
+        # Ook orders zonder merk of model tellen als combinatie, zoals drop_duplicates
+        'models': len(_cube.rollup(['machine_brand', 'machine_model'], filters, dropna=False)),
+        # Gemiddelden over de orders met een bedrag, zoals Series.mean
+        'avg_cost': (totals['total_labour_cost'] / totals['labour_cost_orders']
+                     + totals['total_parts_cost'] / totals['parts_cost_orders']),
+        'orders': int(totals['count']),
+    }
+    return orders_by_model, costs_by_model, overview
 
 def render_machine_analytics(orders_df):
     st.header("Machine Analyse")
     
-    # Convert defect_date to datetime if it's not already
-    orders_df['defect_date'] = pd.to_datetime(orders_df['defect_date'])
+    # Gedeelde index voor de filters, zie utils.filter_index
+    index = get_filter_index(orders_df)
     
     # Filters row
     col1, col2, col3, col4, col5, col6 = st.columns(6)  # Voeg een zesde kolom toe voor het klantfilter
     
     with col1:
         # Year filter
-        years = orders_df['defect_date'].dt.year.unique()
+        years = index.values('defect_year')
         years = sorted(years, reverse=True)  # Meest recente jaren eerst
         selected_year = st.selectbox("Selecteer Jaar", years)
     
     with col2:
         # Customer filter
-        customers = sorted([x for x in orders_df['client_name'].unique() if pd.notna(x)])
+        customers = sorted(index.values('client_name'))
         selected_customer = st.multiselect("Selecteer Klanten", customers)
     
     with col3:
         # Brand filter
-        brands = orders_df['machine_brand'].unique()
+        brands = index.values('machine_brand')
         selected_brand = st.multiselect("Selecteer Merken", brands)
     
     with col4:
         # Model filter
-        if selected_brand:
-            models = orders_df[orders_df['machine_brand'].isin(selected_brand)]['machine_model'].unique()
-        else:
-            models = orders_df['machine_model'].unique()
+        models = index.values('machine_model', {'machine_brand': selected_brand})
         selected_model = st.multiselect("Selecteer Modellen", models)
     
     with col5:
         # Service category filter
-        service_categories = orders_df['category'].unique()
+        service_categories = index.values('category')
         selected_categories = st.multiselect("Selecteer Service Categorieën", service_categories)
     
     with col6:
         # Nulfacturen includeren filter
         zero_invoice_filter = st.selectbox("Nulfacturen Includeren", options=["Ja", "Nee"], index=0)
     
-    # Apply filters
-    filtered_df = orders_df[orders_df['defect_date'].dt.year == selected_year]
-    
-    if selected_customer:
-        filtered_df = filtered_df[filtered_df['client_name'].isin(selected_customer)]
-    
-    if selected_brand:
-        filtered_df = filtered_df[filtered_df['machine_brand'].isin(selected_brand)]
-    
-    if selected_model:
-        filtered_df = filtered_df[filtered_df['machine_model'].isin(selected_model)]
-    
-    if selected_categories:
-        filtered_df = filtered_df[filtered_df['category'].isin(selected_categories)]
-    
-    # Pas de nulfactuurfilter toe
-    if zero_invoice_filter == "Nee":
-        filtered_df = filtered_df[filtered_df['zero_invoice'] == False]
-    
-    # Orders by machine model - Top 30
-    orders_by_model = (
-        filtered_df.groupby(['machine_brand', 'machine_model'])
-        .size()
-        .reset_index(name='count')
-        .sort_values('count', ascending=False)
-        .head(30)
-    )
+    # Filters, lege selecties filteren niet
+    filters = {
+        'defect_year': selected_year,
+        'client_name': selected_customer,
+        'machine_brand': selected_brand,
+        'machine_model': selected_model,
+        'category': selected_categories,
+        # Nulfacturen uitsluiten
+        'zero_invoice': False if zero_invoice_filter == "Nee" else None,
+    }
+    
+    # Alle cijfers komen uit de vooraf geaggregeerde cube, zie utils.rollup_cube. De
+    # uitkomsten worden per dataversie en filters gedeeld, zie utils.aggregate_memo
+    version = get_data_store().version_of(orders_df)
+    orders_by_model, costs_by_model, overview = machine_chart_data(version, filters, get_order_cube(orders_df))
     
     # Export knop voor orders data
     col1, col2 = st.columns([3, 1])
     with col1:
         st.subheader(f"Top 30 Machine Modellen op Aantal Orders ({selected_year})")
     with col2:
-        excel_data = to_excel(orders_by_model)
-        st.download_button(
-            label="Export",
-            data=excel_data,
-            file_name=f'orders_by_machine_{selected_year}.xlsx',
-            mime='application/vnd.ms-excel'
-        )
+        export_download("Export", orders_by_model, f'orders_by_machine_{selected_year}',
+                       key='machine_orders', version=version, filters=filters)
     
     fig_orders = px.bar(
         orders_by_model,
@@ -104,32 +117,13 @@ def render_machine_analytics(orders_df):
     
     st.plotly_chart(fig_orders, use_container_width=True)
     
-    # Costs by machine model - Top 30
-    costs_by_model = (
-        filtered_df.groupby(['machine_brand', 'machine_model'])
-        .agg({
-            'total_labour_cost': 'sum',
-            'total_parts_cost': 'sum'
-        })
-        .reset_index()
-    )
-    
-    # Add total cost for sorting
-    costs_by_model['total_cost'] = costs_by_model['total_labour_cost'] + costs_by_model['total_parts_cost']
-    costs_by_model = costs_by_model.sort_values('total_cost', ascending=False).head(30)
-    
     # Export knop voor costs data
     col1, col2 = st.columns([3, 1])
     with col1:
         st.subheader(f"Top 30 Machine Modellen op Totale Kosten ({selected_year})")
     with col2:
-        excel_data = to_excel(costs_by_model)
-        st.download_button(
-            label="Export",
-            data=excel_data,
-            file_name=f'costs_by_machine_{selected_year}.xlsx',
-            mime='application/vnd.ms-excel'
-        )
+        export_download("Export", costs_by_model, f'costs_by_machine_{selected_year}',
+                       key='machine_costs', version=version, filters=filters)
     
     fig_costs = px.bar(
         costs_by_model,
@@ -177,10 +171,10 @@ def render_machine_analytics(orders_df):
     
     with col1:
         st.metric("Totaal Machine Modellen", 
-                 len(filtered_df[['machine_brand', 'machine_model']].drop_duplicates()))
+                 overview['models'])
     with col2:
         st.metric("Gemiddelde Kosten per Order", 
-                 f"{filtered_df['total_labour_cost'].mean() + filtered_df['total_parts_cost'].mean():,.2f}")
+                 f"{overview['avg_cost']:,.2f}")
     with col3:
         st.metric("Totaal Orders", 
-                 len(filtered_df))
+                 overview['orders'])
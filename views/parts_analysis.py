@@ -1,36 +1,111 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 from utils.excel_utils import to_excel
+from utils.filter_index import get_filter_index
+from utils.rollup_cube import get_parts_cube
+from utils.part_search import get_part_search_index
+from utils.aggregate_memo import memoize_aggregate
+from utils.background_cache import BackgroundCache
 from datetime import datetime
 from typing import Dict, List
-from analytics.seasonal_patterns import SeasonalPatternAnalyzer
+from analytics.seasonal_patterns import SeasonalPatternAnalyzer, PEAK_THRESHOLD, TROUGH_THRESHOLD
+from analytics.seasonal_store import SeasonalIndexStore, SEASONAL_STORE_DIR
 
-def apply_filters(df, year, customers, categories, zero_invoice_filter):
-    """Helper functie om filters toe te passen"""
-    filtered_df = df[df['defect_date'].dt.year == year]
+def apply_filters(df, filters):
+    """Helper functie om filters toe te passen, via de gedeelde filter index van df"""
+    return get_filter_index(df).take(filters)
+
+@memoize_aggregate
+def top_parts_data(version, filters, _cube):
+    """Top 30 onderdelen op gebruikt aantal en op totale inkomsten"""
+    # Top 30 meest voorkomende onderdelen, filter outliers
+    top_parts = _cube.rollup('part_number', filters)[['part_number', 'count', 'description']]
+    
+    # Filter out occurrences greater than 1 million
+    top_parts = top_parts[top_parts['count'] <= 1_000_000]
+    
+    # Sort by count in descending order and take the top 30
+    top_parts = top_parts.sort_values(by='count', ascending=False).head(30)
     
-    if customers:
-        filtered_df = filtered_df[filtered_df['client_name'].isin(customers)]
+    # Convert part_number to string
+    top_parts['part_number'] = top_parts['part_number'].astype(str)
+    
+    # Top 30 onderdelen op basis van totale inkomsten (aantal x prijs)
+    top_income_parts = _cube.top('part_number', 'total_income', 30, filters)[['part_number', 'total_income', 'description']]
+    top_income_parts['part_number'] = top_income_parts['part_number'].astype(str)
+    return top_parts, top_income_parts
+
+@memoize_aggregate
+def search_part(version, filters, search_query, exact, _parts_df, _cube):
+    """
+    Kerncijfers, gebruik per categorie en orderoverzicht van de onderdelen
+    waarvan het nummer search_query bevat (of met exact: dat nummer is), of
+    None als er geen zijn
+    """
+    # Onderdeelnummers uit de zoekindex, zie utils.part_search
+    part_numbers = [search_query] if exact else get_part_search_index(_parts_df).matches(search_query)
+    if not part_numbers:
+        return None
     
-    if categories:
-        filtered_df = filtered_df[filtered_df['category'].isin(categories)]
+    # Alleen de regels van die onderdelen binnen de filters, via de filter index
+    part_filters = {**filters, 'part_number': part_numbers}
+    part_filtered_df = apply_filters(_parts_df, part_filters)
+    if part_filtered_df.empty:
+        return None
     
-    if zero_invoice_filter == "Nee":
-        filtered_df = filtered_df[filtered_df['zero_invoice'] == False]
+    # Bereken totalen en gemiddelden
+    summary = {
+        'part_number': part_filtered_df['part_number'].iloc[0],
+        'description': part_filtered_df['part_description'].iloc[0],
+        'avg_price': part_filtered_df['part_price'].mean(),
+        'total_quantity': part_filtered_df['part_quantity'].sum(),
+    }
     
-    return filtered_df
+    # Aantal en totale kost per categorie, opgeteld uit de onderdelen cube
+    usage_by_category = (
+        _cube.rollup('category', part_filters)[['category', 'count', 'total_income']]
+        .rename(columns={
+            'category': 'Categorie',
+            'count': 'Aantal',
+            'total_income': 'Totale Kost'
+        })
+    )
+    
+    # Overzicht van ordernummers en datums
+    order_overview = part_filtered_df[['number', 'defect_date', 'client_name', 'category', 'part_quantity', 'order_id']].drop_duplicates()
+    order_overview = order_overview.rename(columns={
+        'number': 'Ordernummer', 
+        'defect_date': 'Datum', 
+        'client_name': 'Klant', 
+        'category': 'Categorie', 
+        'part_quantity': 'Aantal'
+    })
+
+    # Sorteer op datum DESC voordat we het formaat aanpassen
+    order_overview = order_overview.sort_values(by='Datum', ascending=False)
+
+    # Pas daarna het datumformaat aan
+    order_overview['Datum'] = order_overview['Datum'].dt.strftime('%Y-%m-%d')
 
-def render_parts_analysis(parts_df, used_parts_df):
+    # Maak een kolom met de volledige URL
+    order_overview['Link'] = order_overview['order_id'].apply(lambda x: f"https://wpm.westtrac-portal.be/orders/{x}")
+
+    # Verwijder de order_id kolom omdat die niet getoond hoeft te worden
+    order_overview = order_overview.drop(columns=['order_id'])
+    return summary, usage_by_category, order_overview
+
+def render_parts_analysis(parts_star):
     # Cache wissen aan het begin van de functie    
     st.header("Onderdelen Analyse")
     
-    # Convert defect_date to datetime if it's not already
-    parts_df['defect_date'] = pd.to_datetime(parts_df['defect_date'])
+    # Slanke onderdeelregels met alleen de ordervelden die deze pagina gebruikt
+    parts_df = parts_star.frame(['defect_date', 'defect_year', 'number', 'client_name', 'category', 'zero_invoice'])
     
     # Gemeenschappelijke filters bovenaan
     # Year filter
-    years = parts_df['defect_date'].dt.year.unique()
+    years = get_filter_index(parts_df).values('defect_year')
     years = sorted(years, reverse=True)  # Meest recente jaren eerst
     selected_year = st.selectbox("Selecteer Jaar", years)
     
@@ -39,43 +114,34 @@ def render_parts_analysis(parts_df, used_parts_df):
     
     with col1:
         # Customer filter
-        customers = parts_df[parts_df['defect_date'].dt.year == selected_year]['client_name'].unique()
+        customers = get_filter_index(parts_df).values('client_name', {'defect_year': selected_year})
         selected_customer = st.multiselect("Selecteer Klanten", customers)
     
     with col2:
         # Service category filter
-        service_categories = parts_df['category'].unique()
+        service_categories = get_filter_index(parts_df).values('category')
         selected_categories = st.multiselect("Selecteer Service Categorieën", service_categories)
     
     with col3:
         # Nulfacturen includeren filter
         zero_invoice_filter = st.selectbox("Nulfacturen Includeren", options=["Ja", "Nee"], index=0)
     
-    # Verander de tabs definitie naar 2 tabs
-    tab1, tab2 = st.tabs(["Algemene Analyse", "Onderdeel Zoeken"])
+    tab1, tab2, tab3 = st.tabs(["Algemene Analyse", "Onderdeel Zoeken", "Seizoensanalyse"])
     
-    # Pas filters toe
-    filtered_df = apply_filters(parts_df, selected_year, selected_customer, selected_categories, zero_invoice_filter)
+    # Grafieken komen uit de vooraf geaggregeerde cube, zie utils.rollup_cube. De
+    # uitkomsten worden per dataversie en filters gedeeld, zie utils.aggregate_memo
+    filters = {
+        'defect_year': selected_year,
+        'client_name': selected_customer,
+        'category': selected_categories,
+        'zero_invoice': False if zero_invoice_filter == "Nee" else None,
+    }
+    top_parts, top_income_parts = top_parts_data(parts_star.version, filters, get_parts_cube(parts_star))
     
     with tab1:
         # Maak een enkele kolom voor de grafieken
         st.subheader(f"Top 30 Meest Gebruikte Onderdelen ({selected_year})")
         
-        # Top 30 meest voorkomende onderdelen, filter outliers
-        top_parts = (
-            filtered_df.groupby('part_number', as_index=False)
-                .agg(count=('part_quantity', 'sum'), description=('part_description', 'first'))
-        )
-        
-        # Filter out occurrences greater than 1 million
-        top_parts = top_parts[top_parts['count'] <= 1_000_000]
-        
-        # Sort by count in descending order and take the top 30
-        top_parts = top_parts.sort_values(by='count', ascending=False).head(30)
-        
-        # Convert part_number to string
-        top_parts['part_number'] = top_parts['part_number'].astype(str)
-        
         # Visualiseer de top onderdelen
         fig_parts = px.bar(
             top_parts,
@@ -101,19 +167,6 @@ def render_parts_analysis(parts_df, used_parts_df):
         # Nieuwe visualisatie voor totale inkomsten van onderdelen
         st.subheader(f"Top 30 Onderdelen op Totale Inkomsten ({selected_year})")
         
-        # Bereken totale inkomsten
-        filtered_df['total_income'] = filtered_df['part_quantity'] * filtered_df['part_price']
-        
-        # Top 30 onderdelen op basis van totale inkomsten
-        top_income_parts = (
-            filtered_df.groupby('part_number', as_index=False)
-                .agg(total_income=('total_income', 'sum'), description=('part_description', 'first'))
-        )
-        
-        # Sort by total income in descending order and take the top 30
-        top_income_parts = top_income_parts.sort_values(by='total_income', ascending=False).head(30)
-        top_income_parts['part_number'] = top_income_parts['part_number'].astype(str)
-        
         # Visualiseer de top onderdelen op basis van totale inkomsten
         fig_income_parts = px.bar(
             top_income_parts,
@@ -143,43 +196,34 @@ def render_parts_analysis(parts_df, used_parts_df):
         search_query = st.text_input("Zoek op onderdeelnummer", "")
         
         if search_query:
-            # Filter op part number binnen de al gefilterde dataset
-            part_filtered_df = filtered_df[filtered_df['part_number'].str.contains(search_query, case=False, na=False)]
+            # Suggesties: nummers die met de zoekterm beginnen of hem bevatten,
+            # aangevuld met nummers die erop lijken (tikfouten)
+            suggestions = get_part_search_index(parts_df).suggest(search_query)
+            exact = False
+            if suggestions and suggestions != [search_query]:
+                suggestion = st.selectbox("Suggesties", [f"Alle treffers voor '{search_query}'"] + suggestions)
+                if suggestion in suggestions:
+                    search_query, exact = suggestion, True
+            
+            result = search_part(parts_star.version, filters, search_query, exact, parts_df, get_parts_cube(parts_star))
             
-            if not part_filtered_df.empty:
-                # Bereken totalen en gemiddelden
-                total_quantity = part_filtered_df['part_quantity'].sum()
-                avg_price = part_filtered_df['part_price'].mean()
+            if result is not None:
+                summary, usage_by_category, order_overview = result
                 
                 # Toon onderdeel informatie
                 info_col1, info_col2, info_col3, info_col4 = st.columns(4)
                 with info_col1:
-                    st.metric("Onderdeelnummer", part_filtered_df['part_number'].iloc[0])
+                    st.metric("Onderdeelnummer", summary['part_number'])
                 with info_col2:
-                    st.metric("Omschrijving", part_filtered_df['part_description'].iloc[0])
+                    st.metric("Omschrijving", summary['description'])
                 with info_col3:
-                    st.metric("Gemiddelde Prijs", f"€{avg_price:,.2f}")
+                    st.metric("Gemiddelde Prijs", f"€{summary['avg_price']:,.2f}")
                 with info_col4:
-                    st.metric("Totaal Gebruikt", f"{total_quantity:,.0f}")
+                    st.metric("Totaal Gebruikt", f"{summary['total_quantity']:,.0f}")
                 
                 # Toon de data in een tabel
                 st.subheader("Details per Categorie")
                 
-                # Groepeer per categorie en tel de part_quantity
-                usage_by_category = (
-                    part_filtered_df.groupby('category')
-                    .agg({
-                        'part_quantity': 'sum',
-                        'part_price': lambda x: (x * part_filtered_df.loc[x.index, 'part_quantity']).sum()
-                    })
-                    .reset_index()
-                    .rename(columns={
-                        'category': 'Categorie',
-                        'part_quantity': 'Aantal',
-                        'part_price': 'Totale Kost'
-                    })
-                )
-                
                 # Styling voor de tabel
                 styled_df = (
                     usage_by_category.style
@@ -211,26 +255,6 @@ def render_parts_analysis(parts_df, used_parts_df):
                 
                 # Toon overzicht van ordernummers en datums
                 st.subheader("Overzicht van Ordernummers en Datums")
-                order_overview = part_filtered_df[['number', 'defect_date', 'client_name', 'category', 'part_quantity', 'id']].drop_duplicates()
-                order_overview = order_overview.rename(columns={
-                    'number': 'Ordernummer', 
-                    'defect_date': 'Datum', 
-                    'client_name': 'Klant', 
-                    'category': 'Categorie', 
-                    'part_quantity': 'Aantal'
-                })
-
-                # Sorteer op datum DESC voordat we het formaat aanpassen
-                order_overview = order_overview.sort_values(by='Datum', ascending=False)
-
-                # Pas daarna het datumformaat aan
-                order_overview['Datum'] = order_overview['Datum'].dt.strftime('%Y-%m-%d')
-
-                # Maak een kolom met de volledige URL
-                order_overview['Link'] = order_overview['id'].apply(lambda x: f"https://wpm.westtrac-portal.be/orders/{x}")
-
-                # Verwijder de id kolom omdat die niet getoond hoeft te worden
-                order_overview = order_overview.drop(columns=['id'])
 
                 # Styling voor de tabel
                 styled_order_overview = (
@@ -269,35 +293,137 @@ def render_parts_analysis(parts_df, used_parts_df):
             else:
                 st.warning(f"Geen onderdelen gevonden met nummer: {search_query} voor de geselecteerde filters")
 
+    with tab3:
+        render_seasonal_tab(parts_star)
+
+@st.cache_resource
+def get_seasonal_store():
+    """De gedeelde seizoensstore op schijf, zie analytics.seasonal_store"""
+    return SeasonalIndexStore(SEASONAL_STORE_DIR)
+
+@st.cache_resource
+def get_seasonal_dashboard_cache():
+    """Seizoensdashboards per dataversie, gedeeld door alle sessies, zie utils.background_cache"""
+    return BackgroundCache(maxsize=2, name='seasonal-dashboard')
+
+def compute_seasonal_dashboard(parts_star, store):
+    """Het seizoensdashboard voor een versie van het sterschema; draait op de achtergrond"""
+    parts_df = parts_star.frame(['defect_date', 'category'])
+    return PartsAnalysisView(store).get_seasonal_dashboard_data(parts_df)
+
+def render_seasonal_tab(parts_star):
+    """
+    Seizoenspatronen, komende pieken en voorraadadvies over de hele historie.
+    De analyse draait één keer per dataversie (en maand) op de achtergrond;
+    tot die klaar is staat hier de vorige uitkomst, of een melding, en
+    ververst de tab zichzelf.
+    """
+    key = (parts_star.version, str(pd.Period(datetime.now(), freq='M')))
+    cache = get_seasonal_dashboard_cache()
+    store = get_seasonal_store()
+    pending = cache.get(key, compute_seasonal_dashboard, parts_star, store).running
+
+    @st.fragment(run_every=2 if pending else None)
+    def dashboard():
+        result = cache.get(key, compute_seasonal_dashboard, parts_star, store)
+        # Klaar: één keer de hele pagina opnieuw, dan stopt het verversen
+        if pending and not result.running:
+            st.rerun()
+        if result.error is not None:
+            st.error(f"Seizoensanalyse mislukt: {result.error}")
+        if result.value is None and result.running:
+            st.info("De seizoensanalyse wordt op de achtergrond berekend, de resultaten verschijnen hier vanzelf.")
+        elif result.value is None and result.current:
+            st.info("Nog geen afgesloten maanden om te analyseren.")
+        elif result.value is not None:
+            if not result.current:
+                st.caption("Resultaten van de vorige dataversie; de nieuwe worden op de achtergrond berekend.")
+            render_seasonal_dashboard(result.value)
+
+    dashboard()
+
+def render_seasonal_dashboard(dashboard_data):
+    """Toon de uitkomst van PartsAnalysisView.get_seasonal_dashboard_data"""
+    stats = dashboard_data['algemene_statistieken']
+    st.caption("Over de volledige historie, los van de filters hierboven.")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Onderdelen Geanalyseerd", f"{stats['aantal_onderdelen_geanalyseerd']:,}")
+    with col2:
+        st.metric("Categorieën", stats['aantal_categorien'])
+    with col3:
+        st.metric("Verwerkt Tot En Met", stats['verwerkt_tot'])
+    
+    st.subheader("Aankomende Pieken")
+    peaks = dashboard_data['aankomende_pieken']
+    if peaks.empty:
+        st.info(f"Geen onderdelen met een seizoenspiek in {', '.join(stats['prognose_maanden'])}.")
+    else:
+        st.dataframe(
+            peaks.style.format({'Seizoensindex': '{:.2f}', 'Verwachte Vraag': '{:,.1f}'}),
+            use_container_width=True, hide_index=True
+        )
+    
+    st.subheader("Seizoenstrends per Categorie")
+    trends = dashboard_data['huidige_seizoenstrends']
+    fig_trends = px.line(
+        trends['seizoens_index'],
+        x='Maand',
+        y='Seizoensindex',
+        color='Categorie',
+        markers=True,
+        title='Seizoensindex per Categorie (1 = gemiddelde maand)'
+    )
+    fig_trends.add_hline(y=PEAK_THRESHOLD, line_dash='dot', line_color='red')
+    fig_trends.add_hline(y=TROUGH_THRESHOLD, line_dash='dot', line_color='blue')
+    st.plotly_chart(fig_trends, use_container_width=True)
+    st.dataframe(
+        trends['trends'].style.format({'Deze maand': '{:.2f}', 'Volgende maand': '{:.2f}'}),
+        use_container_width=True, hide_index=True
+    )
+    
+    st.subheader(f"Voorraadadvies ({stats['prognose_maanden'][0]} - {stats['prognose_maanden'][-1]})")
+    st.dataframe(
+        dashboard_data['voorraadadviezen'].style.format({
+            'Verwachte Vraag': '{:,.1f}',
+            'Ondergrens': '{:,.1f}',
+            'Aanbevolen Voorraad': '{:,.0f}'
+        }),
+        use_container_width=True, hide_index=True
+    )
+
 class PartsAnalysisView:
-    def __init__(self):
-        self.seasonal_analyzer = SeasonalPatternAnalyzer()
+    def __init__(self, store=None):
+        self.seasonal_analyzer = SeasonalPatternAnalyzer(store if store is not None else get_seasonal_store())
         
-    def analyze_seasonal_patterns(self, parts_df: pd.DataFrame, start_date: datetime, end_date: datetime = None) -> Dict:
+    def analyze_seasonal_patterns(self, parts_df: pd.DataFrame, start_date: datetime = None, end_date: datetime = None) -> Dict:
         """
-        Voer een complete seizoensanalyse uit voor alle onderdelen
+        Voer een complete seizoensanalyse uit voor alle onderdelen. Zonder
+        periode komt die uit de seizoensstore, waarin alleen de sinds de vorige
+        keer afgesloten maanden verwerkt worden; een losse periode wordt apart
+        geanalyseerd en niet bewaard.
         """
-        # Gebruik de bestaande parts_df in plaats van nieuwe data op te halen
-        usage_data = self.prepare_usage_data(parts_df, start_date, end_date)
-        
-        # Voer analyse uit op alle niveaus
-        analysis_results = self.seasonal_analyzer.analyze_patterns_all_levels(usage_data)
+        if start_date is None and end_date is None:
+            self.update_seasonal_store(parts_df)
+            analysis_results = self.seasonal_analyzer.seasonal_data
+        else:
+            usage_data = self.prepare_usage_data(parts_df, start_date, end_date)
+            analysis_results = SeasonalPatternAnalyzer().analyze_patterns_all_levels(usage_data)
         
         return self.format_analysis_results(analysis_results)
     
-    def prepare_usage_data(self, parts_df: pd.DataFrame, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    def prepare_usage_data(self, parts_df: pd.DataFrame, start_date: datetime = None, end_date: datetime = None) -> pd.DataFrame:
         """
         Bereid de data voor uit het bestaande DataFrame
         """
-        # Maak een kopie om SettingWithCopyWarning te voorkomen
-        usage_data = parts_df.copy()
-        
-        # Filter op datum
-        mask = (usage_data['defect_date'] >= pd.Timestamp(start_date))
+        # Filter op datum; alleen de gekozen regels worden gekopieerd
+        mask = pd.Series(True, index=parts_df.index)
+        if start_date is not None:
+            mask &= (parts_df['defect_date'] >= pd.Timestamp(start_date))
         if end_date:
-            mask &= (usage_data['defect_date'] <= pd.Timestamp(end_date))
+            mask &= (parts_df['defect_date'] <= pd.Timestamp(end_date))
         
-        usage_data = usage_data[mask]
+        usage_data = parts_df[mask]
         
         # Hernoem kolommen naar verwacht formaat
         usage_data = usage_data.rename(columns={
@@ -360,25 +486,136 @@ class PartsAnalysisView:
         }
         return months.get(month, str(month))
     
-    def get_seasonal_dashboard_data(self) -> Dict:
+    def update_seasonal_store(self, parts_df: pd.DataFrame, today: datetime = None) -> int:
+        """Verwerk de maanden die sinds de vorige keer afgesloten zijn (voor de maand van today) in de seizoensstore"""
+        # Alleen de regels vanaf de eerste nog niet verwerkte maand
+        usage_data = self.prepare_usage_data(parts_df, self.seasonal_analyzer.store.next_month, None)
+        return self.seasonal_analyzer.update(usage_data, today)
+    
+    def get_seasonal_dashboard_data(self, parts_df: pd.DataFrame, today: datetime = None, horizon: int = 3) -> Dict:
         """
-        Verzamel data voor het seizoenspatronen dashboard
+        Verzamel data voor het seizoenspatronen dashboard: de seizoensindex uit
+        de store (over de hele historie) en een vraagprognose voor de lopende
+        en de volgende horizon - 1 maanden. Rekent over alle onderdelen, dus
+        bedoeld voor de achtergrond (zie render_seasonal_tab).
         """
-        current_date = datetime.now()
-        year_ago = current_date.replace(year=current_date.year - 1)
+        today = pd.Timestamp(today or datetime.now())
+        self.update_seasonal_store(parts_df, today)
+        store = self.seasonal_analyzer.store
+        if store.through is None:
+            return None
         
-        # Haal data op voor laatste jaar
-        analysis_results = self.analyze_seasonal_patterns(parts_df, year_ago)
+        # Prognose op de afgesloten maanden, vanaf de lopende maand
+        forecast = self.seasonal_analyzer.forecast_demand(self.prepare_usage_data(parts_df), horizon,
+                                                          through=pd.Period(today, freq='M') - 1)
         
         # Verzamel dashboard statistieken
         dashboard_data = {
             'algemene_statistieken': {
-                'aantal_onderdelen_geanalyseerd': len(analysis_results['onderdeel_niveau']['details']),
-                'aantal_categorien': len(analysis_results['categorie_niveau']['details'])
+                'aantal_onderdelen_geanalyseerd': len(store.levels['part_level'].labels),
+                'aantal_categorien': len(store.levels['category_level'].labels),
+                'verwerkt_tot': self.format_period(store.through),
+                'prognose_maanden': [self.format_period(month) for month in forecast.months]
             },
-            'huidige_seizoenstrends': self.get_current_season_trends(analysis_results),
-            'aankomende_pieken': self.get_upcoming_peaks(analysis_results),
-            'voorraadadviezen': self.generate_stock_recommendations(analysis_results)
+            'huidige_seizoenstrends': self.get_current_season_trends(today),
+            'aankomende_pieken': self.get_upcoming_peaks(forecast),
+            'voorraadadviezen': self.generate_stock_recommendations(forecast)
         }
         
-        return dashboard_data
\ No newline at end of file
+        return dashboard_data
+    
+    def format_period(self, period: pd.Period) -> str:
+        """
+        Format een maand als 'maandnaam jaar'
+        """
+        return f"{self.format_month(period.month)} {period.year}"
+    
+    def get_current_season_trends(self, today: datetime) -> Dict:
+        """
+        Seizoensindex per categorie: de hele kromme (lang formaat, voor een
+        grafiek) en deze maand tegenover volgende maand
+        """
+        categories, index = self.seasonal_analyzer.store.index_matrix('category_level')
+        categories = categories.astype(str)
+        curve = pd.DataFrame({
+            'Categorie': np.repeat(categories, 12),
+            'Maand': np.tile([self.format_month(month) for month in range(1, 13)], len(categories)),
+            'Seizoensindex': index.ravel()
+        })
+        
+        # Index van deze en volgende maand, trend bij meer dan 10% verschil
+        this_month, next_month = index[:, today.month - 1], index[:, today.month % 12]
+        with np.errstate(invalid='ignore'):
+            trend = np.select([next_month > this_month * 1.1, next_month < this_month * 0.9],
+                              ['stijgend', 'dalend'], 'stabiel')
+        trends = pd.DataFrame({
+            'Categorie': categories,
+            'Deze maand': this_month,
+            'Volgende maand': next_month,
+            'Trend': trend
+        }).sort_values('Deze maand', ascending=False, ignore_index=True)
+        
+        return {'seizoens_index': curve, 'trends': trends}
+    
+    def _part_forecast(self, forecast, labels):
+        """Rijen van forecast in de volgorde van labels, -1 voor onderdelen zonder prognose"""
+        return pd.Index(np.asarray(forecast.labels, dtype=object)).get_indexer(labels)
+    
+    def get_upcoming_peaks(self, forecast, top: int = 20) -> pd.DataFrame:
+        """
+        Per prognosemaand de onderdelen met een seizoenspiek in die
+        kalendermaand, de top op verwachte vraag
+        """
+        store = self.seasonal_analyzer.store
+        labels, index = store.index_matrix('part_level')
+        rows = self._part_forecast(forecast, labels)
+        categories = store.main_categories(labels)
+        
+        peaks = []
+        for step, month in enumerate(forecast.months):
+            month_index = index[:, month.month - 1]
+            with np.errstate(invalid='ignore'):
+                parts = np.flatnonzero(month_index > PEAK_THRESHOLD)
+            expected = np.where(rows[parts] >= 0, forecast.forecast[rows[parts], step], 0.0)
+            peaks.append(pd.DataFrame({
+                'Maand': self.format_period(month),
+                'Onderdeel': labels[parts].astype(str),
+                'Categorie': categories[parts],
+                'Seizoensindex': month_index[parts],
+                'Verwachte Vraag': expected
+            }).sort_values(['Verwachte Vraag', 'Seizoensindex'], ascending=False).head(top))
+        
+        return pd.concat(peaks, ignore_index=True)
+    
+    def generate_stock_recommendations(self, forecast, top: int = 50) -> pd.DataFrame:
+        """
+        Voorraadadvies voor de onderdelen met de hoogste verwachte vraag over
+        de prognosemaanden: verhogen als een van die maanden een piek is,
+        afbouwen als het allemaal dalmaanden zijn, anders aanhouden. Het
+        aanbevolen niveau is de bovengrens van het prognose-interval.
+        """
+        store = self.seasonal_analyzer.store
+        labels, index = store.index_matrix('part_level')
+        rows = self._part_forecast(forecast, labels)
+        known = rows >= 0
+        labels, index, rows = labels[known], index[known], rows[known]
+        
+        expected = forecast.forecast[rows].sum(axis=1)
+        order = np.argsort(-expected, kind='stable')[:top]
+        order = order[expected[order] > 0]
+        
+        months_index = index[np.ix_(order, [month.month - 1 for month in forecast.months])]
+        with np.errstate(invalid='ignore'):
+            advice = np.select([(months_index > PEAK_THRESHOLD).any(axis=1),
+                                (months_index < TROUGH_THRESHOLD).all(axis=1)],
+                               ['Voorraad verhogen', 'Voorraad afbouwen'], 'Voorraad aanhouden')
+        
+        return pd.DataFrame({
+            'Onderdeel': labels[order].astype(str),
+            'Categorie': store.main_categories(labels[order]),
+            'Verwachte Vraag': expected[order],
+            'Ondergrens': forecast.lower[rows[order]].sum(axis=1),
+            'Aanbevolen Voorraad': np.ceil(forecast.upper[rows[order]].sum(axis=1)),
+            'Advies': advice,
+            'Model': forecast.model[rows[order]]
+        })
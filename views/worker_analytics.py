@@ -4,14 +4,11 @@ from utils.data_processing import process_worker_productivity
 import pandas as pd
 from datetime import datetime, timedelta
 from utils.excel_utils import to_excel
+from utils.derived_columns import ymd
 
 def render_worker_analytics(worker_labours_df, orders_df):
     st.header("Medewerker Analyse")
     
-    # Convert dates to datetime
-    orders_df['created_at'] = pd.to_datetime(orders_df['created_at'])
-    worker_labours_df['created_at'] = pd.to_datetime(worker_labours_df['created_at'])
-    
     # Date range filter
     col1, col2 = st.columns(2)
     with col1:
@@ -25,15 +22,15 @@ def render_worker_analytics(worker_labours_df, orders_df):
             datetime.now()
         )
     
-    # Filter both datasets by date range
+    # Filter both datasets by date range, op de bij het laden afgeleide jjjjmmdd datum
     filtered_orders = orders_df[
-        (orders_df['created_at'].dt.date >= start_date) &
-        (orders_df['created_at'].dt.date <= end_date)
+        (orders_df['created_ymd'] >= ymd(start_date)) &
+        (orders_df['created_ymd'] <= ymd(end_date))
     ]
     
     filtered_labours = worker_labours_df[
-        (worker_labours_df['created_at'].dt.date >= start_date) &
-        (worker_labours_df['created_at'].dt.date <= end_date)
+        (worker_labours_df['created_ymd'] >= ymd(start_date)) &
+        (worker_labours_df['created_ymd'] <= ymd(end_date))
     ]
     
     # Worker productivity metrics